@@ -0,0 +1,83 @@
+"""Benchmark the dataframe helpers used on database inventories.
+
+Compares the vectorized `marcpy.sql.createDatabaseStringFromDF()` and the 
+regex filter behind `dbListSchemas()`/`dbTableStructure()` 
+(`marcpy.sql._regexMask()`) against the previous row-by-row `apply()` 
+implementations on a synthetic inventory, so no database is needed.
+
+Run with (from the repository root):
+    asv run --bench DataframeHelpers
+"""
+import re
+
+import numpy
+import pandas
+from asv_runner.benchmarks.mark import skip_for_params
+
+from marcpy import sql
+
+
+def _createDatabaseStringLegacy(df, serverCol, databaseCol, userCol):
+    """The `df.apply(axis = 1)` version of `createDatabaseStringFromDF()`."""
+    
+    return df.apply(lambda x: "{}.{}.{}".format(x[serverCol].lower(), x[databaseCol].lower(), x[userCol].lower()) if str(x[serverCol]) != 'nan' and str(x[databaseCol]) != 'nan' and str(x[userCol]) != 'nan' else numpy.nan, axis = 1)
+
+
+def _regexMaskLegacy(series, regexList):
+    """The per-element `re.search()` filter used before `_regexMask()`."""
+    
+    return series.apply(lambda x: bool(re.search("|".join(regexList), x)))
+
+
+def makeInventory(nRows, seed = 0):
+    """Create a synthetic server/database/user/schema/table inventory."""
+    
+    rng = numpy.random.default_rng(seed)
+    inventory = pandas.DataFrame({
+        'Server' : rng.choice(["Chiefs", "Knights", "Phantoms", "Royals"], nRows),
+        'Database' : rng.choice(["MARC_PUB", "MARC_PRD", "MARC_DEV", "GIS"], nRows),
+        'User' : rng.choice(["marcpub", "marcdl", "gisuser"], nRows),
+        'Schema' : rng.choice(["dbo", "sde", "marcpub", "db_owner", "INFORMATION_SCHEMA", "sys"], nRows),
+        'Table' : ["{}{}".format(rng.choice(["Parcels_", "SDE_layers", "a", "Roads_"]), i) for i in rng.integers(0, 100000, nRows)]
+    })
+    inventory.loc[inventory.sample(frac = 0.01, random_state = seed).index, 'User'] = numpy.nan
+    
+    return inventory
+
+
+schemaRegex = ["sys", "sde", "^INFORMATION_SCHEMA$", "^db_\\.*"]
+tableRegex = ["^[a-zA-Z]\\d+$", "^SDE_"]
+
+
+#The legacy versions take minutes at 1M rows, so they stop at 100k
+skipLegacy = skip_for_params([(1000000,)])
+
+
+class DataframeHelpers:
+    params = [[10000, 100000, 1000000]]
+    param_names = ["rows"]
+    timeout = 900
+    
+    def setup(self, nRows):
+        self.inventory = makeInventory(nRows)
+    
+    def time_createDatabaseStringFromDF(self, nRows):
+        sql.createDatabaseStringFromDF(self.inventory, 'Server', 'Database', 'User')
+    
+    @skipLegacy
+    def time_createDatabaseStringFromDF_legacy(self, nRows):
+        _createDatabaseStringLegacy(self.inventory, 'Server', 'Database', 'User')
+    
+    def time_schemaFilter(self, nRows):
+        sql._regexMask(self.inventory['Schema'], schemaRegex)
+    
+    @skipLegacy
+    def time_schemaFilter_legacy(self, nRows):
+        _regexMaskLegacy(self.inventory['Schema'], schemaRegex)
+    
+    def time_tableFilter(self, nRows):
+        sql._regexMask(self.inventory['Table'], tableRegex)
+    
+    @skipLegacy
+    def time_tableFilter_legacy(self, nRows):
+        _regexMaskLegacy(self.inventory['Table'], tableRegex)
@@ -0,0 +1,74 @@
+"""Benchmark the row-to-dataframe conversion used by `marcpy.sql.getODBCtable()`.
+
+Compares the single-pass columnar builder (`marcpy.sql._rowsToDataFrame()`) 
+against the previous implementation, which walked the full row list once per 
+column and finished with `pandas.concat()`. Synthetic rows stand in for the 
+pyodbc.Row objects returned by `cursor.fetchall()`, so no database is needed.
+
+Run with (from the repository root):
+    asv run --bench RowsToDataFrame
+"""
+import pandas
+
+from marcpy import sql
+
+
+_legacyTypes = {bool: "boolean", int: "Int64", float: "Float64", str: "string"}
+
+
+def _rowsToDataFrameLegacy(rows, names, pandasTypes):
+    """The per-column builder used by `getODBCtable()` before the columnar one."""
+    
+    outSeries = [None] * len(names)
+    for i in range(0,len(names)):
+        colData = list(map(lambda x: x[i], rows))
+        outSeries[i] = pandas.Series(data = colData, dtype = pandasTypes[i], name = names[i])
+    
+    return pandas.concat(outSeries, axis = 1)
+
+
+def makeRows(nRows, nCols):
+    """Create synthetic rows cycling through int, float, str, and bool columns."""
+    
+    makers = [
+        (int, lambda r, c: r * c if r % 10 else None),
+        (float, lambda r, c: r / (c + 1)),
+        (str, lambda r, c: "value_{}_{}".format(r % 1000, c)),
+        (bool, lambda r, c: r % 2 == 0)
+    ]
+    colMakers = [makers[c % len(makers)] for c in range(nCols)]
+    names = ["col{}".format(c) for c in range(nCols)]
+    columns = [sql._ODBCColumn(names[c], m[0], None, None, None, None, True) for c, m in enumerate(colMakers)]
+    rows = [tuple(m[1](r, c) for c, m in enumerate(colMakers)) for r in range(nRows)]
+    
+    return rows, columns
+
+
+class RowsToDataFrame:
+    params = [["narrow", "wide"]]
+    param_names = ["case"]
+    
+    #Rows and columns for each case
+    cases = {
+        "narrow": (200000, 5),
+        "wide": (20000, 250)
+    }
+    
+    def setup(self, case):
+        nRows, nCols = self.cases[case]
+        self.rows, columns = makeRows(nRows, nCols)
+        self.names = [x.name for x in columns]
+        self.pandasTypes = [_legacyTypes[x.type_code] for x in columns]
+        self.converters = sql._columnConverters(columns)
+    
+    def time_legacy(self, case):
+        _rowsToDataFrameLegacy(self.rows, self.names, self.pandasTypes)
+    
+    def time_columnar(self, case):
+        sql._rowsToDataFrame(self.rows, self.names, self.converters)
+    
+    def peakmem_legacy(self, case):
+        _rowsToDataFrameLegacy(self.rows, self.names, self.pandasTypes)
+    
+    def peakmem_columnar(self, case):
+        sql._rowsToDataFrame(self.rows, self.names, self.converters)
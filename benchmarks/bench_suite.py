@@ -0,0 +1,130 @@
+"""asv benchmark suite for `marcpy.sql` and `marcpy.anti_join`.
+
+Everything runs against synthetic data: SQL reads go through the SQLite 
+stand-in in `sqliteShim.py`, so no SQL Server or ODBC driver is needed beyond
+what `import marcpy.sql` requires. Result sizes range from 1k to 10M rows to 
+catch regressions in conversion throughput (`time_*`) and memory 
+(`peakmem_*`).
+
+Run with (from the repository root):
+    asv run
+    asv run --bench GetODBCtable
+    asv continuous main HEAD
+"""
+import os
+import tempfile
+
+import numpy
+import pandas
+
+from marcpy import sql
+from marcpy.anti_join import anti_join
+
+from . import sqliteShim
+
+
+rowParams = [1000, 100000, 1000000, 10000000]
+
+
+class GetODBCtable:
+    params = (rowParams, ["numpy_nullable", "pyarrow"])
+    param_names = ["rows", "dtype_backend"]
+    timeout = 1800
+    
+    def setup_cache(self):
+        directory = tempfile.mkdtemp(prefix = "marcpy_bench_")
+        paths = {}
+        for nRows in rowParams:
+            paths[nRows] = os.path.join(directory, "t_{}.sqlite".format(nRows))
+            sqliteShim.makeDatabase(paths[nRows], nRows)
+        return paths
+    
+    def setup(self, paths, nRows, dtype_backend):
+        self.conn = sqliteShim.connectShim(paths[nRows])
+    
+    def teardown(self, paths, nRows, dtype_backend):
+        self.conn['pyodbc'].close()
+    
+    def time_getODBCtable(self, paths, nRows, dtype_backend):
+        sql.getODBCtable(self.conn, "SELECT * FROM t", dtype_backend = dtype_backend)
+    
+    def peakmem_getODBCtable(self, paths, nRows, dtype_backend):
+        sql.getODBCtable(self.conn, "SELECT * FROM t", dtype_backend = dtype_backend)
+    
+    def time_iterODBCtable(self, paths, nRows, dtype_backend):
+        for chunk in sql.iterODBCtable(self.conn, "SELECT * FROM t", dtype_backend = dtype_backend):
+            pass
+    
+    def peakmem_iterODBCtable(self, paths, nRows, dtype_backend):
+        for chunk in sql.iterODBCtable(self.conn, "SELECT * FROM t", dtype_backend = dtype_backend):
+            pass
+
+
+class DbTableStructure:
+    #Tables in the fake INFORMATION_SCHEMA, 10 columns each (so up to 1M column rows)
+    params = ([100, 10000, 100000], [False, True])
+    param_names = ["tables", "addColumnInfo"]
+    timeout = 600
+    
+    def setup_cache(self):
+        directory = tempfile.mkdtemp(prefix = "marcpy_bench_")
+        paths = {}
+        for nTables in self.params[0]:
+            paths[nTables] = os.path.join(directory, "catalog_{}.sqlite".format(nTables))
+            sqliteShim.makeDatabase(paths[nTables], 0, nTables = nTables)
+        return paths
+    
+    def setup(self, paths, nTables, addColumnInfo):
+        self.conn = sqliteShim.connectShim(paths[nTables])
+    
+    def teardown(self, paths, nTables, addColumnInfo):
+        self.conn['pyodbc'].close()
+    
+    def time_dbTableStructure(self, paths, nTables, addColumnInfo):
+        sql.dbTableStructure(self.conn, addGeoIndicator = True, addColumnInfo = addColumnInfo)
+    
+    def peakmem_dbTableStructure(self, paths, nTables, addColumnInfo):
+        sql.dbTableStructure(self.conn, addGeoIndicator = True, addColumnInfo = addColumnInfo)
+
+
+class CreateDatabaseStringFromDF:
+    params = [rowParams]
+    param_names = ["rows"]
+    timeout = 600
+    
+    def setup(self, nRows):
+        rng = numpy.random.default_rng(0)
+        self.df = pandas.DataFrame({
+            'Server': rng.choice(["Chiefs", "Knights", "Phantoms"], nRows), 
+            'Database': rng.choice(["MARC_PUB", "MARC_PRD", "GIS"], nRows), 
+            'User': rng.choice(["marcpub", "marcdl", None], nRows)
+        })
+    
+    def time_createDatabaseStringFromDF(self, nRows):
+        sql.createDatabaseStringFromDF(self.df, 'Server', 'Database', 'User')
+    
+    def time_createDatabaseStringFromDF_unique(self, nRows):
+        sql.createDatabaseStringFromDF(self.df, 'Server', 'Database', 'User', unique = True)
+    
+    def peakmem_createDatabaseStringFromDF(self, nRows):
+        sql.createDatabaseStringFromDF(self.df, 'Server', 'Database', 'User')
+
+
+class AntiJoin:
+    params = [rowParams]
+    param_names = ["rows"]
+    timeout = 600
+    
+    def setup(self, nRows):
+        rng = numpy.random.default_rng(0)
+        self.left = pandas.DataFrame({'key': numpy.arange(nRows), 'grp': rng.integers(0, 100, nRows), 'value': rng.normal(size = nRows)})
+        self.right = self.left.sample(frac = 0.9, random_state = 0)[['key', 'grp']].rename(columns = {'key': 'otherKey'})
+    
+    def time_anti_join_list(self, nRows):
+        anti_join(self.left, self.right.rename(columns = {'otherKey': 'key'}), on = ['key', 'grp'])
+    
+    def time_anti_join_dict(self, nRows):
+        anti_join(self.left, self.right, on = {'key': 'otherKey', 'grp': 'grp'})
+    
+    def peakmem_anti_join_list(self, nRows):
+        anti_join(self.left, self.right.rename(columns = {'otherKey': 'key'}), on = ['key', 'grp'])
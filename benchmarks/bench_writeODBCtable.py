@@ -0,0 +1,65 @@
+"""Benchmark `marcpy.sql.writeODBCtable()` against `pandas.DataFrame.to_sql()`.
+
+Writes a synthetic dataframe to a scratch table on a real SQL Server and 
+reports throughput in rows/sec for both writers. The scratch table is dropped 
+when the benchmark finishes. Use a development database; the connection needs 
+CREATE TABLE permission in the target schema.
+
+Run with:
+    python benchmarks/bench_writeODBCtable.py phantoms.marc_dev.marcpub --schema marcpub --rows 100000
+"""
+import argparse
+import time
+
+import numpy
+import pandas
+
+from marcpy import sql
+
+
+def makeDataFrame(nRows):
+    """Create a mixed-type dataframe similar to a typical MARC extract."""
+    
+    rng = numpy.random.default_rng(42)
+    return pandas.DataFrame({
+        'ID': pandas.array(numpy.arange(nRows), dtype = "Int64"),
+        'GEOID': pandas.array(["29095{:06d}".format(x) for x in rng.integers(0, 999999, nRows)], dtype = "string"),
+        'Value': pandas.array(rng.normal(100, 25, nRows), dtype = "Float64"),
+        'Flag': pandas.array(rng.integers(0, 2, nRows) == 1, dtype = "boolean"),
+        'Updated': pandas.Timestamp("2022-01-01") + pandas.to_timedelta(rng.integers(0, 365 * 24, nRows), unit = "h")
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("databaseString", help = "keyring username passed to marcpy.sql.connectODBC()")
+    parser.add_argument("--schema", default = "dbo")
+    parser.add_argument("--table", default = "marcpyBenchmarkWrite")
+    parser.add_argument("--rows", type = int, default = 100000)
+    parser.add_argument("--chunksize", type = int, default = 10000)
+    parser.add_argument("--skip-to-sql", action = "store_true", help = "only time writeODBCtable()")
+    args = parser.parse_args()
+    
+    df = makeDataFrame(args.rows)
+    conn = sql.connectODBC(args.databaseString)
+    
+    try:
+        start = time.perf_counter()
+        sql.writeODBCtable(conn, df, args.table, schema = args.schema, chunksize = args.chunksize, if_exists = "replace")
+        elapsed = time.perf_counter() - start
+        print("writeODBCtable:    {:>10,.0f} rows/sec ({:.2f} s)".format(args.rows / elapsed, elapsed))
+        
+        if not args.skip_to_sql:
+            start = time.perf_counter()
+            df.to_sql(args.table, conn['sqlalchemy'], schema = args.schema, if_exists = "replace", index = False, chunksize = args.chunksize)
+            elapsed = time.perf_counter() - start
+            print("DataFrame.to_sql:  {:>10,.0f} rows/sec ({:.2f} s)".format(args.rows / elapsed, elapsed))
+    finally:
+        cursor = conn['pyodbc'].cursor()
+        cursor.execute("DROP TABLE IF EXISTS " + sql._tableName(args.table, args.schema))
+        conn['pyodbc'].commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
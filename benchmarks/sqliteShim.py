@@ -0,0 +1,166 @@
+"""A SQLite stand-in for a {pyodbc} connection, used by the benchmarks and tests.
+
+`marcpy.sql` reads through a {pyodbc} connection whose `cursor.description` 
+reports a Python type for every column. sqlite3 reports no types, so 
+`ShimConnection` wraps a sqlite3 connection and fills the description in from 
+a column name -> Python type dictionary. `connectShim()` returns it in the 
+same shape as `marcpy.sql.connectODBC()` so functions that read through 
+`pandas.read_sql()` (like `dbTableStructure()`) work against it too.
+
+`makeDatabase()` writes a synthetic SQLite file with a fact table ('t') and a 
+fake INFORMATION_SCHEMA, so no SQL Server is needed.
+"""
+import datetime
+import os
+import re
+import sqlite3
+
+import numpy
+
+
+sqlite3.register_converter("BOOLEAN", lambda x: bool(int(x)))
+sqlite3.register_converter("DATE", lambda x: datetime.date.fromisoformat(x.decode()))
+
+
+#Python type and internal size reported for each column of table 't'
+columnTypes = {
+    'id': (int, 8), 
+    'grp': (str, 32), 
+    'amount': (float, 8), 
+    'flag': (bool, 1), 
+    'day': (datetime.date, 10)
+}
+
+
+class ShimCursor:
+    """Wraps a sqlite3 cursor so `description` reports Python types like {pyodbc}.
+    
+    'SELECT TOP (n) ...' is rewritten to '... LIMIT n' so the T-SQL that 
+    `marcpy.sql` builds for paging runs on SQLite.
+    """
+    
+    def __init__(self, cursor, types):
+        self._cursor = cursor
+        self._types = types
+    
+    @property
+    def description(self):
+        out = []
+        for d in self._cursor.description:
+            typeCode = self._types.get(d[0], str)
+            size = 0
+            if isinstance(typeCode, tuple):
+                typeCode, size = typeCode
+            out.append((d[0], typeCode, size, size, size, 0, True))
+        return out
+    
+    def execute(self, query, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        topMatch = re.match("^\\s*SELECT TOP \\((\\d+)\\) (.*)$", query, re.DOTALL)
+        if topMatch is not None:
+            query = "SELECT " + topMatch.group(2) + " LIMIT " + topMatch.group(1)
+        self._cursor.execute(query, params)
+        return self
+    
+    def fetchone(self):
+        return self._cursor.fetchone()
+    
+    def fetchall(self):
+        return self._cursor.fetchall()
+    
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+    
+    def close(self):
+        self._cursor.close()
+
+
+class ShimConnection:
+    """A sqlite3 backed stand-in for a pyodbc.Connection.
+    
+    Parameters
+    ----------
+    path : str
+        The SQLite file, or ':memory:'.
+    types : dict
+        Column name -> Python type, or -> (Python type, internal size). 
+        Columns not listed are reported as str.
+    """
+    
+    def __init__(self, path = ":memory:", types = columnTypes):
+        self.sqlite = sqlite3.connect(path, detect_types = sqlite3.PARSE_DECLTYPES, check_same_thread = False)
+        self._types = types
+    
+    def cursor(self):
+        return ShimCursor(self.sqlite.cursor(), self._types)
+    
+    def commit(self):
+        self.sqlite.commit()
+    
+    def close(self):
+        self.sqlite.close()
+
+
+def connectShim(path):
+    """Open `path` shaped like the result of `marcpy.sql.connectODBC()`."""
+    
+    shim = ShimConnection(path)
+    shim.sqlite.execute("ATTACH DATABASE ? AS INFORMATION_SCHEMA", [path + ".information_schema"])
+    
+    return {
+        'pyodbc': shim, 
+        'sqlalchemy': shim.sqlite, 
+        'details': {'Driver': "SQLite", 'Server': "localhost", 'Database': os.path.basename(path), 'UID': "bench"}
+    }
+
+
+def makeDatabase(path, nRows, nTables = 0, chunksize = 100000, seed = 0):
+    """Write a synthetic database for the benchmarks
+    
+    Parameters
+    ----------
+    path : str
+        The SQLite file to create. The fake INFORMATION_SCHEMA is written next
+        to it as `path + '.information_schema'`.
+    nRows : int
+        Rows in table 't'.
+    nTables : int
+        Tables listed in the fake INFORMATION_SCHEMA, with 10 columns each.
+    """
+    
+    rng = numpy.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER, grp TEXT, amount REAL, flag BOOLEAN, day DATE)")
+    groups = numpy.array(["group_{}".format(i) for i in range(100)])
+    days = numpy.array([(datetime.date(2020, 1, 1) + datetime.timedelta(days = i)).isoformat() for i in range(1000)])
+    for start in range(0, nRows, chunksize):
+        n = min(chunksize, nRows - start)
+        rows = zip(
+            range(start, start + n), 
+            groups[rng.integers(0, len(groups), n)].tolist(), 
+            rng.normal(100, 25, n).round(2).tolist(), 
+            rng.integers(0, 2, n).tolist(), 
+            days[rng.integers(0, len(days), n)].tolist()
+        )
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    
+    infoSchema = sqlite3.connect(path + ".information_schema")
+    infoSchema.execute("CREATE TABLE TABLES (TABLE_CATALOG TEXT, TABLE_SCHEMA TEXT, TABLE_NAME TEXT, TABLE_TYPE TEXT)")
+    infoSchema.execute("""CREATE TABLE COLUMNS (TABLE_SCHEMA TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT, ORDINAL_POSITION INTEGER, DATA_TYPE TEXT, 
+                            IS_NULLABLE TEXT, CHARACTER_MAXIMUM_LENGTH INTEGER, NUMERIC_PRECISION INTEGER, NUMERIC_SCALE INTEGER)""")
+    schemas = ["dbo", "marcpub", "sde", "gis"]
+    dataTypes = ["int", "nvarchar", "float", "datetime2", "geometry", "bit", "decimal", "date", "bigint", "nvarchar"]
+    tables = [("bench", schemas[i % len(schemas)], "Table_{}".format(i), "VIEW" if i % 7 == 0 else "BASE TABLE") for i in range(nTables)]
+    infoSchema.executemany("INSERT INTO TABLES VALUES (?, ?, ?, ?)", tables)
+    columns = []
+    for i, table in enumerate(tables):
+        for c in range(10):
+            dataType = dataTypes[(i + c) % len(dataTypes)]
+            columns.append((table[1], table[2], "col{}".format(c), c + 1, dataType, "YES" if c else "NO", 
+                            255 if dataType == "nvarchar" else None, 18 if dataType == "decimal" else None, 4 if dataType == "decimal" else None))
+    infoSchema.executemany("INSERT INTO COLUMNS VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", columns)
+    infoSchema.commit()
+    infoSchema.close()
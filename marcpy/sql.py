@@ -2,12 +2,31 @@
 functions may be hardcoded to work with Microsoft SQL Servers as that is what
 MARC uses.
 """
+import asyncio
+import atexit
+import collections.abc
+import concurrent.futures
+import contextlib
 import datetime
+import decimal
+import functools
+import hashlib
+import json
+import math
+import os
 import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+import weakref
 
 import pyodbc
 import sqlalchemy
 from marcpy import keyring_wrappers
+from marcpy.anti_join import anti_join
 import numpy
 import pandas
 
@@ -50,160 +69,3098 @@ def dbConn_unEscapeCurlyBrace(pwd):
     
     return( re.sub('\\}\\}', '}', pwd) )
 
+def _getConnectionString(databaseString):
+    """Retrieve and parse an ODBC connection string from keyring
+    
+    Parameters
+    ----------
+    databaseString : str 
+        The username for the keyring object you are wanting to connect to.
+    
+    Return
+    ------
+    tuple
+        The full ODBC connection string and a details dictionary with the keys 
+        'Driver', 'Server', 'Database', and 'UID'.
+    """
+    
+    #Retrieve database connection string
+    connString = keyring_wrappers.key_get("DB_conn", databaseString)
+    
+    #Parse string into details dictionary.
+    details = _parseConnectionDetails(connString)
+    
+    return connString, details
+
+
+
+def _parseConnectionDetails(connString):
+    """Parse the plain text details out of an ODBC connection string
+    
+    Parameters
+    ----------
+    connString : str
+        An ODBC connection string in the format 
+        'Driver={...};Server=...;Database=...;UID=...;PWD=...;'.
+    
+    Return
+    ------
+    dict
+        A details dictionary with the keys 'Driver', 'Server', 'Database', and 
+        'UID'.
+    """
+    
+    detailsMatch = re.search('^Driver=\\{?(.*?)\\}?;Server=(.*?);Database=(.*?);UID=(.*?);', connString)
+    details = {
+        'Driver' : detailsMatch.group(1),
+        'Server' : detailsMatch.group(2),
+        'Database' : detailsMatch.group(3),
+        'UID' : detailsMatch.group(4)
+    }
+    
+    return details
+
+
+
+def _createEngine(connString, **kwargs):
+    """Create a {sqlalchemy} engine from an ODBC connection string
+    
+    Parameters
+    ----------
+    connString : str
+        The full ODBC connection string.
+    **kwargs
+        Passed on to sqlalchemy.create_engine().
+    
+    Return
+    ------
+    sqlalchemy.engine.Engine
+        An odbc based engine for the SQL Database.
+    """
+    
+    return sqlalchemy.create_engine('mssql+pyodbc:///?odbc_connect={}'.format(connString), **kwargs)
+
+
+
 # databaseString = "chiefs.marc_pub.marcpub"
-def connectODBC(databaseString):
+def connectODBC(databaseString, registry = None, timeout = None, profiler = None):
     """Connect to ODBC Database Using keyring
     
-    Creates connection to ODBC database with {pyobdc} using the data contained 
-    in keyrings. This is generally used for internal purposes at MARC to make 
-    database connections a lazier and safer proccess with {keyring}. See 
-    documentation at ### to set up database connection keys.
+    Creates connection to ODBC database with {pyobdc} using the data contained 
+    in keyrings. This is generally used for internal purposes at MARC to make 
+    database connections a lazier and safer proccess with {keyring}. See 
+    documentation at ### to set up database connection keys.
+    
+    The keyring lookup happens right away, but the {pyodbc} connection and the
+    {sqlalchemy} engine are only created the first time they are accessed, so 
+    callers that only need one of them never open the other.
+    
+    Parameters
+    ----------
+    databaseString : str 
+        The username for the keyring object you are wanting to connect to. In 
+        the format of '<DB_Name>.<Schema>'.
+    registry : ODBCRegistry or None
+        If given (e.g. `marcpy.sql.defaultRegistry`), the keyring lookup is 
+        cached, the {pyodbc} connection is checked out of the registry's pool, 
+        and the {sqlalchemy} engine is the registry's shared engine for 
+        `databaseString`. Call `close()` on the result to give the connection 
+        back to the pool when finished. Default is None, which creates new, 
+        unshared objects.
+    timeout : int or None
+        Login timeout in seconds for the {pyodbc} connection, including new 
+        connections a registry opens for it (an idle pooled connection is 
+        reused without logging in). Default (None) uses the driver's default.
+    profiler : QueryProfiler or None
+        Records the 'keyring' phase now and a 'connect' phase whenever a 
+        handle is created. Default is None.
+    
+    Returns
+    -------
+    ODBCConnection
+        A read-only dictionary-like object with the following elements:
+            'pyodbc' - pyodbc.Connection - A {pyodbc} connection object for the 
+                SQL Database.
+            'sqlalchemy' - sqlalchemy.engine - An odbc based connection string 
+                object for connections to the SQL Database using {sqlalchemy}.
+            'details' - dictionary - holds plain text connection details. Has 
+                the keys: 'Driver', 'Server', 'Database', 'UID'.
+    """
+    
+    return ODBCConnection(databaseString, registry = registry, timeout = timeout, profiler = profiler)
+
+
+
+class ODBCConnection(collections.abc.Mapping):
+    """Lazily created {pyodbc} and {sqlalchemy} handles for one database
+    
+    This is the object returned by `connectODBC()`. It behaves like the 
+    read-only dictionary `connectODBC()` has always returned (with the keys 
+    'pyodbc', 'sqlalchemy', and 'details'), but the {pyodbc} connection and the
+    {sqlalchemy} engine are only created the first time their key is accessed.
+    
+    Parameters
+    ----------
+    databaseString : str 
+        The username for the keyring object you are wanting to connect to.
+    registry : ODBCRegistry or None
+        Optional registry to draw pooled handles from. See `connectODBC()`.
+    timeout : int or None
+        Login timeout in seconds for the {pyodbc} connection. See 
+        `connectODBC()`.
+    profiler : QueryProfiler or None
+        Records the keyring lookup and handle creation. See `connectODBC()`.
+    """
+    
+    _keys = ('pyodbc', 'sqlalchemy', 'details')
+    
+    def __init__(self, databaseString, registry = None, timeout = None, profiler = None):
+        self.databaseString = databaseString
+        self._registry = registry
+        self._timeout = timeout
+        self._profiler = _nullProfiler if profiler is None else profiler
+        self._lock = threading.Lock()
+        self._handles = {}
+        
+        #Retrieve database connection string and details
+        with self._profiler.phase('keyring', function = 'connectODBC', databaseString = databaseString):
+            if registry is None:
+                self._connString, self._details = _getConnectionString(databaseString)
+            else:
+                self._connString = None
+                self._details = registry.details(databaseString)
+    
+    def __getitem__(self, key):
+        if key == 'details':
+            return self._details
+        if key not in self._keys:
+            raise KeyError(key)
+        
+        with self._lock:
+            if key not in self._handles:
+                with self._profiler.phase('connect', function = 'connectODBC', databaseString = self.databaseString, handle = key):
+                    self._createHandle(key)
+            return self._handles[key]
+    
+    def _createHandle(self, key):
+        if key == 'pyodbc':
+            if self._registry is None:
+                if self._timeout is None:
+                    self._handles[key] = pyodbc.connect(self._connString)
+                else:
+                    self._handles[key] = pyodbc.connect(self._connString, timeout = self._timeout)
+            else:
+                self._handles[key] = self._registry.acquire(self.databaseString, timeout = self._timeout)
+        else:
+            if self._registry is None:
+                self._handles[key] = _createEngine(self._connString)
+            else:
+                self._handles[key] = self._registry.engine(self.databaseString)
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def __repr__(self):
+        opened = [x for x in self._keys if x in self._handles]
+        return "ODBCConnection('" + self.databaseString + "', opened = " + str(opened) + ")"
+    
+    def isOpen(self, key):
+        """Has the handle for `key` ('pyodbc' or 'sqlalchemy') been created yet?"""
+        
+        return key in self._handles
+    
+    def close(self):
+        """Close any handles that were created
+        
+        The {pyodbc} connection is closed (or released back to the registry) 
+        and an unshared {sqlalchemy} engine is disposed. Accessing a key again 
+        afterwards creates a new handle.
+        """
+        
+        with self._lock:
+            handles = self._handles
+            self._handles = {}
+        
+        if 'pyodbc' in handles:
+            if self._registry is None:
+                _closeQuietly(handles['pyodbc'])
+            else:
+                self._registry.release(self.databaseString, handles['pyodbc'])
+        if 'sqlalchemy' in handles and self._registry is None:
+            handles['sqlalchemy'].dispose()
+
+
+
+class ODBCRegistry:
+    """Process-wide pool of {pyodbc} connections and {sqlalchemy} engines
+    
+    Keeps the keyring lookup, a pool of idle {pyodbc} connections, and a single
+    {sqlalchemy} engine for every databaseString it is asked about, so repeated
+    calls for the same database reuse what is already open instead of 
+    reconnecting. It is thread safe. A shared instance is available as 
+    `marcpy.sql.defaultRegistry`.
+    
+    Note that the connection strings (including passwords) pulled from keyring
+    are held in memory for the life of the registry or until `close_all()`.
+    
+    Parameters
+    ----------
+    pool_size : int
+        The maximum number of idle {pyodbc} connections kept per 
+        databaseString. Connections released while the pool is full are 
+        closed. Also used as the `pool_size` of each {sqlalchemy} engine. 
+        Default is 5.
+    pre_ping : bool
+        Should pooled connections be checked with 'SELECT 1' before being 
+        handed out? Dead connections are discarded and replaced. Also sets 
+        `pool_pre_ping` on each engine. Default is True.
+    idle_timeout : int or float
+        Seconds a connection may sit idle in the pool before it is closed. 
+        Also used as the engine's `pool_recycle`. Default is 600.
+    
+    Example
+    -------
+    registry = marcpy.sql.defaultRegistry
+    with registry.connection("chiefs.marc_pub.marcpub") as conn:
+        df = marcpy.sql.getODBCtable(conn, "SELECT * FROM dbo.Table")
+    schemas = marcpy.sql.dbListSchemas(registry.engine("chiefs.marc_pub.marcpub"))
+    registry.close_all()
+    """
+    
+    def __init__(self, pool_size = 5, pre_ping = True, idle_timeout = 600):
+        self.pool_size = pool_size
+        self.pre_ping = pre_ping
+        self.idle_timeout = idle_timeout
+        self._lock = threading.RLock()
+        self._connStrings = {}
+        self._idle = {}
+        self._engines = {}
+    
+    def _connectionString(self, databaseString):
+        with self._lock:
+            if databaseString not in self._connStrings:
+                self._connStrings[databaseString] = _getConnectionString(databaseString)
+            return self._connStrings[databaseString]
+    
+    def details(self, databaseString):
+        """Get the plain text connection details for a databaseString
+        
+        Return
+        ------
+        dict
+            A copy of the details dictionary (see `connectODBC()`).
+        """
+        
+        return dict(self._connectionString(databaseString)[1])
+    
+    def engine(self, databaseString):
+        """Get the shared {sqlalchemy} engine for a databaseString
+        
+        The engine is created on first request and reused afterwards.
+        
+        Return
+        ------
+        sqlalchemy.engine.Engine
+            A pooled engine for the SQL Database.
+        """
+        
+        with self._lock:
+            if databaseString not in self._engines:
+                connString = self._connectionString(databaseString)[0]
+                self._engines[databaseString] = _createEngine(connString, pool_size = self.pool_size, pool_pre_ping = self.pre_ping, pool_recycle = self.idle_timeout)
+            return self._engines[databaseString]
+    
+    def acquire(self, databaseString, timeout = None):
+        """Check a {pyodbc} connection out of the pool
+        
+        Reuses the most recently released healthy connection for 
+        databaseString, or opens a new one if none are idle.
+        
+        Parameters
+        ----------
+        databaseString : str
+            The keyring username for the database.
+        timeout : int or None
+            Login timeout in seconds if a new connection is opened. Default 
+            (None) uses the driver's default.
+        
+        Return
+        ------
+        pyodbc.Connection
+            A connection that should be handed back with `release()`.
+        """
+        
+        self.evict_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(databaseString, [])
+                conn = idle.pop()[0] if len(idle) > 0 else None
+            if conn is None:
+                break
+            if not self.pre_ping or self._ping(conn):
+                return conn
+            _closeQuietly(conn)
+        
+        if timeout is None:
+            return pyodbc.connect(self._connectionString(databaseString)[0])
+        return pyodbc.connect(self._connectionString(databaseString)[0], timeout = timeout)
+    
+    def release(self, databaseString, conn):
+        """Return a {pyodbc} connection to the pool
+        
+        Any open transaction is rolled back. If the pool is already full (or 
+        the rollback fails) the connection is closed instead.
+        """
+        
+        try:
+            conn.rollback()
+        except Exception:
+            _closeQuietly(conn)
+            return
+        
+        with self._lock:
+            idle = self._idle.setdefault(databaseString, [])
+            if len(idle) < self.pool_size:
+                idle.append((conn, time.monotonic()))
+                conn = None
+        if conn is not None:
+            _closeQuietly(conn)
+    
+    @contextlib.contextmanager
+    def connection(self, databaseString):
+        """Context manager that acquires and releases a pooled connection"""
+        
+        conn = self.acquire(databaseString)
+        try:
+            yield conn
+        finally:
+            self.release(databaseString, conn)
+    
+    def evict_idle(self):
+        """Close pooled connections that have been idle past `idle_timeout`"""
+        
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for databaseString, idle in self._idle.items():
+                expired.extend(x[0] for x in idle if x[1] < cutoff)
+                idle[:] = [x for x in idle if x[1] >= cutoff]
+        for conn in expired:
+            _closeQuietly(conn)
+    
+    def close_all(self):
+        """Close every pooled connection and dispose of every engine
+        
+        Also forgets the cached connection strings. Connections that are 
+        currently checked out are not closed; they go into the new, empty pool
+        when they are released.
+        """
+        
+        with self._lock:
+            idle = [x[0] for pool in self._idle.values() for x in pool]
+            engines = list(self._engines.values())
+            self._idle = {}
+            self._engines = {}
+            self._connStrings = {}
+        for conn in idle:
+            _closeQuietly(conn)
+        for engine in engines:
+            engine.dispose()
+    
+    @staticmethod
+    def _ping(conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1").fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+
+
+def _closeQuietly(conn):
+    """Close a connection, ignoring errors from connections that are already dead"""
+    
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+
+defaultRegistry = ODBCRegistry()
+
+
+
+def _connectionDetails(conn):
+    """Get plain text connection details from any supported connection object
+    
+    Used to identify which database a query ran against (e.g. for 
+    `QueryCache` keys) without needing the password.
+    
+    Parameters
+    ----------
+    conn : ODBCConnection, dict, sqlalchemy.engine.Engine, or pyodbc.Connection
+        The result of `connectODBC()`, a {sqlalchemy} engine, or a {pyodbc} 
+        connection.
+    
+    Return
+    ------
+    dict
+        The connection details. For `connectODBC()` results and engines 
+        created by marcpy these are the 'Driver', 'Server', 'Database', and 
+        'UID' details.
+    """
+    
+    if isinstance(conn, collections.abc.Mapping):
+        return dict(conn['details'])
+    
+    if isinstance(conn, sqlalchemy.engine.Engine):
+        odbcConnect = conn.url.query.get('odbc_connect', None)
+        if odbcConnect is not None:
+            return _parseConnectionDetails(odbcConnect)
+        return {
+            'Driver' : conn.url.drivername,
+            'Server' : conn.url.host,
+            'Database' : conn.url.database,
+            'UID' : conn.url.username
+        }
+    
+    return {
+        'Driver' : conn.getinfo(pyodbc.SQL_DRIVER_NAME),
+        'Server' : conn.getinfo(pyodbc.SQL_SERVER_NAME),
+        'Database' : conn.getinfo(pyodbc.SQL_DATABASE_NAME),
+        'UID' : conn.getinfo(pyodbc.SQL_USER_NAME)
+    }
+
+
+
+def _pyodbcConnection(conn):
+    """Get the {pyodbc} connection from a `connectODBC()` result or pass one through"""
+    
+    if isinstance(conn, collections.abc.Mapping):
+        return conn['pyodbc']
+    return conn
+
+
+
+def _sqlalchemyConnection(conn):
+    """Get the {sqlalchemy} engine from a `connectODBC()` result or pass one through"""
+    
+    if isinstance(conn, collections.abc.Mapping):
+        return conn['sqlalchemy']
+    return conn
+
+
+
+class QueryProfiler:
+    """Record wall time, rows, and bytes for each phase of a SQL read
+    
+    Pass one to `connectODBC()` and/or `getODBCtable()` with `profiler = ` to
+    find out where the time goes. The phases recorded are 'keyring' (the 
+    keyring lookup), 'connect' (opening a {pyodbc} connection or {sqlalchemy}
+    engine), 'execute' (running the query), 'fetch' (pulling the rows over the
+    network), 'convert' (typing each column), and 'assemble' (building the 
+    dataframe). Each finished phase becomes a dictionary record that is kept 
+    in `records`, passed to `callback`, and appended to `logPath` as a line of
+    JSON.
+    
+    Parameters
+    ----------
+    callback : callable or None
+        Called with each record as soon as its phase finishes. Default is None.
+    logPath : str or None
+        A JSON lines file to append each record to. Default is None.
+    **context
+        Extra fields added to every record (e.g. job = "nightly_parcels").
+    
+    Example
+    -------
+    profiler = marcpy.sql.QueryProfiler(logPath = "reads.jsonl", job = "nightly")
+    conn = marcpy.sql.connectODBC("chiefs.marc_pub.marcpub", profiler = profiler)
+    df = marcpy.sql.getODBCtable(conn, "SELECT * FROM dbo.Parcels", profiler = profiler)
+    profiler.summary()
+    """
+    
+    def __init__(self, callback = None, logPath = None, **context):
+        self.callback = callback
+        self.logPath = logPath
+        self.context = context
+        self.records = []
+        self._lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def phase(self, name, **fields):
+        """Time a block of code as one phase
+        
+        Yields the record dictionary so the block can add 'rows', 'bytes', or
+        other fields to it. 'seconds' is filled in when the block exits.
+        """
+        
+        record = dict(self.context, phase = name, timestamp = datetime.datetime.now().isoformat(), **fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self._emit(record)
+    
+    def _emit(self, record):
+        with self._lock:
+            self.records.append(record)
+            if self.logPath is not None:
+                with open(self.logPath, "a") as f:
+                    f.write(json.dumps(record, default = str) + "\n")
+        if self.callback is not None:
+            self.callback(record)
+    
+    def summary(self):
+        """The records as a dataframe"""
+        
+        with self._lock:
+            return pandas.DataFrame(self.records)
+
+
+
+class _NullProfiler:
+    """Stand-in used when no `QueryProfiler` is given, so phases cost nothing"""
+    
+    def phase(self, name, **fields):
+        return contextlib.nullcontext({})
+
+
+_nullProfiler = _NullProfiler()
+
+
+
+class QueryCache:
+    """Persistent on-disk cache of query results
+    
+    Results are stored as uncompressed Arrow IPC (Feather) files, which keep 
+    the {pandas} dtypes and are memory-mapped when read back, so a cache hit 
+    skips the round trip to the server entirely. Entries are keyed by the 
+    connection details (see `connectODBC()`) plus a hash of the query (with 
+    only leading/trailing whitespace and a trailing semicolon removed, since 
+    whitespace inside string literals can change the result). Entries older than `ttl` are ignored and 
+    deleted, and once the cache grows past `max_bytes` the least recently used
+    entries are removed. Requires the optional dependency {pyarrow}.
+    
+    Pass an instance as the `cache` argument of `getODBCtable()`, 
+    `dbListSchemas()`, or `dbTableStructure()` to use it.
+    
+    Parameters
+    ----------
+    directory : str or None
+        Folder to store the cache in. It is created if needed. Default (None) 
+        is '~/.marcpy/query_cache'.
+    ttl : int or float
+        Seconds an entry stays valid after it is written. Default is 86400 
+        (one day).
+    max_bytes : int or float
+        Maximum total size of the cache on disk. Default is 2e9 (2GB).
+    
+    Example
+    -------
+    cache = marcpy.sql.QueryCache(ttl = 3600)
+    conn = marcpy.sql.connectODBC("chiefs.marc_pub.marcpub")
+    df = marcpy.sql.getODBCtable(conn, "SELECT * FROM dbo.ReferenceTable", cache = cache)
+    """
+    
+    def __init__(self, directory = None, ttl = 86400, max_bytes = 2e9):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".marcpy", "query_cache")
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok = True)
+    
+    @staticmethod
+    def normalizeQuery(query):
+        """Strip leading/trailing whitespace and a trailing semicolon from a query"""
+        
+        return query.strip().rstrip(";").strip()
+    
+    def key(self, details, query, *options):
+        """Create the cache key for a query
+        
+        Parameters
+        ----------
+        details : dict
+            The connection details (see `connectODBC()`).
+        query : str
+            The SQL query.
+        *options
+            Anything else that changes the result (parameters, dtype backend, 
+            etc). Must be convertible to str.
+        
+        Return
+        ------
+        str
+            A hex digest identifying the entry.
+        """
+        
+        keyData = json.dumps({
+            'details' : {k:str(v).lower() for k,v in details.items()},
+            'query' : self.normalizeQuery(query),
+            'options' : [str(x) for x in options]
+        }, sort_keys = True)
+        
+        return hashlib.sha256(keyData.encode("utf-8")).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".arrow")
+    
+    def get(self, key):
+        """Load a cached result
+        
+        Return
+        ------
+        dataframe or None
+            The cached dataframe, or None if there is no valid entry.
+        """
+        
+        pyarrow = _importPyarrow()
+        import pyarrow.feather
+        
+        path = self._path(key)
+        try:
+            stats = os.stat(path)
+        except FileNotFoundError:
+            return None
+        
+        if time.time() - stats.st_mtime > self.ttl:
+            self._remove(path)
+            return None
+        
+        try:
+            out = pyarrow.feather.read_table(path, memory_map = True).to_pandas()
+        except (OSError, pyarrow.ArrowException):
+            self._remove(path)
+            return None
+        
+        #Record the access time for LRU eviction while keeping the write time
+        os.utime(path, (time.time(), stats.st_mtime))
+        
+        return out
+    
+    def put(self, key, df):
+        """Store a result in the cache
+        
+        Results that cannot be stored as Arrow (e.g. duplicate column names) 
+        are skipped with a warning.
+        """
+        
+        pyarrow = _importPyarrow()
+        import pyarrow.feather
+        
+        path = self._path(key)
+        tmpPath = path + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+        try:
+            pyarrow.feather.write_feather(df.reset_index(drop = True), tmpPath, compression = "uncompressed")
+            os.replace(tmpPath, path)
+        except (ValueError, TypeError, pyarrow.ArrowException) as e:
+            self._remove(tmpPath)
+            warnings.warn("The result could not be stored in the query cache: " + str(e))
+            return
+        
+        self.evict()
+    
+    def evict(self):
+        """Delete expired entries and trim the cache to `max_bytes`"""
+        
+        with self._lock:
+            now = time.time()
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".arrow"):
+                    continue
+                try:
+                    stats = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stats.st_mtime > self.ttl:
+                    self._remove(entry.path)
+                else:
+                    entries.append((stats.st_atime, stats.st_size, entry.path))
+            
+            totalBytes = sum(x[1] for x in entries)
+            for atime, size, path in sorted(entries):
+                if totalBytes <= self.max_bytes:
+                    break
+                self._remove(path)
+                totalBytes = totalBytes - size
+    
+    def clear(self):
+        """Delete every entry in the cache"""
+        
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".arrow"):
+                self._remove(entry.path)
+    
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+
+def _readSQL(query, conn, cache = None):
+    """Run `pandas.read_sql()` with an optional `QueryCache`
+    
+    Parameters
+    ----------
+    query : str
+        SQL Query to server to request table
+    conn : sqlalchemy.Engine or ODBCConnection
+        A sqlalchemy engine or the result of `connectODBC()`.
+    cache : QueryCache or None
+        Cache to check before querying the server and to store the result in.
+    
+    Return
+    ------
+    dataframe
+        The result of `pandas.read_sql()`.
+    """
+    
+    if cache is not None:
+        cacheKey = cache.key(_connectionDetails(conn), query, "read_sql")
+        out = cache.get(cacheKey)
+        if out is not None:
+            return out
+    
+    out = pandas.read_sql(query, _sqlalchemyConnection(conn))
+    
+    if cache is not None:
+        cache.put(cacheKey, out)
+    
+    return out
+
+
+
+_ODBCColumn = collections.namedtuple('_ODBCColumn', ['name', 'type_code', 'display_size', 'internal_size', 'precision', 'scale', 'null_ok'])
+_ODBCColumn.__doc__ = """One column of a DB-API `cursor.description`"""
+
+_TypeConverter = collections.namedtuple('_TypeConverter', ['pandas', 'arrow'])
+
+_typeConverters = {}
+
+
+
+def registerTypeConverter(type_in, pandasConverter, arrowConverter = None):
+    """Register how a cursor type is converted into a dataframe column
+    
+    `getODBCtable()`, `iterODBCtable()`, and `exportQueryToParquet()` look up 
+    the type {pyodbc} reports for each column in `cursor.description` in this 
+    registry. Each entry is a pair of factories that are called once per 
+    column per result set and return the function that converts that column's
+    values, so any per-column work (reading the precision and scale, choosing a
+    dtype) happens once instead of once per value. Registering a type that is 
+    already registered replaces its converters.
+    
+    Parameters
+    ----------
+    type_in : type
+        The Python type {pyodbc} reports for the column (e.g. decimal.Decimal).
+    pandasConverter : callable
+        Called with the column's description (a namedtuple with the fields 
+        name, type_code, display_size, internal_size, precision, scale, and 
+        null_ok) and must return a function that takes a sequence of the 
+        column's values (with None for NULL) and returns an array-like 
+        (ideally a {pandas} ExtensionArray or {numpy} array) for the column.
+    arrowConverter : callable or None
+        The same as `pandasConverter`, but the returned function must return a
+        pyarrow.Array. Used by `dtype_backend = "pyarrow"` and 
+        `exportQueryToParquet()`. Default is None, which converts the output 
+        of `pandasConverter` to Arrow.
+    
+    Example
+    -------
+    #Keep money columns exact as integer cents instead of float64
+    marcpy.sql.registerTypeConverter(decimal.Decimal, marcpy.sql.decimalToScaledInt)
+    """
+    
+    _typeConverters[type_in] = _TypeConverter(pandasConverter, arrowConverter)
+
+
+
+def _fixedDtypeConverter(dtype):
+    """Create a converter factory that builds a {pandas} array with a fixed dtype"""
+    
+    def factory(column):
+        return lambda values: pandas.array(values, dtype = dtype)
+    return factory
+
+
+
+def _fixedArrowConverter(arrowTypeName, *args):
+    """Create a converter factory that builds a pyarrow.Array of a fixed type
+    
+    The {pyarrow} type is looked up by name when the factory is called so that
+    {pyarrow} is only imported when the Arrow backend is used.
+    """
+    
+    def factory(column):
+        pyarrow = _importPyarrow()
+        arrowType = getattr(pyarrow, arrowTypeName)(*args)
+        return lambda values: pyarrow.array(values, type = arrowType)
+    return factory
+
+
+
+def _fitsNanoseconds(values):
+    """Check that a datetime64 array is within the datetime64[ns] range"""
+    
+    finite = values[~numpy.isnat(values)]
+    if len(finite) == 0:
+        return True
+    return finite.min() >= numpy.datetime64(pandas.Timestamp.min) and finite.max() <= numpy.datetime64(pandas.Timestamp.max)
+
+
+
+def datetimeConverter(column):
+    """Converter factory for date and datetime columns
+    
+    Converts the whole column to `datetime64[ns]` with a single {numpy} array 
+    conversion. Columns holding dates outside of the datetime64[ns] range 
+    (like the 9999-12-31 sentinel dates common in SQL Server) are kept at 
+    microsecond resolution instead of silently overflowing.
+    
+    Parameters
+    ----------
+    column : namedtuple
+        The column description. Not used.
+    
+    Return
+    ------
+    callable
+        Converts a sequence of dates/datetimes (None for NULL) to a 
+        DatetimeArray.
+    """
+    
+    def convert(values):
+        out = numpy.array(values, dtype = "datetime64[us]")
+        if _fitsNanoseconds(out):
+            out = out.astype("datetime64[ns]")
+        return pandas.array(out)
+    return convert
+
+
+
+def decimalToFloat(column):
+    """Converter factory for decimal columns as Float64
+    
+    The default converter for decimal.Decimal (SQL Server DECIMAL, NUMERIC, 
+    MONEY). {numpy} converts the whole column to float64 in one pass. Values 
+    with more than 15 significant digits lose precision; register 
+    `decimalToScaledInt()` instead if that matters.
+    
+    Parameters
+    ----------
+    column : namedtuple
+        The column description. Not used.
+    
+    Return
+    ------
+    callable
+        Converts a sequence of decimals (None for NULL) to a Float64 array.
+    """
+    
+    return lambda values: pandas.array(numpy.array(values, dtype = "float64"), dtype = "Float64")
+
+
+
+def decimalToScaledInt(column):
+    """Converter factory for decimal columns as exact fixed-scale integers
+    
+    Stores each value multiplied by 10^scale (from the column's description) 
+    as an Int64, e.g. a MONEY column (scale 4) becomes ten-thousandths. The 
+    values stay exact, and integer math is fast. Divide by 10^scale to get the
+    original value back. Register it with 
+    `registerTypeConverter(decimal.Decimal, decimalToScaledInt)`.
+    
+    Columns with a precision of 18 or less always fit in int64, so they are 
+    scaled as one {numpy} object array and cast once. Wider or undeclared 
+    precisions are converted value by value.
+    
+    Parameters
+    ----------
+    column : namedtuple
+        The column description. The `scale` field is used.
+    
+    Return
+    ------
+    callable
+        Converts a sequence of decimals (None for NULL) to an Int64 array.
+    """
+    
+    scale = column.scale if column.scale is not None else 0
+    factor = 10 ** scale
+    fitsInt64 = column.precision is not None and 0 < column.precision <= 18
+    
+    def convert(values):
+        if not fitsInt64:
+            return pandas.array([None if x is None else int(x.scaleb(scale)) for x in values], dtype = "Int64")
+        data = numpy.array(values, dtype = object)
+        mask = pandas.isna(data)
+        data[mask] = 0
+        return pandas.arrays.IntegerArray((data * factor).astype("int64"), mask)
+    return convert
+
+
+
+def _decimalToArrow(column):
+    """Arrow converter factory for decimal columns that keeps the declared precision and scale"""
+    
+    pyarrow = _importPyarrow()
+    if column.precision is not None and column.scale is not None and 0 < column.precision <= 38:
+        arrowType = pyarrow.decimal128(column.precision, column.scale)
+        return lambda values: pyarrow.array(values, type = arrowType)
+    #No usable precision (e.g. inferred types): pyarrow won't cast Decimal to float64 itself
+    return lambda values: pyarrow.array(numpy.array(values, dtype = "float64"), from_pandas = True)
+
+
+
+def _bytesConverter(column):
+    """Converter factory for binary columns (VARBINARY, IMAGE, TIMESTAMP, and spatial types)"""
+    
+    return lambda values: pandas.array([None if x is None else bytes(x) for x in values], dtype = object)
+
+
+
+def _bytesToArrow(column):
+    pyarrow = _importPyarrow()
+    return lambda values: pyarrow.array([None if x is None else bytes(x) for x in values], type = pyarrow.binary())
+
+
+
+def _uuidConverter(column):
+    """Converter factory for UNIQUEIDENTIFIER columns as strings"""
+    
+    return lambda values: pandas.array([None if x is None else str(x) for x in values], dtype = "string")
+
+
+
+def _uuidToArrow(column):
+    pyarrow = _importPyarrow()
+    return lambda values: pyarrow.array([None if x is None else str(x) for x in values], type = pyarrow.string())
+
+
+
+registerTypeConverter(bool, _fixedDtypeConverter("boolean"), _fixedArrowConverter("bool_"))
+registerTypeConverter(int, _fixedDtypeConverter("Int64"), _fixedArrowConverter("int64"))
+registerTypeConverter(float, _fixedDtypeConverter("Float64"), _fixedArrowConverter("float64"))
+registerTypeConverter(str, _fixedDtypeConverter("string"), _fixedArrowConverter("string"))
+registerTypeConverter(datetime.date, datetimeConverter, _fixedArrowConverter("date32"))
+registerTypeConverter(datetime.datetime, datetimeConverter, _fixedArrowConverter("timestamp", "us"))
+registerTypeConverter(datetime.time, _fixedDtypeConverter(object), _fixedArrowConverter("time64", "us"))
+registerTypeConverter(decimal.Decimal, decimalToFloat, _decimalToArrow)
+registerTypeConverter(bytes, _bytesConverter, _bytesToArrow)
+registerTypeConverter(bytearray, _bytesConverter, _bytesToArrow)
+registerTypeConverter(memoryview, _bytesConverter, _bytesToArrow)
+registerTypeConverter(uuid.UUID, _uuidConverter, _uuidToArrow)
+
+_defaultTypeConverters = dict(_typeConverters)
+
+
+
+#Masked {pandas} dtype used for each compact {numpy} dtype when a column allows NULL
+_maskedDtypes = {
+    'bool' : "boolean", 'uint8' : "UInt8", 'int8' : "Int8", 'int16' : "Int16", 
+    'int32' : "Int32", 'int64' : "Int64", 'float32' : "Float32", 'float64' : "Float64"
+}
+
+def _compactDtype(column):
+    """Pick the smallest {numpy} dtype that holds a column's declared type
+    
+    Uses the precision and scale from the cursor description. SQL Server 
+    reports a precision of 3 for TINYINT, 5 for SMALLINT, 10 for INT, 19 for 
+    BIGINT, and 24 for REAL.
+    
+    Parameters
+    ----------
+    column : namedtuple
+        The column description.
+    
+    Return
+    ------
+    str or None
+        A {numpy} dtype name, or None if the column can't be made smaller than
+        the default conversion.
+    """
+    
+    precision = column.precision
+    if column.type_code is bool:
+        return "bool"
+    if precision is None or precision <= 0:
+        return None
+    
+    if column.type_code is int:
+        if precision <= 3:
+            return "uint8"
+        if precision <= 5:
+            return "int16"
+        if precision <= 10:
+            return "int32"
+        return "int64"
+    
+    if column.type_code is float:
+        return "float32" if precision <= 24 else "float64"
+    
+    if column.type_code is decimal.Decimal:
+        if column.scale == 0 and precision <= 18:
+            if precision <= 2:
+                return "int8"
+            if precision <= 4:
+                return "int16"
+            if precision <= 9:
+                return "int32"
+            return "int64"
+        if precision <= 6:
+            return "float32"
+    
+    return None
+
+
+
+def _compactConverter(column, dtypeName, chunked = False):
+    """Converter factory for a compact dtype from `_compactDtype()`
+    
+    NOT NULL columns get the plain {numpy} dtype and nullable columns get the 
+    matching masked {pandas} dtype. If a NOT NULL column turns out to hold a 
+    NULL anyway, it falls back to the masked dtype instead of turning the NULL
+    into False/NaN. When the result is built in chunks, every column gets the
+    masked dtype so a NULL in a later chunk can't change the chunk dtypes.
+    """
+    
+    maskedName = _maskedDtypes[dtypeName]
+    isDecimal = column.type_code is decimal.Decimal
+    isInteger = dtypeName not in ("bool", "float32", "float64")
+    usePlain = not column.null_ok and not chunked
+    
+    def convert(values):
+        hasNull = any(x is None for x in values)
+        if isDecimal:
+            if isInteger:
+                values = [None if x is None else int(x) for x in values]
+            else:
+                values = [None if x is None else float(x) for x in values]
+        if usePlain and not hasNull:
+            return numpy.array(values, dtype = dtypeName)
+        return pandas.array(values, dtype = maskedName)
+    return convert
+
+
+
+def _categorize(df, categoryThreshold):
+    """Convert low-cardinality string columns to categoricals
+    
+    Parameters
+    ----------
+    df : pandas.Dataframe
+        The dataframe to convert in place.
+    categoryThreshold : float
+        String columns where the number of distinct values divided by the 
+        number of rows is at or below this ratio become categoricals.
+    
+    Return
+    ------
+    dataframe
+        The same dataframe.
+    """
+    
+    if df.shape[0] == 0:
+        return df
+    
+    for i in range(0, df.shape[1]):
+        series = df.iloc[:, i]
+        isArrowString = isinstance(series.dtype, pandas.ArrowDtype) and str(series.dtype.pyarrow_dtype) in ("string", "large_string")
+        if not (isinstance(series.dtype, pandas.StringDtype) or isArrowString):
+            continue
+        if series.nunique(dropna = True) / df.shape[0] <= categoryThreshold:
+            df.isetitem(i, series.astype("category"))
+    
+    return df
+
+
+
+#SQL Server spatial (geometry/geography) and other CLR types are returned as 
+#SQL_SS_UDT, which {pyodbc} can't read without an output converter.
+_SQL_SS_UDT = -151
+
+def _addUDTConverter(conn):
+    """Let a {pyodbc} connection read geometry/geography columns as raw bytes
+    
+    The bytes are SQL Server's native serialization. Select `geom.STAsBinary()`
+    instead if you need well-known binary. Connections that already have a 
+    converter for the type (and non-{pyodbc} connections) are left alone.
+    """
+    
+    if hasattr(conn, "add_output_converter") and conn.get_output_converter(_SQL_SS_UDT) is None:
+        conn.add_output_converter(_SQL_SS_UDT, bytes)
+
+
+
+def _importPyarrow():
+    """Import {pyarrow} or raise a helpful error
+    
+    {pyarrow} is an optional dependency of marcpy that is only needed for the
+    Arrow backed functionality in this module.
+    
+    Return
+    ------
+    module
+        The imported pyarrow module.
+    """
+    
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("This functionality requires the optional dependency 'pyarrow'. Install it with 'conda install pyarrow' or 'pip install pyarrow'.")
+    
+    return pyarrow
+
+
+
+def _describeCursor(cursor):
+    """Get the column descriptions from a cursor
+    
+    Parameters
+    ----------
+    cursor : pyodbc.Cursor
+        A {pyodbc} cursor that has already executed a query.
+    
+    Return
+    ------
+    list
+        A list of namedtuples with the fields name, type_code, display_size, 
+        internal_size, precision, scale, and null_ok.
+    """
+    
+    return [_ODBCColumn(*column[:7]) for column in cursor.description]
+
+
+
+_typeSampleSize = 1000
+
+def _needsTypeInference(columns):
+    """Does any column lack a Python type in the cursor description?
+    
+    {pyodbc} reports a Python type for every column. Other DB-API 2.0 drivers 
+    report None (sqlite3), a type OID (psycopg), or their own type objects 
+    (DuckDB), so those columns have to be typed from their values instead.
+    """
+    
+    return any(not isinstance(x.type_code, type) for x in columns)
+
+
+
+def _inferColumnTypes(columns, rows, sampleSize = None):
+    """Fill in a Python type for columns the cursor description left untyped
+    
+    Each untyped column is typed from the non-null values in the first 
+    `sampleSize` rows (or, if those are all null, its first non-null value 
+    further down). Values are matched to the `registerTypeConverter()` 
+    registry through their class hierarchy. Integer and float values mixed in
+    one column become float; columns with only nulls become str. The declared
+    precision and scale of inferred columns are dropped since they don't 
+    follow SQL Server's conventions.
+    
+    Parameters
+    ----------
+    columns : list
+        Column descriptions from `_describeCursor()`.
+    rows : list
+        The fetched rows (or the first chunk of them).
+    sampleSize : int or None
+        The number of rows to sample. Default (None) is 1000.
+    
+    Return
+    ------
+    list
+        The column descriptions, with the untyped ones given a type_code.
+    """
+    
+    if sampleSize is None:
+        sampleSize = _typeSampleSize
+    
+    out = list(columns)
+    sample = rows[:sampleSize]
+    for i, column in enumerate(columns):
+        if isinstance(column.type_code, type):
+            continue
+        
+        types = {type(x[i]) for x in sample if x[i] is not None}
+        if len(types) == 0:
+            firstValue = next((x[i] for x in rows[sampleSize:] if x[i] is not None), None)
+            types = {str} if firstValue is None else {type(firstValue)}
+        
+        managed = set()
+        for valueType in types:
+            registered = next((x for x in valueType.__mro__ if x in _typeConverters), None)
+            if registered is None:
+                raise RuntimeError("Column '" + str(column.name) + "' holds values of the unmanaged datatype '" + str(valueType) + "'.\nPlease register a converter for it with `marcpy.sql.registerTypeConverter()`.")
+            managed.add(registered)
+        if managed == {int, float}:
+            managed = {float}
+        if managed == {bool, int}:
+            managed = {int}
+        if len(managed) > 1:
+            raise RuntimeError("Column '" + str(column.name) + "' holds values of more than one datatype ['" + "', '".join(sorted(str(x) for x in managed)) + "'].\nCAST it to a single type in the query.")
+        
+        out[i] = column._replace(type_code = managed.pop(), precision = None, scale = None, null_ok = True if column.null_ok is None else column.null_ok)
+    
+    return out
+
+
+
+def _columnConverters(columns, dtype_backend = "numpy_nullable", compact = False, chunked = False):
+    """Build the converter for every column of a result set
+    
+    Internal helper shared by `getODBCtable()`, `iterODBCtable()`, and 
+    `exportQueryToParquet()` so that every result built from a {pyodbc} cursor
+    gets typed the same way. Raises an error if any of the column types are 
+    not in the `registerTypeConverter()` registry.
+    
+    Parameters
+    ----------
+    columns : list
+        Column descriptions from `_describeCursor()`.
+    dtype_backend : str
+        'numpy_nullable' for the {pandas} nullable dtypes, 'pyarrow' for 
+        pandas.ArrowDtype columns, or 'arrow' for the raw pyarrow.Array 
+        converters.
+    compact : bool
+        Should columns that still use the default converter be given the 
+        smallest dtype their declared precision, scale, and nullability allow 
+        (see `_compactDtype()`)? Default is False.
+    chunked : bool
+        Will the converters be applied chunk by chunk? Compact columns then 
+        always use masked dtypes so every chunk gets the same dtypes. Default
+        is False.
+    
+    Return
+    ------
+    list
+        One function per column that converts a sequence of values into the 
+        column's array.
+    """
+    
+    if dtype_backend not in ("numpy_nullable", "pyarrow", "arrow"):
+        raise ValueError("'dtype_backend' must be either 'numpy_nullable' or 'pyarrow', not '" + str(dtype_backend) + "'.")
+    
+    #Make sure all types are managed by the registry
+    unmanaged = [x for x in columns if x.type_code not in _typeConverters]
+    if len(unmanaged) > 0:
+        message = "The following column(s) ['" + "', '".join([x.name for x in unmanaged]) + "'] have the following unmanaged datatype(s) ['" + "', '".join([str(x.type_code) for x in unmanaged]) + "'] for conversion to a pandas DataFrame."
+        message = message + "\nPlease register a converter for the unmanaged datatype(s) with `marcpy.sql.registerTypeConverter()`."
+        raise RuntimeError(message)
+    
+    converters = []
+    for column in columns:
+        entry = _typeConverters[column.type_code]
+        if compact and entry is _defaultTypeConverters.get(column.type_code, None):
+            compactDtype = _compactDtype(column)
+            if compactDtype is not None:
+                entry = _TypeConverter(lambda x, dtypeName = compactDtype: _compactConverter(x, dtypeName, chunked), None)
+        
+        if dtype_backend == "numpy_nullable":
+            converters.append(entry.pandas(column))
+            continue
+        
+        if entry.arrow is not None:
+            arrowConverter = entry.arrow(column)
+        else:
+            arrowConverter = _arrowFromPandasConverter(entry.pandas(column))
+        if dtype_backend == "pyarrow":
+            converters.append(_wrapArrowConverter(arrowConverter))
+        else:
+            converters.append(arrowConverter)
+    
+    return converters
+
+
+
+def _arrowFromPandasConverter(pandasConverter):
+    """Turn a {pandas} column converter into a {pyarrow} one"""
+    
+    pyarrow = _importPyarrow()
+    return lambda values: pyarrow.array(pandasConverter(values), from_pandas = True)
+
+
+
+def _wrapArrowConverter(arrowConverter):
+    """Turn a {pyarrow} column converter into one that returns a pandas.ArrowDtype array"""
+    
+    return lambda values: pandas.arrays.ArrowExtensionArray(arrowConverter(values))
+
+
+
+def _transposeRows(rows, nColumns):
+    """Transpose rows into one value buffer per column in a single pass"""
+    
+    if len(rows) == 0:
+        return [()] * nColumns
+    return list(zip(*rows))
+
+
+
+def _estimateRowBytes(columns, pythonObjects = False):
+    """Estimate the size of one row from the cursor description
+    
+    Uses each column's internal size, capped at 8000 bytes for (MAX) and other
+    columns that report no useful size, with a floor of 8 bytes per value.
+    
+    Parameters
+    ----------
+    columns : list
+        The `_ODBCColumn`s from `_describeCursor()`.
+    pythonObjects : bool
+        Should the row be sized as a fetched {pyodbc} row held in Python 
+        instead of as raw data? That adds the row object, one pointer per 
+        value, and the object overhead of every value, and sizes every value 
+        of unknown length at 8000 bytes, so the estimate errs on the high 
+        side. Default is False.
+    
+    Return
+    ------
+    int
+        The estimated bytes per row.
+    """
+    
+    rowBytes = 56 + 8 * len(columns) if pythonObjects else 0
+    for column in columns:
+        size = column.internal_size
+        isVariable = column.type_code in (str, bytes, bytearray)
+        if not isinstance(size, int) or size <= 0 or size > 8000:
+            size = 8000 if isVariable or pythonObjects else 8
+        if not pythonObjects:
+            rowBytes += max(size, 8)
+        elif column.type_code is str:
+            rowBytes += 49 + size
+        elif isVariable:
+            rowBytes += 33 + size
+        elif column.type_code is decimal.Decimal:
+            rowBytes += 104
+        elif column.type_code in (datetime.datetime, datetime.date, datetime.time, uuid.UUID):
+            rowBytes += 48
+        else:
+            rowBytes += 32
+    
+    return rowBytes
+
+
+
+def _parseByteSize(size):
+    """Turn a size like '2GB', '512 MB', or 1e9 into a number of bytes
+    
+    Units are powers of 1024 ('KB', 'MB', 'GB', 'TB', with or without the 'i'
+    or the 'B').
+    """
+    
+    if isinstance(size, (int, float)):
+        return int(size)
+    
+    sizeMatch = re.match("^\\s*([0-9]*\\.?[0-9]+)\\s*([KMGT]?)I?B?\\s*$", str(size).upper())
+    if sizeMatch is None:
+        raise ValueError("Can't parse the size '" + str(size) + "'. Use a number of bytes or a string like '2GB'.")
+    
+    return int(float(sizeMatch.group(1)) * 1024 ** " KMGT".index(sizeMatch.group(2) or " "))
+
+
+
+def _rowsToDataFrame(rows, names, converters, profiler = _nullProfiler):
+    """Build a typed {pandas} dataframe from {pyodbc} rows
+    
+    The rows are transposed into per-column buffers in a single pass and each 
+    buffer is converted straight into a typed {pandas} array, so the cost is 
+    one walk over the data instead of one walk per column.
+    
+    Parameters
+    ----------
+    rows : list
+        List of pyodbc.Row objects (or tuples) returned by the cursor.
+    names : list
+        The column names.
+    converters : list
+        The converter for each column from `_columnConverters()`.
+    profiler : QueryProfiler
+        Records the 'convert' and 'assemble' phases.
+    
+    Return
+    ------
+    dataframe
+        A pandas dataframe with one column per name.
+    """
+    
+    with profiler.phase('convert', rows = len(rows)) as record:
+        colData = _transposeRows(rows, len(names))
+        
+        #Type each column buffer. Keyed by position so duplicate names survive.
+        outArrays = {}
+        for i in range(0,len(names)):
+            outArrays[i] = converters[i](colData[i])
+        record['bytes'] = int(sum(getattr(x, 'nbytes', 0) for x in outArrays.values()))
+    
+    with profiler.phase('assemble', rows = len(rows)) as record:
+        outPdf = pandas.DataFrame(outArrays, copy = False)
+        outPdf.columns = names
+        record['bytes'] = int(outPdf.memory_usage(index = False).sum())
+
+    return outPdf
+
+
+
+def _executeQuery(cursor, query, params = None):
+    """Execute a query on a cursor with optional parameters
+    
+    Parameters
+    ----------
+    cursor : pyodbc.Cursor
+        A {pyodbc} cursor.
+    query : str
+        SQL Query to execute. May contain '?' parameter markers.
+    params : list, tuple, or None
+        Values for the parameter markers in `query`.
+    """
+    
+    if params is None or len(params) == 0:
+        cursor.execute(query)
+    else:
+        cursor.execute(query, list(params))
+
+
+
+def _removeQuietly(path):
+    """Delete a file, ignoring errors (e.g. it is still memory mapped on Windows)"""
+    
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+
+def _fetchWithinBudget(cursor, columns, converters, dtype_backend, compact, memory_limit, on_limit, spill_dir, profiler):
+    """Fetch a result in batches sized to a memory budget
+    
+    Internal helper for `getODBCtable(memory_limit = )`. The batch size is 
+    picked so the raw rows of one batch use about a quarter of the budget 
+    (from `_estimateRowBytes(pythonObjects = True)`). Each batch is typed as 
+    soon as it arrives so the raw rows can be freed. Typed batches are held 
+    until they use half of the budget (combining them at the end makes one 
+    copy). Past that the result is either spilled to a memory mapped Arrow 
+    file or a MemoryError is raised, depending on `on_limit`.
+    
+    Return
+    ------
+    tuple
+        The query results and whether they were spilled. Spilled results have
+        pandas.ArrowDtype columns backed by the memory mapped file.
+    """
+    
+    if on_limit not in ("spill", "raise"):
+        raise ValueError("'on_limit' must be either 'spill' or 'raise', not '" + str(on_limit) + "'.")
+    
+    names = [x.name for x in columns]
+    batchSize = int(min(max(memory_limit // 4 // _estimateRowBytes(columns, pythonObjects = True), 1), 1000000))
+    batches = []
+    heldBytes = 0
+    spill = None
+    
+    try:
+        while True:
+            with profiler.phase('fetch', function = 'getODBCtable', batchSize = batchSize) as record:
+                rows = cursor.fetchmany(batchSize)
+                record['rows'] = len(rows)
+                record['bytes'] = len(rows) * _estimateRowBytes(columns)
+            if len(rows) == 0:
+                break
+            if converters is None:
+                columns = _inferColumnTypes(columns, rows)
+                converters = _columnConverters(columns, dtype_backend, compact, chunked = True)
+            batch = _rowsToDataFrame(rows, names, converters, profiler)
+            del rows
+            
+            if spill is None:
+                batches.append(batch)
+                heldBytes += int(batch.memory_usage(index = False, deep = True).sum())
+                if heldBytes <= memory_limit / 2:
+                    continue
+                if on_limit == "raise":
+                    raise MemoryError("The query result is larger than the memory_limit of " + str(memory_limit) + " bytes. Use `iterODBCtable()` or `exportQueryToParquet()` to stream it, or on_limit = 'spill'.")
+                
+                #Start spilling everything fetched so far to disk
+                pyarrow = _importPyarrow()
+                spillFile = tempfile.NamedTemporaryFile(prefix = "marcpy_spill_", suffix = ".arrow", dir = spill_dir, delete = False)
+                spillFile.close()
+                schema = pyarrow.Table.from_pandas(batches[0], preserve_index = False).schema
+                spill = {'path' : spillFile.name, 'schema' : schema, 'writer' : pyarrow.ipc.new_file(spillFile.name, schema)}
+                for heldBatch in batches:
+                    spill['writer'].write_table(pyarrow.Table.from_pandas(heldBatch, schema = schema, preserve_index = False))
+                batches = []
+                heldBytes = 0
+            else:
+                spill['writer'].write_table(pyarrow.Table.from_pandas(batch, schema = spill['schema'], preserve_index = False))
+            del batch
+    except BaseException:
+        if spill is not None:
+            spill['writer'].close()
+            _removeQuietly(spill['path'])
+        raise
+    
+    if spill is None:
+        if converters is None:
+            converters = _columnConverters(_inferColumnTypes(columns, []), dtype_backend, compact, chunked = True)
+        if len(batches) == 0:
+            return _rowsToDataFrame([], names, converters), False
+        with profiler.phase('assemble', function = 'getODBCtable', rows = sum(len(x) for x in batches)):
+            outPdf = pandas.concat(batches, ignore_index = True) if len(batches) > 1 else batches[0]
+        return outPdf, False
+    
+    #Map the spilled result back in. Its pages come from disk instead of RAM.
+    spill['writer'].close()
+    with profiler.phase('assemble', function = 'getODBCtable', spilled = True):
+        outPdf = pyarrow.ipc.open_file(pyarrow.memory_map(spill['path'])).read_all().to_pandas(types_mapper = pandas.ArrowDtype)
+    outPdf.columns = names
+    
+    #POSIX keeps the mapping after the file is removed. Windows doesn't allow
+    #removing a mapped file, so try again at exit.
+    try:
+        os.remove(spill['path'])
+    except OSError:
+        atexit.register(_removeQuietly, spill['path'])
+    
+    return outPdf, True
+
+
+
+def getODBCtable(conn, query, dtype_backend = "numpy_nullable", params = None, cache = None, compact = False, categoryThreshold = None, profiler = None, 
+                 memory_limit = None, on_limit = "spill", spill_dir = None):
+    """Get a {pandas} dataframe from the {pyodbc} connection
+    
+    This function is a more explicit implimentation of `pandas.read_sql()` when
+    working in an MSsql database. It builds up a dataframe using only the data
+    returned by the {pyodbc} cursor object. It was created so that columns get 
+    correctly typed without coercing too soon. The `pandas.read_sql()` function
+    defaults to the old {pandas} types prior to 1.0 (when the pandas.na) was 
+    introduced for backwards compatibility. This is made to correctly type 
+    data according to the new specifications.
+    
+    For results that are too large to hold in memory at once, see 
+    `iterODBCtable()`.
+    
+    Parameters
+    ----------
+    conn : pyodbc.Connection, ODBCConnection, or DB-API 2.0 connection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`. Other DB-API 2.0 connections (sqlite3, DuckDB, 
+        psycopg, etc) work too: columns whose cursor description has no 
+        Python type are typed by sampling their values.
+    query : str
+        SQL Query to server to request table
+    dtype_backend : str
+        Which dtypes to give the returned columns. 'numpy_nullable' (default) 
+        uses the {pandas} nullable types ('Int64', 'string', etc). 'pyarrow' 
+        returns pandas.ArrowDtype columns, which store strings far more 
+        compactly and can be handed to {pyarrow} (e.g. Parquet) without another
+        conversion. Requires the optional dependency {pyarrow}.
+    params : list, tuple, or None
+        Values for any '?' parameter markers in `query`. Default is None.
+    cache : QueryCache or None
+        If given, the result is loaded from this cache when a valid entry 
+        exists and stored in it otherwise. Passing the result of 
+        `connectODBC()` as `conn` means a cache hit never opens a {pyodbc} 
+        connection. Default is None.
+    compact : bool
+        Should columns get the smallest dtype that their declared type allows?
+        Uses the precision, scale, and nullability from the cursor 
+        description: NOT NULL integer, bit, and float columns get plain {numpy}
+        dtypes instead of masked ones, integers are sized to their SQL type 
+        (TINYINT -> uint8, SMALLINT -> int16, INT -> int32), REAL becomes 
+        float32, and DECIMAL/NUMERIC columns with a scale of 0 become 
+        integers. Only applies to types using the default converters. 
+        Default is False.
+    categoryThreshold : float or None
+        If given, string columns whose ratio of distinct values to rows is at
+        or below this value (e.g. 0.05) are converted to categoricals. 
+        Default is None.
+    profiler : QueryProfiler or None
+        Records the time spent in each phase of the read ('connect', 
+        'execute', 'fetch', 'convert', and 'assemble'), with the row count and
+        bytes. The 'fetch' bytes are estimated from the cursor description. 
+        Default is None.
+    memory_limit : int, str, or None
+        A memory budget for the read, as bytes or a string like '2GB'. The 
+        rows are fetched in batches sized from the row width estimated from 
+        the cursor description, and each batch is typed as it arrives instead
+        of holding the whole raw result. See `on_limit` for what happens when
+        the result outgrows the budget. Default is None, which fetches 
+        everything at once.
+    on_limit : str
+        Only used with `memory_limit`. 'spill' (default) writes the result to
+        a temporary Arrow file and returns a dataframe of pandas.ArrowDtype 
+        columns memory mapped from it (requires {pyarrow}). 'raise' raises a 
+        MemoryError so the caller can switch to `iterODBCtable()` or 
+        `exportQueryToParquet()`.
+    spill_dir : str or None
+        The directory for spill files. Default (None) is the system temp 
+        directory.
+        
+    Return
+    ------
+    dataframe
+        A pandas dataframe with the query results.
+    """
+    
+    if profiler is None:
+        profiler = _nullProfiler
+    spilled = False
+    
+    if cache is not None:
+        #Budgeted reads type compact columns with masked dtypes, so they are cached apart
+        cacheKey = cache.key(_connectionDetails(conn), query, dtype_backend, params, compact, categoryThreshold, memory_limit is not None)
+        outPdf = cache.get(cacheKey)
+        if outPdf is not None:
+            return outPdf
+    
+    #Read from Database
+    with profiler.phase('connect', function = 'getODBCtable'):
+        conn = _pyodbcConnection(conn)
+        _addUDTConverter(conn)
+    cursor = conn.cursor()
+    try:
+        with profiler.phase('execute', function = 'getODBCtable'):
+            _executeQuery(cursor, query, params)
+            columns = _describeCursor(cursor)
+            inferTypes = _needsTypeInference(columns)
+            converters = None if inferTypes else _columnConverters(columns, dtype_backend, compact, chunked = memory_limit is not None)
+        if memory_limit is not None:
+            outPdf, spilled = _fetchWithinBudget(cursor, columns, converters, dtype_backend, compact, _parseByteSize(memory_limit), on_limit, spill_dir, profiler)
+            conn.commit()
+        else:
+            with profiler.phase('fetch', function = 'getODBCtable') as record:
+                rows = cursor.fetchall()
+                conn.commit()
+                record['rows'] = len(rows)
+                record['bytes'] = len(rows) * _estimateRowBytes(columns)
+    finally:
+        cursor.close()
+    
+    if memory_limit is None:
+        if inferTypes:
+            columns = _inferColumnTypes(columns, rows)
+            converters = _columnConverters(columns, dtype_backend, compact)
+        outPdf = _rowsToDataFrame(rows, [x.name for x in columns], converters, profiler)
+    if categoryThreshold is not None:
+        outPdf = _categorize(outPdf, categoryThreshold)
+    
+    #A spilled result is backed by a memory mapped file, so it isn't cached
+    if cache is not None and not spilled:
+        cache.put(cacheKey, outPdf)
+
+    return outPdf
+
+
+
+def iterODBCtable(conn, query, chunksize = 100000, dtype_backend = "numpy_nullable", params = None, compact = False):
+    """Iterate over a {pyodbc} query result in typed {pandas} chunks
+    
+    A streaming version of `getODBCtable()`. Rows are pulled from the cursor 
+    with `fetchmany()` and converted into a dataframe one chunk at a time, so 
+    only a single chunk of raw {pyodbc} rows is held in memory at once. Every 
+    chunk is typed from the same cursor description, so all chunks share the 
+    same dtypes and can be safely concatenated or written out incrementally.
+    
+    Parameters
+    ----------
+    conn : pyodbc.Connection, ODBCConnection, or DB-API 2.0 connection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`. See `getODBCtable()` for other DB-API connections; 
+        their untyped columns are typed from the first chunk.
+    query : str
+        SQL Query to server to request table
+    chunksize : int
+        The maximum number of rows in each yielded dataframe. Default is 100000.
+    dtype_backend : str
+        Either 'numpy_nullable' (default) or 'pyarrow'. See `getODBCtable()`.
+    params : list, tuple, or None
+        Values for any '?' parameter markers in `query`. Default is None.
+    compact : bool
+        Should columns get the smallest dtype that their declared type allows?
+        See `getODBCtable()`. Default is False.
+        
+    Yields
+    ------
+    dataframe
+        A pandas dataframe with up to `chunksize` rows of the query results.
+        Nothing is yielded if the query returns no rows.
+    
+    Example
+    -------
+    for chunk in iterODBCtable(conn, "SELECT * FROM dbo.BigTable", chunksize = 50000):
+        chunk.to_csv("BigTable.csv", mode = "a", header = False)
+    """
+    
+    if chunksize < 1:
+        raise ValueError("'chunksize' must be a positive integer.")
+    
+    #Read from Database
+    conn = _pyodbcConnection(conn)
+    _addUDTConverter(conn)
+    cursor = conn.cursor()
+    try:
+        _executeQuery(cursor, query, params)
+        columns = _describeCursor(cursor)
+        names = [x.name for x in columns]
+        inferTypes = _needsTypeInference(columns)
+        if not inferTypes:
+            converters = _columnConverters(columns, dtype_backend, compact, chunked = True)
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if len(rows) == 0:
+                break
+            if inferTypes:
+                converters = _columnConverters(_inferColumnTypes(columns, rows), dtype_backend, compact, chunked = True)
+                inferTypes = False
+            yield _rowsToDataFrame(rows, names, converters)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+
+def _rowsToArrowTable(rows, names, converters):
+    """Build a {pyarrow} table from {pyodbc} rows
+    
+    The Arrow equivalent of `_rowsToDataFrame()`. Rows are transposed into 
+    column buffers in a single pass and each buffer is converted directly into
+    a typed pyarrow.Array.
+    
+    Parameters
+    ----------
+    rows : list
+        List of pyodbc.Row objects (or tuples) returned by the cursor.
+    names : list
+        The column names.
+    converters : list
+        The Arrow converter for each column from 
+        `_columnConverters(columns, "arrow")`.
+    
+    Return
+    ------
+    pyarrow.Table
+        A pyarrow table with one column per name.
+    """
+    
+    pyarrow = _importPyarrow()
+    
+    colData = _transposeRows(rows, len(names))
+    outArrays = [converters[i](colData[i]) for i in range(0,len(names))]
+    
+    return pyarrow.Table.from_arrays(outArrays, names = names)
+
+
+
+def exportQueryToParquet(conn, query, path, row_group_size = 100000, partition_cols = None, params = None):
+    """Stream a {pyodbc} query result straight into Parquet
+    
+    Rows are pulled from the cursor with `fetchmany()` and each batch is 
+    written out as it arrives, so the full result never has to be held in 
+    memory as a dataframe. Columns are typed with the same mapping that 
+    `getODBCtable(dtype_backend = "pyarrow")` uses, so reading the Parquet back
+    with {pandas} gives the same types as querying it directly. Requires the 
+    optional dependency {pyarrow}.
+    
+    Parameters
+    ----------
+    conn : pyodbc.Connection, ODBCConnection, or DB-API 2.0 connection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`. See `getODBCtable()` for other DB-API connections; 
+        their untyped columns are typed from the first row group.
+    query : str
+        SQL Query to server to request table
+    path : str
+        Where to write the output. Without `partition_cols` this is a single 
+        Parquet file with one row group per fetched batch. With 
+        `partition_cols` this is the root directory of a hive partitioned 
+        Parquet dataset ('<path>/<col>=<value>/part-<batch>-<i>.parquet').
+    row_group_size : int
+        The number of rows to fetch from the cursor at a time, which is also 
+        the maximum number of rows in each Parquet row group. Default is 100000.
+    partition_cols : str, list, or None
+        Column name(s) to partition the output by. Default is None, which 
+        writes a single file.
+    params : list, tuple, or None
+        Values for any '?' parameter markers in `query`. Default is None.
+    
+    Return
+    ------
+    int
+        The number of rows written.
+    
+    Example
+    -------
+    conn = marcpy.sql.connectODBC("chiefs.marc_pub.marcpub")['pyodbc']
+    exportQueryToParquet(conn, "SELECT * FROM dbo.BigTable", "BigTable.parquet")
+    """
+    
+    pyarrow = _importPyarrow()
+    import pyarrow.parquet
+    
+    if row_group_size < 1:
+        raise ValueError("'row_group_size' must be a positive integer.")
+    if isinstance(partition_cols, str):
+        partition_cols = [partition_cols]
+    
+    nRows = 0
+    writer = None
+    conn = _pyodbcConnection(conn)
+    _addUDTConverter(conn)
+    cursor = conn.cursor()
+    try:
+        _executeQuery(cursor, query, params)
+        columns = _describeCursor(cursor)
+        names = [x.name for x in columns]
+        rows = cursor.fetchmany(row_group_size)
+        if _needsTypeInference(columns):
+            columns = _inferColumnTypes(columns, rows)
+        converters = _columnConverters(columns, "arrow")
+        schema = _rowsToArrowTable([], names, converters).schema
+        
+        if partition_cols is not None:
+            missingCols = [x for x in partition_cols if x not in names]
+            if len(missingCols) > 0:
+                raise ValueError("The partition column(s) ['" + "', '".join(missingCols) + "'] are not in the query result.")
+        else:
+            writer = pyarrow.parquet.ParquetWriter(path, schema)
+        
+        batchNum = 0
+        while len(rows) > 0:
+            table = _rowsToArrowTable(rows, names, converters)
+            if partition_cols is None:
+                writer.write_table(table, row_group_size = row_group_size)
+            else:
+                pyarrow.parquet.write_to_dataset(table, root_path = path, partition_cols = partition_cols, basename_template = "part-" + str(batchNum) + "-{i}.parquet")
+            nRows = nRows + table.num_rows
+            batchNum = batchNum + 1
+            rows = cursor.fetchmany(row_group_size)
+        conn.commit()
+    finally:
+        cursor.close()
+        if writer is not None:
+            writer.close()
+    
+    return nRows
+
+
+
+def _encodeWatermark(value):
+    """Make a watermark value JSON serializable for the sync state file"""
+    
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return {'type' : "bytes", 'value' : bytes(value).hex()}
+    if isinstance(value, datetime.datetime):
+        return {'type' : "datetime", 'value' : value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'type' : "date", 'value' : value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {'type' : "decimal", 'value' : str(value)}
+    if isinstance(value, (int, str)):
+        return {'type' : type(value).__name__, 'value' : value}
+    raise TypeError("Unsupported watermark type '" + str(type(value)) + "'. Use a rowversion, identity, date, or datetime column.")
+
+
+
+def _decodeWatermark(encoded):
+    """Reverse `_encodeWatermark()`"""
+    
+    if encoded is None:
+        return None
+    decoders = {
+        'bytes' : bytes.fromhex,
+        'datetime' : datetime.datetime.fromisoformat,
+        'date' : datetime.date.fromisoformat,
+        'decimal' : decimal.Decimal,
+        'int' : int,
+        'str' : str
+    }
+    return decoders[encoded['type']](encoded['value'])
+
+
+
+def syncODBCtable(conn, table, watermark_column, path, schema = "dbo", columns = None, row_group_size = 100000, full = False):
+    """Incrementally mirror a table to a local Parquet dataset
+    
+    Only rows whose `watermark_column` is greater than the high-water mark 
+    saved by the previous sync are pulled, and they are streamed (with 
+    `exportQueryToParquet()`) into a new part file in `path`. The high-water 
+    mark is the column's maximum at the start of the sync, so rows written 
+    while a sync runs are picked up by the next one. For rowversion columns 
+    the mark stays below `MIN_ACTIVE_ROWVERSION()`, so rows from transactions
+    still open at the start of the sync aren't skipped. The mark is kept in 
+    '<path>/_sync_state.json' and is only updated once the part file is 
+    complete, so a failed sync simply repeats on the next run. Requires the 
+    optional dependency {pyarrow}.
+    
+    The mirror is append-only: an updated row (with a new rowversion or 
+    ModifiedDate) is appended again, and deleted rows are never removed. Use 
+    `readSyncedTable()` with `key_columns` to read only the latest version of 
+    each row. The Parquet dataset can also be queried directly by DuckDB 
+    (e.g. "SELECT * FROM '<path>/*.parquet'").
+    
+    Parameters
+    ----------
+    conn : pyodbc.Connection or ODBCConnection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`.
+    table : str
+        The table to mirror.
+    watermark_column : str
+        An ever increasing column: a rowversion, an identity, or a 
+        ModifiedDate. Note that datetime2 values are compared at microsecond 
+        precision, so rowversion or identity columns are the safest choice.
+    path : str
+        The directory of the local mirror. It is created if needed.
+    schema : str
+        The schema of the table. Default is "dbo".
+    columns : list or None
+        The columns to mirror. Default (None) is all of them. The watermark 
+        column is always included. It can't change between syncs of the same
+        mirror without `full = True`.
+    row_group_size : int
+        Passed to `exportQueryToParquet()`. Default is 100000.
+    full : bool
+        Should the mirror be cleared and the whole table pulled again? 
+        Default is False.
+    
+    Return
+    ------
+    dict
+        With the keys 'rows' (the number of rows pulled), 'previous' and 
+        'watermark' (the high-water marks before and after), and 'file' (the 
+        part file written, or None if there were no new rows).
+    
+    Example
+    -------
+    conn = marcpy.sql.connectODBC("chiefs.marc_pub.marcpub")
+    marcpy.sql.syncODBCtable(conn, "Parcels", "RowVer", "mirror/Parcels")
+    parcels = marcpy.sql.readSyncedTable("mirror/Parcels", key_columns = ["ParcelID"])
+    """
+    
+    statePath = os.path.join(path, "_sync_state.json")
+    tableName = _tableName(table, schema)
+    os.makedirs(path, exist_ok = True)
+    
+    if full:
+        for fileName in os.listdir(path):
+            if fileName.startswith("part-") and fileName.endswith(".parquet"):
+                os.remove(os.path.join(path, fileName))
+        if os.path.exists(statePath):
+            os.remove(statePath)
+    
+    state = None
+    if os.path.exists(statePath):
+        with open(statePath) as f:
+            state = json.load(f)
+        if state['table'] != tableName or state['watermark_column'] != watermark_column:
+            raise ValueError("'" + path + "' mirrors " + state['table'] + " on [" + state['watermark_column'] + "]. Use another path or `full = True`.")
+        if state.get('columns') != (None if columns is None else list(columns)):
+            raise ValueError("'" + path + "' mirrors the columns " + str(state.get('columns')) + ", not " + str(columns) + ". Use another path or `full = True`.")
+    previous = None if state is None else _decodeWatermark(state['watermark'])
+    
+    #Capture the high-water mark before pulling
+    pyodbcConn = _pyodbcConnection(conn)
+    cursor = pyodbcConn.cursor()
+    try:
+        cursor.execute("SELECT MAX(" + _quoteIdentifier(watermark_column) + ") FROM " + tableName)
+        upper = cursor.fetchone()[0]
+        #Rowversions at or above MIN_ACTIVE_ROWVERSION() may still be uncommitted
+        if isinstance(upper, (bytes, bytearray)):
+            cursor.execute("SELECT MAX(" + _quoteIdentifier(watermark_column) + ") FROM " + tableName + 
+                           " WHERE " + _quoteIdentifier(watermark_column) + " < MIN_ACTIVE_ROWVERSION()")
+            upper = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    
+    result = {'rows' : 0, 'previous' : previous, 'watermark' : previous, 'file' : None}
+    if upper is None or (previous is not None and upper <= previous):
+        return result
+    
+    if columns is None:
+        selectList = "*"
+    else:
+        selectList = ", ".join(_quoteIdentifier(x) for x in dict.fromkeys(list(columns) + [watermark_column]))
+    query = "SELECT " + selectList + " FROM " + tableName + " WHERE " + _quoteIdentifier(watermark_column) + " <= ?"
+    params = [upper]
+    if previous is not None:
+        query = query + " AND " + _quoteIdentifier(watermark_column) + " > ?"
+        params.append(previous)
+    
+    partPath = os.path.join(path, "part-" + datetime.datetime.now().strftime("%Y%m%d%H%M%S%f") + ".parquet")
+    try:
+        nRows = exportQueryToParquet(pyodbcConn, query, partPath, row_group_size = row_group_size, params = params)
+    except BaseException:
+        if os.path.exists(partPath):
+            os.remove(partPath)
+        raise
+    if nRows == 0:
+        os.remove(partPath)
+        partPath = None
+    
+    #Save the new high-water mark
+    state = {
+        'table' : tableName,
+        'watermark_column' : watermark_column,
+        'columns' : None if columns is None else list(columns),
+        'watermark' : _encodeWatermark(upper),
+        'lastSync' : datetime.datetime.now().isoformat(),
+        'rows' : nRows + (0 if state is None else state['rows'])
+    }
+    with open(statePath + ".tmp", "w") as f:
+        json.dump(state, f, indent = 2)
+    os.replace(statePath + ".tmp", statePath)
+    
+    result.update(rows = nRows, watermark = upper, file = partPath)
+    return result
+
+
+
+def readSyncedTable(path, key_columns = None, dtype_backend = "pyarrow"):
+    """Read a mirror written by `syncODBCtable()`
+    
+    Parameters
+    ----------
+    path : str
+        The directory of the local mirror.
+    key_columns : str, list, or None
+        If given, only the row with the highest watermark is kept for each 
+        key, so rows that were updated at the source appear once. Default is 
+        None, which returns every row pulled.
+    dtype_backend : str
+        Passed to `pandas.read_parquet()`. Default is "pyarrow".
+    
+    Return
+    ------
+    pandas.Dataframe
+        The mirrored rows.
+    """
+    
+    with open(os.path.join(path, "_sync_state.json")) as f:
+        state = json.load(f)
+    
+    partFiles = sorted(os.path.join(path, x) for x in os.listdir(path) if x.startswith("part-") and x.endswith(".parquet"))
+    if len(partFiles) == 0:
+        return pandas.DataFrame()
+    out = pandas.concat([pandas.read_parquet(x, dtype_backend = dtype_backend) for x in partFiles], ignore_index = True)
+    
+    if key_columns is not None:
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        out = out.sort_values(state['watermark_column'], kind = "stable").drop_duplicates(subset = key_columns, keep = "last")
+        out = out.sort_index().reset_index(drop = True)
+    
+    return out
+
+
+
+def _seekSQL(key_columns):
+    """Create the keyset seek predicate for one or more key columns
+    
+    T-SQL has no row value comparison, so '(a, b) > (?, ?)' is expanded to 
+    '[a] > ? OR ([a] = ? AND [b] > ?)'.
+    
+    Parameters
+    ----------
+    key_columns : list
+        The key columns, in sort order.
+    
+    Return
+    ------
+    tuple
+        The predicate SQL and a function that turns a key tuple into the 
+        parameters for it.
+    """
+    
+    terms = []
+    paramIndex = []
+    for i in range(len(key_columns)):
+        parts = [_quoteIdentifier(x) + " = ?" for x in key_columns[:i]] + [_quoteIdentifier(key_columns[i]) + " > ?"]
+        terms.append("(" + " AND ".join(parts) + ")")
+        paramIndex.extend(range(i + 1))
+    
+    return " OR ".join(terms), lambda key: [key[x] for x in paramIndex]
+
+
+
+def _pythonValue(value):
+    """Convert a {pandas}/{numpy} scalar back into a plain Python value for a query parameter"""
+    
+    if value is None or (not isinstance(value, (str, bytes)) and pandas.isna(value)):
+        return None
+    if isinstance(value, pandas.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+
+def paginateODBCtable(conn, table, key_columns, page_size = 100000, schema = "dbo", columns = None, start_after = None, dtype_backend = "numpy_nullable", compact = False):
+    """Walk a table in pages with keyset (seek) pagination
+    
+    Each page is its own short query, 'SELECT TOP (page_size) ... WHERE key >
+    last_key ORDER BY key', so locks are held only briefly and every page 
+    costs about the same no matter how deep into the table it is (unlike 
+    OFFSET or one long running SELECT). Pages are typed the same way as 
+    `getODBCtable()`.
+    
+    The last key of each page is stored in the page's `attrs['lastKey']`. 
+    Save it and pass it back as `start_after` to resume after an interruption.
+    The key columns should be unique (e.g. the primary key); otherwise rows 
+    sharing a key across a page boundary are skipped. They should also come 
+    back from {pyodbc} exactly as stored: datetime2(7) values are cut to 
+    microseconds and legacy datetime values are stored in 1/300 second steps,
+    so the saved key falls just below the real one and the last row of a 
+    page would be read again. A page whose first key isn't past the previous 
+    page's last key raises a RuntimeError instead of repeating rows (or never
+    ending with `page_size = 1`); use an identity or other exact key.
+    
+    Parameters
+    ----------
+    conn : pyodbc.Connection or ODBCConnection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`.
+    table : str
+        The table (or view) to read.
+    key_columns : str or list
+        The column(s) to order and seek by. Keys can't contain NULLs.
+    page_size : int
+        The maximum number of rows in each page. Default is 100000.
+    schema : str
+        The schema of the table. Default is "dbo".
+    columns : list or None
+        The columns to read. Default (None) is all of them. The key columns 
+        are always included.
+    start_after : tuple or None
+        Resume after this key (one value per key column). Default (None) 
+        starts at the beginning of the table.
+    dtype_backend : str
+        Passed to `getODBCtable()`. Default is 'numpy_nullable'.
+    compact : bool
+        Passed to `getODBCtable()`. Default is False.
+    
+    Yields
+    ------
+    dataframe
+        One page of rows at a time.
+    
+    Example
+    -------
+    conn = marcpy.sql.connectODBC("knights.marc_prd.marcdl")
+    for page in paginateODBCtable(conn, "Parcels", "ParcelID", page_size = 50000):
+        page.to_parquet("parcels/" + str(page.attrs['lastKey'][0]) + ".parquet")
+    """
+    
+    if page_size < 1:
+        raise ValueError("'page_size' must be a positive integer.")
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    key_columns = list(key_columns)
+    
+    if columns is None:
+        selectList = "*"
+    else:
+        selectList = ", ".join(_quoteIdentifier(x) for x in dict.fromkeys(key_columns + list(columns)))
+    orderBy = ", ".join(_quoteIdentifier(x) for x in key_columns)
+    baseSQL = "SELECT TOP (" + str(int(page_size)) + ") " + selectList + " FROM " + _tableName(table, schema)
+    seekSQL, seekParams = _seekSQL(key_columns)
+    
+    lastKey = None if start_after is None else tuple(start_after)
+    if lastKey is not None and len(lastKey) != len(key_columns):
+        raise ValueError("'start_after' needs one value for each of the key columns " + str(key_columns) + ".")
+    
+    while True:
+        if lastKey is None:
+            page = getODBCtable(conn, baseSQL + " ORDER BY " + orderBy, dtype_backend = dtype_backend, compact = compact)
+        else:
+            page = getODBCtable(conn, baseSQL + " WHERE " + seekSQL + " ORDER BY " + orderBy, dtype_backend = dtype_backend, params = seekParams(lastKey), compact = compact)
+        if page.shape[0] == 0:
+            return
+        
+        #Keys that don't round trip exactly (e.g. datetime2(7)) return the last row again
+        if lastKey is not None and not tuple(_pythonValue(page[x].iloc[0]) for x in key_columns) > lastKey:
+            raise RuntimeError("The page after key " + str(lastKey) + " starts at or before it, so the key columns " + str(key_columns) + 
+                               " don't round trip exactly (e.g. datetime2(7) or datetime). Page by an exact key such as an identity column.")
+        lastKey = tuple(_pythonValue(page[x].iloc[-1]) for x in key_columns)
+        page.attrs['lastKey'] = lastKey
+        yield page
+        
+        if page.shape[0] < page_size:
+            return
+
+
+
+def _getODBCtableFromString(databaseString, query, registry = None, **kwargs):
+    """Connect with `connectODBC()`, run `getODBCtable()`, and close the connection"""
+    
+    conn = connectODBC(databaseString, registry = registry)
+    try:
+        return getODBCtable(conn, query, **kwargs)
+    finally:
+        conn.close()
+
+
+
+_asyncExecutor = None
+_asyncExecutorLock = threading.Lock()
+_asyncSemaphores = weakref.WeakKeyDictionary()
+
+def _getAsyncExecutor():
+    """Get the shared, bounded thread pool used by the asyncio functions"""
+    
+    global _asyncExecutor
+    with _asyncExecutorLock:
+        if _asyncExecutor is None:
+            _asyncExecutor = concurrent.futures.ThreadPoolExecutor(max_workers = 16, thread_name_prefix = "marcpy-sql")
+        return _asyncExecutor
+
+
+
+def _serverSemaphore(server, limit):
+    """Get the per-server semaphore for the running event loop
+    
+    Semaphores are tied to an event loop, so one set is kept per loop. Each 
+    server has a single semaphore, so asking for a different limit on a 
+    server that already has one raises a ValueError instead of quietly 
+    allowing more concurrent queries.
+    """
+    
+    loop = asyncio.get_running_loop()
+    semaphores = _asyncSemaphores.setdefault(loop, {})
+    if server not in semaphores:
+        semaphores[server] = (limit, asyncio.Semaphore(limit))
+    elif semaphores[server][0] != limit:
+        raise ValueError("Server '" + server + "' already has a perServerLimit of " + str(semaphores[server][0]) + 
+                         " in this event loop, so it can't also use " + str(limit) + ".")
+    return semaphores[server][1]
+
+
+
+async def agetODBCtable(databaseString, query, perServerLimit = 4, executor = None, registry = None, **kwargs):
+    """Asynchronously get a {pandas} dataframe from a database
+    
+    An asyncio version of `getODBCtable()` that takes a databaseString instead
+    of a connection. The connection and query run on a bounded thread pool so
+    the event loop stays free, and at most `perServerLimit` queries run at 
+    once against the same server (the first part of `databaseString`) so a 
+    burst of requests doesn't swamp any one server.
+    
+    Parameters
+    ----------
+    databaseString : str
+        The keyring username for the database (like 
+        'chiefs.marc_pub.marcpub'), passed to `connectODBC()`.
+    query : str
+        SQL Query to server to request table
+    perServerLimit : int
+        Maximum number of concurrent queries per server. Default is 4. All 
+        queries to a server in the same event loop must use the same limit.
+    executor : concurrent.futures.Executor or None
+        Executor to run the blocking {pyodbc} work on. Default (None) uses a 
+        shared pool of 16 threads.
+    registry : ODBCRegistry or None
+        Optional registry to draw pooled connections from. See `connectODBC()`.
+    **kwargs
+        Passed on to `getODBCtable()` (e.g. `dtype_backend`, `params`, 
+        `cache`).
+    
+    Return
+    ------
+    dataframe
+        A pandas dataframe with the query results.
+    
+    Example
+    -------
+    df = await agetODBCtable("chiefs.marc_pub.marcpub", "SELECT * FROM dbo.Table")
+    """
+    
+    if executor is None:
+        executor = _getAsyncExecutor()
+    server = databaseString.split('.')[0].lower()
+    
+    async with _serverSemaphore(server, perServerLimit):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(_getODBCtableFromString, databaseString, query, registry, **kwargs))
+
+
+
+async def agather_queries(queries, perServerLimit = 4, executor = None, registry = None, return_exceptions = False):
+    """Run many queries against many databases concurrently
+    
+    Every query is started at once with `agetODBCtable()` (subject to the 
+    per-server limit), so the total time approaches that of the slowest query
+    instead of the sum of them all.
+    
+    Parameters
+    ----------
+    queries : list
+        The queries to run. Each item is either a (databaseString, query) tuple
+        or a dictionary with the keys 'databaseString' and 'query' plus any 
+        other `getODBCtable()` arguments.
+    perServerLimit : int
+        Maximum number of concurrent queries per server. Default is 4. All 
+        queries to a server in the same event loop must use the same limit.
+    executor : concurrent.futures.Executor or None
+        Executor to run the blocking {pyodbc} work on. Default (None) uses a 
+        shared pool of 16 threads.
+    registry : ODBCRegistry or None
+        Optional registry to draw pooled connections from. See `connectODBC()`.
+    return_exceptions : bool
+        If True, a failed query returns its exception in place of a dataframe 
+        instead of raising. Default is False.
+    
+    Return
+    ------
+    list
+        The dataframes (or exceptions) in the same order as `queries`.
+    
+    Example
+    -------
+    results = asyncio.run(agather_queries([
+        ("chiefs.marc_pub.marcpub", "SELECT * FROM dbo.TableA"),
+        ("knights.marc_prd.marcdl", "SELECT * FROM dbo.TableB"),
+        {'databaseString': "phantoms.marc_dev.marcpub", 'query': "SELECT * FROM dbo.TableC", 'dtype_backend': "pyarrow"}
+    ]))
+    """
+    
+    tasks = []
+    for item in queries:
+        if isinstance(item, collections.abc.Mapping):
+            kwargs = dict(item)
+            databaseString = kwargs.pop('databaseString')
+            query = kwargs.pop('query')
+        else:
+            databaseString, query = item
+            kwargs = {}
+        tasks.append(agetODBCtable(databaseString, query, perServerLimit = perServerLimit, executor = executor, registry = registry, **kwargs))
+    
+    return await asyncio.gather(*tasks, return_exceptions = return_exceptions)
+
+
+
+def _quoteIdentifier(name):
+    """Quote a SQL Server identifier with square brackets
+    
+    Parameters
+    ----------
+    name : str
+        A column, table, or schema name.
+    
+    Return
+    ------
+    str
+        The bracket quoted identifier with any right brackets escaped.
+    """
+    
+    return "[" + str(name).replace("]", "]]") + "]"
+
+
+
+def _quoteLiteral(value):
+    """Quote a value as a SQL Server literal
+    
+    Parameters
+    ----------
+    value : str, int, float, or None
+        The value to quote. Strings become N'...' with single quotes escaped.
+    
+    Return
+    ------
+    str
+        The literal SQL text.
+    """
+    
+    if value is None or (not isinstance(value, str) and pandas.isna(value)):
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, numpy.integer, numpy.floating)):
+        return repr(value.item() if isinstance(value, numpy.generic) else value)
+    return "N'" + str(value).replace("'", "''") + "'"
+
+
+
+def _valuesTableSQL(rows, columnNames, alias = "seed"):
+    """Create a VALUES table constructor to use as a derived table
+    
+    Used to send a list of keys (schema/table pairs, etc) to the server in a 
+    single query so the server can join against it.
+    
+    Parameters
+    ----------
+    rows : list
+        A list of tuples, one per row of the derived table.
+    columnNames : list
+        The column names of the derived table.
+    alias : str
+        The alias of the derived table. Default is 'seed'.
+    
+    Return
+    ------
+    str
+        SQL like "(VALUES (N'dbo', N'Table1'), ...) AS seed ([Schema], [Table])".
+    """
+    
+    valueRows = ["(" + ", ".join(map(_quoteLiteral, row)) + ")" for row in rows]
+    
+    return "(VALUES " + ", ".join(valueRows) + ") AS " + alias + " (" + ", ".join(map(_quoteIdentifier, columnNames)) + ")"
+
+
+
+def _asSubquery(query):
+    """Wrap a table name or SELECT query so it can be used in a FROM clause
+    
+    Parameters
+    ----------
+    query : str
+        A table name (like 'dbo.Table') or a SELECT query.
+    
+    Return
+    ------
+    str
+        The table name as is, or the query wrapped as a derived table.
+    """
+    
+    if re.match("^\\s*\\(?\\s*select\\s", query, flags = re.IGNORECASE):
+        return "(" + query + ") AS marcpySubquery"
+    return query
+
+
+
+def _partitionBoundaries(lower, upper, num_partitions):
+    """Split a key range into evenly spaced partition boundaries
+    
+    Parameters
+    ----------
+    lower, upper : int, float, decimal.Decimal, datetime.date, or datetime.datetime
+        The lower and upper bound of the key range.
+    num_partitions : int
+        The number of partitions to split the range into.
+    
+    Return
+    ------
+    list
+        The (up to) `num_partitions - 1` distinct inner boundaries in 
+        ascending order. Fewer are returned if the range is too narrow to split
+        that many times.
+    """
+    
+    if isinstance(lower, datetime.datetime):
+        span = upper - lower
+        boundaries = [lower + span * i / num_partitions for i in range(1, num_partitions)]
+    elif isinstance(lower, datetime.date):
+        span = (upper - lower).days
+        boundaries = [lower + datetime.timedelta(days = span * i // num_partitions) for i in range(1, num_partitions)]
+    elif isinstance(lower, int) and not isinstance(lower, bool):
+        span = upper - lower
+        boundaries = [lower + span * i // num_partitions for i in range(1, num_partitions)]
+    else:
+        span = float(upper) - float(lower)
+        boundaries = [float(lower) + span * i / num_partitions for i in range(1, num_partitions)]
+    
+    #Drop boundaries that collapse onto each other or onto the lower bound
+    out = []
+    for boundary in boundaries:
+        if boundary > lower and (len(out) == 0 or boundary > out[-1]):
+            out.append(boundary)
+    
+    return out
+
+
+
+def getODBCtableParallel(databaseString, query, partition_column, num_partitions = 4, lower_bound = None, upper_bound = None, max_workers = None, dtype_backend = "numpy_nullable"):
+    """Read a large table in parallel by splitting it on a key range
+    
+    Similar to a partitioned Spark JDBC read. The range of `partition_column`
+    (an integer, numeric, date, or datetime key) is split into 
+    `num_partitions` evenly spaced strides and each stride is read with 
+    `getODBCtable()` on its own thread, using its own connection from 
+    `connectODBC()`. {pyodbc} releases the GIL while waiting on the server, so
+    the partitions are fetched concurrently. The results are concatenated in 
+    key order and have the same dtypes as `getODBCtable()`.
+    
+    Like Spark, the bounds only decide the stride and do not filter rows. The
+    first partition also picks up anything below `lower_bound` (and NULL keys)
+    and the last partition picks up anything above `upper_bound`, so every row
+    is returned exactly once.
+    
+    Parameters
+    ----------
+    databaseString : str
+        The keyring username for the database, passed to `connectODBC()` once 
+        per partition.
+    query : str
+        A table name (like 'dbo.Table') or a SELECT query to read. A query is 
+        wrapped as a derived table, so it cannot contain a CTE or an ORDER BY 
+        without TOP.
+    partition_column : str
+        The column to split the reads on. Ideally indexed.
+    num_partitions : int
+        The number of partitions (and queries) to split the read into. Default
+        is 4.
+    lower_bound, upper_bound : int, float, datetime.date, datetime.datetime, or None
+        The range of `partition_column` used to compute the strides. If either
+        is None it is looked up with MIN()/MAX() first.
+    max_workers : int or None
+        Maximum number of concurrent connections. Default (None) uses one per 
+        partition.
+    dtype_backend : str
+        Either 'numpy_nullable' (default) or 'pyarrow'. See `getODBCtable()`.
+    
+    Return
+    ------
+    dataframe
+        A pandas dataframe with the query results.
+    
+    Example
+    -------
+    df = getODBCtableParallel("chiefs.marc_pub.marcpub", "dbo.BigTable", "OBJECTID", num_partitions = 8)
+    """
+    
+    if num_partitions < 1:
+        raise ValueError("'num_partitions' must be a positive integer.")
+    
+    source = _asSubquery(query)
+    column = _quoteIdentifier(partition_column)
+    
+    #Look up missing bounds
+    if num_partitions > 1 and (lower_bound is None or upper_bound is None):
+        boundsConn = connectODBC(databaseString)
+        try:
+            bounds = getODBCtable(boundsConn['pyodbc'], "SELECT MIN({col}) AS lowerBound, MAX({col}) AS upperBound FROM {source}".format(col = column, source = source))
+        finally:
+            boundsConn.close()
+        if lower_bound is None:
+            lower_bound = bounds['lowerBound'].iloc[0]
+        if upper_bound is None:
+            upper_bound = bounds['upperBound'].iloc[0]
+        if pandas.isna(lower_bound) or pandas.isna(upper_bound):
+            lower_bound = upper_bound = None
+        elif isinstance(lower_bound, pandas.Timestamp):
+            lower_bound = lower_bound.to_pydatetime()
+            upper_bound = upper_bound.to_pydatetime()
+        elif isinstance(lower_bound, numpy.generic):
+            lower_bound = lower_bound.item()
+            upper_bound = upper_bound.item()
+    
+    #Build one query per partition
+    if num_partitions == 1 or lower_bound is None or not upper_bound > lower_bound:
+        boundaries = []
+    else:
+        boundaries = _partitionBoundaries(lower_bound, upper_bound, num_partitions)
+    
+    baseQuery = "SELECT * FROM {source}".format(source = source)
+    if len(boundaries) == 0:
+        partitions = [(baseQuery, None)]
+    else:
+        partitions = [(baseQuery + " WHERE {col} < ? OR {col} IS NULL".format(col = column), [boundaries[0]])]
+        for i in range(1, len(boundaries)):
+            partitions.append((baseQuery + " WHERE {col} >= ? AND {col} < ?".format(col = column), [boundaries[i - 1], boundaries[i]]))
+        partitions.append((baseQuery + " WHERE {col} >= ?".format(col = column), [boundaries[-1]]))
+    
+    def _readPartition(partition):
+        partConn = connectODBC(databaseString)
+        try:
+            return getODBCtable(partConn['pyodbc'], partition[0], dtype_backend = dtype_backend, params = partition[1])
+        finally:
+            partConn.close()
+    
+    if max_workers is None:
+        max_workers = len(partitions)
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as executor:
+        results = list(executor.map(_readPartition, partitions))
+    
+    outPdf = pandas.concat(results, ignore_index = True)
+    
+    return outPdf
+
+
+
+def _sql_type_checker(series):
+    """Convert a {pandas} column to a SQL Server column type
+    
+    The inverse of the `registerTypeConverter()` defaults. Picks a MS-SQL column type that 
+    will hold every value in the series. This serves as an internal helper 
+    function for higher level functions in marcpy.
+    
+    Parameters
+    ----------
+    series : pandas.Series
+        The column you want a SQL type for.
+    
+    Return
+    ------
+    str
+        A SQL Server data type like 'BIGINT' or 'NVARCHAR(64)'. Strings are 
+        sized with some headroom above the longest value. Timedeltas are 
+        stored as BIGINT nanoseconds.
+    """
+    
+    dtype = series.dtype
+    
+    if isinstance(dtype, pandas.CategoricalDtype):
+        return _sql_type_checker(series.astype(dtype.categories.dtype))
+    
+    if pandas.api.types.is_bool_dtype(dtype):
+        return "BIT"
+    if pandas.api.types.is_integer_dtype(dtype):
+        integerTypes = {
+            (False, 1) : "SMALLINT", (False, 2) : "SMALLINT", (False, 4) : "INT", (False, 8) : "BIGINT",
+            (True, 1) : "TINYINT", (True, 2) : "INT", (True, 4) : "BIGINT", (True, 8) : "DECIMAL(20, 0)"
+        }
+        return integerTypes[(pandas.api.types.is_unsigned_integer_dtype(dtype), numpy.dtype(getattr(dtype, 'numpy_dtype', dtype)).itemsize)]
+    if pandas.api.types.is_float_dtype(dtype):
+        if numpy.dtype(getattr(dtype, 'numpy_dtype', dtype)).itemsize <= 4:
+            return "REAL"
+        return "FLOAT"
+    if isinstance(dtype, pandas.DatetimeTZDtype):
+        return "DATETIMEOFFSET"
+    if pandas.api.types.is_datetime64_any_dtype(dtype):
+        return "DATETIME2"
+    if pandas.api.types.is_timedelta64_dtype(dtype):
+        return "BIGINT"
+    
+    #Object, string, and Arrow columns are typed from their values
+    inferred = pandas.api.types.infer_dtype(series, skipna = True)
+    if inferred == "boolean":
+        return "BIT"
+    if inferred == "integer":
+        return "BIGINT"
+    if inferred in ("floating", "mixed-integer-float"):
+        return "FLOAT"
+    if inferred == "decimal":
+        scale = max([-x.as_tuple().exponent for x in series.dropna()] + [0])
+        return "DECIMAL(38, " + str(min(scale, 38)) + ")"
+    if inferred == "date":
+        return "DATE"
+    if inferred in ("datetime", "datetime64"):
+        return "DATETIME2"
+    if inferred == "time":
+        return "TIME"
+    if inferred == "bytes":
+        return "VARBINARY(MAX)"
+    
+    #Size strings to the next power of two above the longest value
+    maxLength = series.dropna().astype(str).str.len().max()
+    if pandas.isna(maxLength) or maxLength == 0:
+        return "NVARCHAR(255)"
+    if maxLength > 4000:
+        return "NVARCHAR(MAX)"
+    return "NVARCHAR(" + str(min(max(16, 2 ** int(math.ceil(math.log2(maxLength)))), 4000)) + ")"
+
+
+
+def _tableName(table, schema):
+    """Bracket quote a two part table name"""
+    
+    return _quoteIdentifier(schema) + "." + _quoteIdentifier(table)
+
+
+
+def _createTableSQL(df, table, schema = "dbo", sqlTypes = None):
+    """Create the CREATE TABLE statement for a dataframe
+    
+    Parameters
+    ----------
+    df : pandas.Dataframe
+        The dataframe the table should hold.
+    table : str
+        Name of the table.
+    schema : str
+        Name of the schema the table resides in.
+    sqlTypes : dict or None
+        Column name to SQL type overrides. Other columns use 
+        `_sql_type_checker()`.
+    
+    Return
+    ------
+    str
+        The CREATE TABLE statement.
+    """
+    
+    if sqlTypes is None:
+        sqlTypes = {}
+    
+    columnDefs = []
+    for i in range(0, df.shape[1]):
+        colName = df.columns[i]
+        colType = sqlTypes.get(colName, None)
+        if colType is None:
+            colType = _sql_type_checker(df.iloc[:, i])
+        columnDefs.append(_quoteIdentifier(colName) + " " + colType + " NULL")
+    
+    return "CREATE TABLE " + _tableName(table, schema) + " (\n    " + ",\n    ".join(columnDefs) + "\n)"
+
+
+
+def _insertSQL(columns, tableName):
+    """Create a parameterized INSERT statement for a list of columns
     
     Parameters
     ----------
-    databaseString : str 
-        The username for the keyring object you are wanting to connect to. In 
-        the format of '<DB_Name>.<Schema>'.
+    columns : list
+        The column names to insert.
+    tableName : str
+        The already quoted table name (see `_tableName()`).
     
-    Returns
-    -------
-    dictionary
-        Contains a dictionary with the following elements:
-            'pyodbc' - pyodbc.Connection - A {pyodbc} connection object for the 
-                SQL Database.
-            'sqlalchemy' - sqlalchemy.engine - An odbc based connection string 
-                object for connections to the SQL Database using {sqlalchemy}.
-            'details' - dictionary - holds plain text connection details. Has 
-                the keys: 'Driver', 'Server', 'Database', 'UID'.
+    Return
+    ------
+    str
+        The INSERT statement with one '?' marker per column.
     """
     
-    #Create Service Name
-    serviceName = ":DB_conn:" + databaseString
+    return "INSERT INTO " + tableName + " (" + ", ".join(map(_quoteIdentifier, columns)) + ") VALUES (" + ", ".join(["?"] * len(columns)) + ")"
 
-    #Retrieve database connection string
-    connString = keyring_wrappers.key_get("DB_conn", databaseString)
+
+
+def _dataFrameToRows(df):
+    """Convert a dataframe into a list of tuples of Python values
     
-    #Parse string into details dictionary.
-    detailsMatch = re.search('^Driver=\\{?(.*?)\\}?;Server=(.*?);Database=(.*?);UID=(.*?);', connString)
-    details = {
-        'Driver' : detailsMatch.group(1),
-        'Server' : detailsMatch.group(2),
-        'Database' : detailsMatch.group(3),
-        'UID' : detailsMatch.group(4)
-    }
+    Missing values ({pandas} NA, NaN, NaT) become None and {numpy} scalars 
+    become the built in Python types that {pyodbc} knows how to bind. 
+    Timedelta columns become integer nanoseconds to match the BIGINT that 
+    `_sql_type_checker()` gives them. Timezone aware columns are converted to
+    UTC and bound without the timezone, since {pyodbc} ignores `tzinfo` and 
+    the DATETIMEOFFSET column then gets the right instant at +00:00. Works 
+    column by column and transposes once at the end.
+    
+    Parameters
+    ----------
+    df : pandas.Dataframe
+        The dataframe to convert.
+    
+    Return
+    ------
+    list
+        A list of tuples, one per row.
+    """
+    
+    colData = []
+    for i in range(0, df.shape[1]):
+        series = df.iloc[:, i]
+        if pandas.api.types.is_timedelta64_dtype(series.dtype):
+            values = pandas.Series(series.astype("timedelta64[ns]").to_numpy().view("int64"), index = series.index).astype(object)
+        elif isinstance(series.dtype, pandas.DatetimeTZDtype):
+            values = series.dt.tz_convert("UTC").dt.tz_localize(None).astype(object)
+        else:
+            values = series.astype(object)
+        if series.hasnans:
+            values = values.where(series.notna(), None)
+        colData.append(values.tolist())
+    
+    return list(zip(*colData))
+
+
+
+def _insertDataFrame(cursor, df, tableName, chunksize = 10000):
+    """Insert a dataframe into an existing table in chunks with fast_executemany
     
-    #Create pyodbc database connection.
-    conn = pyodbc.connect(connString)
+    Parameters
+    ----------
+    cursor : pyodbc.Cursor
+        The cursor to insert with.
+    df : pandas.Dataframe
+        The rows to insert.
+    tableName : str
+        The already quoted table name (see `_tableName()`).
+    chunksize : int
+        Number of rows sent per `executemany()` batch.
     
-    #Create sqlalchemy engine connection
-    engine = sqlalchemy.create_engine('mssql+pyodbc:///?odbc_connect={}'.format(connString))
+    Return
+    ------
+    int
+        The number of rows inserted.
+    """
     
-    #Create return dictionary
-    out = {'pyodbc':conn, 'sqlalchemy':engine, 'details':details}
+    if df.shape[0] == 0:
+        return 0
     
-    return out
+    insertSQL = _insertSQL(list(df.columns), tableName)
+    cursor.fast_executemany = True
+    for start in range(0, df.shape[0], chunksize):
+        rows = _dataFrameToRows(df.iloc[start:start + chunksize])
+        cursor.executemany(insertSQL, rows)
+    
+    return df.shape[0]
+
+
+
+def _tableExists(cursor, table, schema = "dbo"):
+    """Check if a user table exists"""
+    
+    cursor.execute("SELECT OBJECT_ID(?, 'U')", [_tableName(table, schema)])
+    return cursor.fetchone()[0] is not None
 
 
 
-def _pandas_type_checker(type_in):
-    """Convert types to pandas types
+def writeODBCtable(conn, df, table, schema = "dbo", chunksize = 10000, if_exists = "append", sqlTypes = None):
+    """Write a {pandas} dataframe to a SQL Server table
     
-    Uses a dictionary to return a compatible {pandas} datatype given a type 
-    input. This serves as an internal helper function for higher level 
-    functions in marcpy.
+    The writing counterpart to `getODBCtable()`. Rows are sent with {pyodbc}'s
+    `fast_executemany` in batches of `chunksize`, which is far faster against 
+    MS-SQL than `pandas.DataFrame.to_sql()`. If the table needs created, the 
+    column types are picked from the dataframe's dtypes (the inverse of the 
+    mapping `getODBCtable()` uses). Everything runs in a single transaction 
+    that is rolled back if any batch fails.
     
     Parameters
     ----------
-    type_in : type
-        The type you want to convert to a pandas type.
+    conn : pyodbc.Connection or ODBCConnection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`.
+    df : pandas.Dataframe
+        The dataframe to write. Column names must match the table's columns 
+        when writing to an existing table.
+    table : str
+        Name of the table to write to.
+    schema : str
+        Name of the schema the table resides in. Default is 'dbo'.
+    chunksize : int
+        Number of rows sent per `executemany()` batch. Default is 10000.
+    if_exists : str
+        What to do when the table already exists. 'append' (default) inserts 
+        the rows after the existing ones. 'truncate' empties the table first 
+        but keeps its definition, indexes, and permissions. 'replace' drops the
+        table and recreates it from the dataframe's dtypes. A missing table is 
+        always created.
+    sqlTypes : dict or None
+        Column name to SQL type overrides (like {'GEOID': 'VARCHAR(15)'}) used
+        when creating the table. Default is None.
     
     Return
     ------
-    pandas type
-        A {pandas} compatible datatype. If the supplied type_in is not managed
-        in the type dictionary it will return None. If you come across this, you
-        can edit the dictionary in the function to handle the new type.
+    int
+        The number of rows written.
+    
+    Example
+    -------
+    conn = marcpy.sql.connectODBC("phantoms.marc_dev.marcpub")
+    writeODBCtable(conn, df, "MyTable", schema = "marcpub", if_exists = "replace")
     """
     
-    switchDict = {
-        bool: "boolean",
-        int: "Int64",
-        float: "Float64",
-        str: "string",
-        datetime.date: pandas.DatetimeTZDtype,
-        datetime.datetime: pandas.DatetimeTZDtype
-    }
+    if if_exists not in ("append", "replace", "truncate"):
+        raise ValueError("'if_exists' must be one of 'append', 'replace', or 'truncate', not '" + str(if_exists) + "'.")
+    if chunksize < 1:
+        raise ValueError("'chunksize' must be a positive integer.")
     
-    pandasType = switchDict.get(type_in, None)    
-    return pandasType
+    conn = _pyodbcConnection(conn)
+    cursor = conn.cursor()
+    try:
+        exists = _tableExists(cursor, table, schema)
+        if exists and if_exists == "replace":
+            cursor.execute("DROP TABLE " + _tableName(table, schema))
+            exists = False
+        if exists and if_exists == "truncate":
+            cursor.execute("TRUNCATE TABLE " + _tableName(table, schema))
+        if not exists:
+            cursor.execute(_createTableSQL(df, table, schema, sqlTypes))
+        
+        nRows = _insertDataFrame(cursor, df, _tableName(table, schema), chunksize)
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    
+    return nRows
 
 
 
-def getODBCtable(conn, query):
-    """Get a {pandas} dataframe from the {pyodbc} connection
+def _stagingTableSQL(columns, table, schema = "dbo", stagingTable = "#marcpyStaging"):
+    """Create the statement that makes an empty staging copy of a table
     
-    This function is a more explicit implimentation of `pandas.read_sql()` when
-    working in an MSsql database. It builds up a dataframe using only the data
-    returned by the {pyodbc} cursor object. It was created so that columns get 
-    correctly typed without coercing too soon. The `pandas.read_sql()` function
-    defaults to the old {pandas} types prior to 1.0 (when the pandas.na) was 
-    introduced for backwards compatibility. This is made to correctly type 
-    data according to the new specifications.
+    The staging table gets the target table's column types for `columns`. The
+    `UNION ALL` keeps SQL Server from copying any IDENTITY property, so 
+    explicit key values can be loaded into it.
     
     Parameters
     ----------
-    conn : pyodbc.Connection
-        A {pyodbc} connection object for the SQL Database.
-    query : str
-        SQL Query to server to request table
-        
+    columns : list
+        The columns to include in the staging table.
+    table : str
+        Name of the target table.
+    schema : str
+        Name of the schema the target table resides in.
+    stagingTable : str
+        Name of the staging table. Default is the session temp table 
+        '#marcpyStaging'.
+    
     Return
     ------
-    dataframe
-        A pandas dataframe with the query results.
+    str
+        The SELECT ... INTO statement.
     """
     
-    #Read from Database
+    columnList = ", ".join(map(_quoteIdentifier, columns))
+    sourceTable = _tableName(table, schema)
+    
+    return "SELECT TOP 0 " + columnList + " INTO " + _quoteIdentifier(stagingTable) + " FROM " + sourceTable + " UNION ALL SELECT TOP 0 " + columnList + " FROM " + sourceTable
+
+
+
+def _mergeSQL(columns, key_columns, table, schema = "dbo", stagingTable = "#marcpyStaging", deleteUnmatched = False):
+    """Create the set-based MERGE statement for an upsert
+    
+    Parameters
+    ----------
+    columns : list
+        All of the columns being loaded (including the key columns).
+    key_columns : list
+        The columns that identify a row.
+    table : str
+        Name of the target table.
+    schema : str
+        Name of the schema the target table resides in.
+    stagingTable : str
+        Name of the staging table holding the new rows.
+    deleteUnmatched : bool
+        Should target rows that are not in the staging table be deleted?
+    
+    Return
+    ------
+    str
+        The MERGE statement.
+    """
+    
+    valueColumns = [x for x in columns if x not in key_columns]
+    
+    onClause = " AND ".join(["target." + _quoteIdentifier(x) + " = source." + _quoteIdentifier(x) for x in key_columns])
+    mergeSQL = "MERGE " + _tableName(table, schema) + " WITH (HOLDLOCK) AS target\n"
+    mergeSQL = mergeSQL + "USING " + _quoteIdentifier(stagingTable) + " AS source\n"
+    mergeSQL = mergeSQL + "ON " + onClause + "\n"
+    if len(valueColumns) > 0:
+        mergeSQL = mergeSQL + "WHEN MATCHED THEN UPDATE SET " + ", ".join(["target." + _quoteIdentifier(x) + " = source." + _quoteIdentifier(x) for x in valueColumns]) + "\n"
+    mergeSQL = mergeSQL + "WHEN NOT MATCHED BY TARGET THEN INSERT (" + ", ".join(map(_quoteIdentifier, columns)) + ") VALUES (" + ", ".join(["source." + _quoteIdentifier(x) for x in columns]) + ")"
+    if deleteUnmatched:
+        mergeSQL = mergeSQL + "\nWHEN NOT MATCHED BY SOURCE THEN DELETE"
+    
+    return mergeSQL + ";"
+
+
+
+def upsertODBCtable(conn, df, table, key_columns, schema = "dbo", chunksize = 10000, deleteUnmatched = False):
+    """Insert or update a SQL Server table from a {pandas} dataframe
+    
+    Bulk loads the dataframe into a session temp table with the same 
+    `fast_executemany` batches `writeODBCtable()` uses, then applies it to the
+    target table with a single set-based MERGE on `key_columns`. Rows whose 
+    keys already exist are updated and new rows are inserted. Everything runs 
+    in one transaction that is rolled back on any error, so this scales to 
+    millions of rows without a round trip per row.
+    
+    Parameters
+    ----------
+    conn : pyodbc.Connection or ODBCConnection
+        A {pyodbc} connection object for the SQL Database, or the result of 
+        `connectODBC()`.
+    df : pandas.Dataframe
+        The rows to upsert. Every column must exist in the target table.
+    table : str
+        Name of the existing table to upsert into.
+    key_columns : str or list
+        The column(s) that identify a row. Must be unique within `df`.
+    schema : str
+        Name of the schema the table resides in. Default is 'dbo'.
+    chunksize : int
+        Number of rows sent per `executemany()` batch. Default is 10000.
+    deleteUnmatched : bool
+        Should rows in the table whose keys are not in `df` be deleted (making
+        the table mirror `df`)? Default is False.
+    
+    Return
+    ------
+    int
+        The number of rows the MERGE inserted, updated, or deleted.
+    
+    Example
+    -------
+    conn = marcpy.sql.connectODBC("chiefs.marc_pub.marcpub")
+    upsertODBCtable(conn, df, "Parcels", key_columns = ["County", "ParcelID"], schema = "marcpub")
+    """
+    
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    
+    missingKeys = [x for x in key_columns if x not in df.columns]
+    if len(missingKeys) > 0:
+        raise ValueError("The key column(s) ['" + "', '".join(missingKeys) + "'] are not in 'df'.")
+    if df.duplicated(subset = key_columns).any():
+        raise ValueError("'df' has duplicate values in the key column(s) ['" + "', '".join(key_columns) + "']. MERGE requires each key to be unique.")
+    if chunksize < 1:
+        raise ValueError("'chunksize' must be a positive integer.")
+    
+    stagingTable = "#marcpyStaging"
+    columns = list(df.columns)
+    
+    conn = _pyodbcConnection(conn)
     cursor = conn.cursor()
-    cursor.execute(query)
-    names = [column[0] for column in cursor.description]
-    types = [column[1] for column in cursor.description]
-    nulls = [column[6] for column in cursor.description]
-    rows = cursor.fetchall()
-    conn.commit()
-    cursor.close()
-
-
-    #Get Pandas types
-    pandasTypes = list(map(_pandas_type_checker, types))
-
-    #Make sure all types are managed by pandas_type_checker
-    if any(map(lambda x: x == None, pandasTypes)):
-        unmanagedIDs = numpy.where(numpy.array(list(map(lambda x: x == None, pandasTypes))))[0]
-        unmanagedNames = numpy.array(names)[unmanagedIDs]
-        unmanagedTypes = numpy.array(types)[unmanagedIDs]
-        message = "The following column(s) ['" + "', '".join(unmanagedNames) + "'] have the following unmanaged datatype(s) ['" + "', '".join(unmanagedTypes) + "'] for conversion to a pandas DataFrame."
-        message = message + "\nPlease edit `marcpy.pandas_type_checker()` to handle the unmanaged datatype(s)."
-        raise RuntimeError(message)
+    try:
+        cursor.execute("IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {stagingQuoted}".format(staging = stagingTable, stagingQuoted = _quoteIdentifier(stagingTable)))
+        cursor.execute(_stagingTableSQL(columns, table, schema, stagingTable))
+        _insertDataFrame(cursor, df, _quoteIdentifier(stagingTable), chunksize)
+        cursor.execute(_mergeSQL(columns, key_columns, table, schema, stagingTable, deleteUnmatched))
+        nRows = cursor.rowcount
+        cursor.execute("DROP TABLE " + _quoteIdentifier(stagingTable))
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    
+    return nRows
 
 
-    #Create from series
-    outSeries = [None] * len(names)
-    for i in range(0,len(names)):
-        colData = list(map(lambda x: x[i], rows))
-        colName = names[i]
-        colType = types[i]
-        colNull = nulls[i]
-        pandasType = pandasTypes[i]
-        outSeries[i] = pandas.Series(data = colData, dtype = pandasType, name = colName)
 
-    outPdf = pandas.concat(outSeries, axis = 1)
+@functools.lru_cache(maxsize = 64)
+def _compileRegexList(regexList):
+    """Compile a tuple of regular expressions into one alternation pattern"""
+    
+    return re.compile("|".join(regexList))
 
-    return outPdf
+
+
+def _regexMask(series, regexList):
+    """Which values of a string Series match any of the regular expressions?
+    
+    Parameters
+    ----------
+    series : pandas.Series
+        The strings to check. Missing values never match.
+    regexList : list
+        Regular expressions, combined with '|' and compiled once.
+    
+    Return
+    ------
+    pandas.Series
+        A boolean Series aligned with `series`.
+    """
+    
+    return series.str.contains(_compileRegexList(tuple(regexList)), na = False)
 
 
 
-def dbListSchemas(conn, rmSchemaRegex = ["sys", "sde", "^INFORMATION_SCHEMA$", "^db_\\.*"]):
+def dbListSchemas(conn, rmSchemaRegex = ["sys", "sde", "^INFORMATION_SCHEMA$", "^db_\\.*"], cache = None):
     """List all schema in database
     
     Searches schema in in the INFORMATION_SCHEMA.SCHEMATA table.
@@ -211,13 +3168,17 @@ def dbListSchemas(conn, rmSchemaRegex = ["sys", "sde", "^INFORMATION_SCHEMA$", "
     
     Parameters
     ----------
-    conn : sqlalchemy.Engine
-        A sqlalchemy engine connection to use with pandas.read_sql()
+    conn : sqlalchemy.Engine or ODBCConnection
+        A sqlalchemy engine connection to use with pandas.read_sql(), or the 
+        result of `connectODBC()`.
     rmSchemaRegex : list or None
         List of characters containing schema regex to avoid searching
         (removed schema regex). Ignores some default system level schema and schema
         only used by the ESRI SDE bindings that don't actually contain user created
         tables.
+    cache : QueryCache or None
+        If given, the schema list is loaded from (or stored in) this cache 
+        instead of always querying the server. Default is None.
     
     Return
     ------
@@ -225,28 +3186,31 @@ def dbListSchemas(conn, rmSchemaRegex = ["sys", "sde", "^INFORMATION_SCHEMA$", "
         A pandas series of schemas at the connection.
     """
     
-    all_schema = pandas.read_sql("SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA", conn)['SCHEMA_NAME']
+    all_schema = _readSQL("SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA", conn, cache = cache)['SCHEMA_NAME']
     
     if rmSchemaRegex is None or len(rmSchemaRegex) == 0:
         out = all_schema
     else:
-        out = all_schema[~all_schema.apply(lambda x: bool(re.search("|".join(rmSchemaRegex), x)))]
+        out = all_schema[~_regexMask(all_schema, rmSchemaRegex)]
     
     return out
 
 
-def dbTableStructure(conn, addGeoIndicator = False, includeViews = True, rmTableRegex = ["^[a-zA-Z]\d+$", "^SDE_"], rmSchemaRegex = ["sde"]):
+def dbTableStructure(conn, addGeoIndicator = False, includeViews = True, rmTableRegex = ["^[a-zA-Z]\d+$", "^SDE_"], rmSchemaRegex = ["sde"], cache = None, addColumnInfo = False):
     """List all tables in a database
     
     Searches tables in in the INFORMATION_SCHEMA.TABLES table. This functions 
     also pairs each table with its schema and can handle checking if the table 
-    has spatial data and identify if it is a view.
+    has spatial data and identify if it is a view. The spatial indicator and 
+    column details come from a single INFORMATION_SCHEMA.COLUMNS query for the
+    whole database that is joined to the tables in {pandas}.
     Confirmed only to work with MS-SQL databases.
     
     Parameters
     ----------
-    conn : sqlalchemy.Engine
-        A sqlalchemy engine connection to use with pandas.read_sql()
+    conn : sqlalchemy.Engine or ODBCConnection
+        A sqlalchemy engine connection to use with pandas.read_sql(), or the 
+        result of `connectODBC()`.
     addGeoIndicator : boolean
         Should the `isSpatial` column be exported? Default is FALSE.
     includeViews : boolean
@@ -260,35 +3224,67 @@ def dbTableStructure(conn, addGeoIndicator = False, includeViews = True, rmTable
         (removed schema regex). Ignores some default system level schema and schema
         only used by the ESRI SDE bindings that don't actually contain user created
         tables.
+    cache : QueryCache or None
+        If given, the catalog queries are loaded from (or stored in) this cache
+        instead of always querying the server. Default is None.
+    addColumnInfo : boolean
+        Should the `nColumns` and `Columns` columns be exported? `Columns` 
+        holds a list with a dictionary for each column of the table (in 
+        ordinal order) with the keys 'Column', 'DataType', 'isNullable', 
+        'MaxLength', 'Precision', and 'Scale'. Default is FALSE.
     
     Return
     ------
     pandas.Dataframe
         A pandas dataframe with a row for each table in the database connection.
-        Contains 4 or 5 columns ('Database', 'Schema', 'Table', 'isView', and 
-        optionally 'isSpatial'). The return dataframe can then easily be 
+        Contains 4 to 7 columns ('Database', 'Schema', 'Table', 'isView', and 
+        optionally 'isSpatial', 'nColumns', and 'Columns'). The return dataframe can then easily be 
         searched, filtered, and queried to find the tables you were looking for.
     """
     
-    tables = pandas.read_sql("SELECT * FROM INFORMATION_SCHEMA.TABLES", conn)
+    tables = _readSQL("SELECT * FROM INFORMATION_SCHEMA.TABLES", conn, cache = cache)
     
     #Filter data
     if rmTableRegex is not None and len(rmTableRegex) != 0:
-        tables = tables.loc[~tables['TABLE_NAME'].apply(lambda x: bool(re.search("|".join(rmTableRegex), x)))]
+        tables = tables.loc[~_regexMask(tables['TABLE_NAME'], rmTableRegex)]
     
     if rmSchemaRegex is not None and len(rmSchemaRegex) != 0:
-        tables = tables.loc[~tables['TABLE_SCHEMA'].apply(lambda x: bool(re.search("|".join(rmSchemaRegex), x)))]
-    
-    #Add Spatial Indicator
-    if addGeoIndicator:
-        def _isGeo(row):
-            sqlQuery =  """ SELECT * 
-                            FROM INFORMATION_SCHEMA.COLUMNS 
-                            WHERE TABLE_SCHEMA = '{schema}' AND TABLE_NAME = '{table}' AND (DATA_TYPE = 'geometry' OR DATA_TYPE = 'geography')
-                        """.format(schema = row['TABLE_SCHEMA'], table = row['TABLE_NAME'])
-            return pandas.read_sql(sqlQuery, conn).shape[0] > 0
+        tables = tables.loc[~_regexMask(tables['TABLE_SCHEMA'], rmSchemaRegex)]
+    
+    #Add Spatial Indicator and Column Details
+    if addGeoIndicator or addColumnInfo:
+        columnsSQL = """ SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, DATA_TYPE, IS_NULLABLE, 
+                            CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE
+                        FROM INFORMATION_SCHEMA.COLUMNS
+                     """
+        columns = _readSQL(columnsSQL, conn, cache = cache)
+        tableKeys = pandas.MultiIndex.from_frame(tables[['TABLE_SCHEMA', 'TABLE_NAME']])
+        
+        if addGeoIndicator:
+            spatial = columns.loc[columns['DATA_TYPE'].isin(['geometry', 'geography'])]
+            spatialKeys = pandas.MultiIndex.from_frame(spatial[['TABLE_SCHEMA', 'TABLE_NAME']])
+            tables['isSpatial'] = tableKeys.isin(spatialKeys)
         
-        tables['isSpatial'] = tables.apply(_isGeo, axis = 1)
+        if addColumnInfo:
+            columns = columns.sort_values(['TABLE_SCHEMA', 'TABLE_NAME', 'ORDINAL_POSITION'])
+            columnInfo = pandas.DataFrame({
+                'Column' : columns['COLUMN_NAME'],
+                'DataType' : columns['DATA_TYPE'],
+                'isNullable' : columns['IS_NULLABLE'] == 'YES',
+                'MaxLength' : columns['CHARACTER_MAXIMUM_LENGTH'],
+                'Precision' : columns['NUMERIC_PRECISION'],
+                'Scale' : columns['NUMERIC_SCALE']
+            })
+            columnInfo = columnInfo.astype({'MaxLength' : "Int64", 'Precision' : "Int64", 'Scale' : "Int64"})
+            columnInfo = columnInfo.astype(object).where(columnInfo.notna(), None)
+            records = columnInfo.to_dict('records')
+            tableColumns = {}
+            for key, record in zip(zip(columns['TABLE_SCHEMA'], columns['TABLE_NAME']), records):
+                tableColumns.setdefault(key, []).append(record)
+            
+            tables['Columns'] = [tableColumns.get(key, []) for key in tableKeys]
+            tables['nColumns'] = tables['Columns'].apply(len)
+            tables = tables[[x for x in tables.columns if x != 'Columns'] + ['Columns']]
     
     #Rename Columns
     tables = tables.rename(columns = {'TABLE_CATALOG':'Database', 'TABLE_SCHEMA':'Schema', 'TABLE_NAME':'Table', 'TABLE_TYPE':'isView'})
@@ -334,13 +3330,29 @@ def createDatabaseStringFromDF(df, serverCol, databaseCol, userCol, unique = Fal
         A Series with the connection strings.
     """
     
-    out = df.apply(lambda x: "{}.{}.{}".format(x[serverCol].lower(), x[databaseCol].lower(), x[userCol].lower()) if str(x[serverCol]) != 'nan' and str(x[databaseCol]) != 'nan' and str(x[userCol]) != 'nan' else numpy.nan, axis = 1)
+    parts = [df[x] for x in (serverCol, databaseCol, userCol)]
+    valid = numpy.logical_and.reduce([x.notna() & (x.astype(str) != 'nan') for x in parts])
+    out = pandas.Series(numpy.nan, index = df.index, dtype = object)
+    out[valid] = parts[0][valid].astype(str).str.lower() + "." + parts[1][valid].astype(str).str.lower() + "." + parts[2][valid].astype(str).str.lower()
     if unique:
         out = out.drop_duplicates()
     return out
 
 
-def connectODBCFromDF(df, serverCol = None, databaseCol = None, userCol = None, connectionCol = None):
+#Seconds added to the login timeout before `connectODBCFromDF()` stops waiting
+_connectDeadlineSlack = 5
+
+def _closeLateConnection(future):
+    """Close a connection that finished after `connectODBCFromDF()` gave up on it"""
+    
+    if future.cancelled():
+        return
+    conn, failure = future.result()
+    if conn is not None:
+        _closeQuietly(conn)
+
+def connectODBCFromDF(df, serverCol = None, databaseCol = None, userCol = None, connectionCol = None, 
+                      max_workers = 8, timeout = 15, verify = True, registry = None, return_failures = False):
     """Create an OBDC connection for every record in a dataframe.
     
      You either need a dataframe with the following columns: 
@@ -353,6 +3365,9 @@ def connectODBCFromDF(df, serverCol = None, databaseCol = None, userCol = None,
                             'knights.marc_prd.marcdl') - Output column 
                             from `createDatabaseStringFromDF()`  
     
+    The connections are opened concurrently, so one unreachable server no 
+    longer holds up the rest.
+    
     Parameters
     ----------
     df : pandas.Dataframe
@@ -366,41 +3381,146 @@ def connectODBCFromDF(df, serverCol = None, databaseCol = None, userCol = None,
         The column with the user for the connection.
     connectionCol : str
         The column with the connection string.
+    max_workers : int
+        The maximum number of connections opened at once. Default is 8.
+    timeout : int or None
+        Seconds each connection may take to log in before it is counted as a 
+        failure. Default is 15. None waits for the driver's own timeout.
+    verify : bool
+        Should the {pyodbc} connection be opened right away to check the 
+        server is reachable? If False, only the keyring lookup is checked and
+        the handles are created on first access. Default is True.
+    registry : ODBCRegistry or None
+        Passed to `connectODBC()`.
+    return_failures : bool
+        Should a dataframe of the failed connections be returned as well? 
+        Default is False, which only warns about them.
     
     Return
     ------
-    dict
+    dict or tuple
         A dictionary with the key being the connection string (derived from 
         `createDatabaseStringFromDF()`) and the value being the result of that
-        connection string being passed to `connectODBC()`. If the string 
-        suplied to `connectODBC()` fails (likely the key isn't accessible
-        by keyring and needs added or the user modified) it drops that record
-        from the result dictionary.
+        connection string being passed to `connectODBC()`. Connection strings 
+        that fail (the key isn't accessible by keyring, the server can't be 
+        reached, or it timed out) are left out of the dictionary, and a 
+        connection that finishes after the deadline is closed. If 
+        `return_failures` is True, a tuple of the dictionary and a dataframe 
+        with the columns Connection, Stage ('keyring', 'connect', or 
+        'timeout'), ErrorType, and Error.
     """
     
     #Get database connection strings
     if connectionCol is not None:
-        DBconnStrings = df[connectionCol]
+        DBconnStrings = df[connectionCol].dropna().drop_duplicates().values
     else:
         DBconnStrings = createDatabaseStringFromDF(df, serverCol, databaseCol, userCol, unique = True).dropna().values
     
     def _attemptConnectODBC(databaseString):
-            try:
-                out = connectODBC(databaseString)
-            except:
-                out = None
-            return(out)
-    
-    #Get database connection dictionary
-    DBconnDict = {k:v for k,v in dict(zip(DBconnStrings, map(_attemptConnectODBC, DBconnStrings))).items() if v is not None}
+        stage = 'keyring'
+        try:
+            out = connectODBC(databaseString, registry = registry, timeout = timeout)
+            if verify:
+                stage = 'connect'
+                out['pyodbc']
+        except Exception as e:
+            return None, (databaseString, stage, type(e).__name__, str(e))
+        return out, None
+    
+    DBconnDict = {}
+    failures = []
+    
+    #Open the connections concurrently. The driver enforces the login timeout, 
+    #the deadline below only guards against a driver that ignores it.
+    if len(DBconnStrings) > 0:
+        workers = min(max_workers, len(DBconnStrings))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = workers)
+        futures = {executor.submit(_attemptConnectODBC, x) : x for x in DBconnStrings}
+        deadline = None if timeout is None else (timeout + _connectDeadlineSlack) * math.ceil(len(futures) / workers)
+        done, notDone = concurrent.futures.wait(futures, timeout = deadline)
+        executor.shutdown(wait = False, cancel_futures = True)
+        
+        for future in done:
+            conn, failure = future.result()
+            if failure is None:
+                DBconnDict[futures[future]] = conn
+            else:
+                failures.append(failure)
+        for future in notDone:
+            future.add_done_callback(_closeLateConnection)
+            failures.append((futures[future], 'timeout', 'TimeoutError', "No connection after " + str(deadline) + " seconds"))
+    
+    #Keep the input order
+    DBconnDict = {x : DBconnDict[x] for x in DBconnStrings if x in DBconnDict}
+    failures = pandas.DataFrame(failures, columns = ['Connection', 'Stage', 'ErrorType', 'Error'])
+    
+    if return_failures:
+        return DBconnDict, failures
+    if failures.shape[0] > 0:
+        warnings.warn(str(failures.shape[0]) + " connection(s) failed and were dropped: " + ", ".join(failures['Connection']), RuntimeWarning)
     
     return DBconnDict
 
 
+def _viewStructureSQL(views):
+    """Create the recursive CTE that resolves the structure of many views
+    
+    Parameters
+    ----------
+    views : list
+        (schema, view) tuples to resolve. They seed the CTE through a VALUES 
+        list so all of them are resolved in a single query.
+    
+    Return
+    ------
+    str
+        SQL returning the columns RequestSchema, RequestView, ParentDatabase, 
+        ParentSchema, ParentTable, ChildDatabase, ChildSchema, ChildTable.
+    """
+    
+    return """ WITH deps (RequestSchema, RequestView, ParentDatabase, ParentSchema, ParentTable, ChildDatabase, ChildSchema, ChildTable) AS (
+                    SELECT seed.RequestSchema, seed.RequestView, vtu.VIEW_CATALOG, vtu.VIEW_SCHEMA, vtu.VIEW_NAME, vtu.TABLE_CATALOG, vtu.TABLE_SCHEMA, vtu.TABLE_NAME
+                    FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE AS vtu
+                    INNER JOIN {seed} ON vtu.VIEW_SCHEMA = seed.RequestSchema AND vtu.VIEW_NAME = seed.RequestView
+                    UNION all
+                    SELECT deps.RequestSchema, deps.RequestView, vtu.VIEW_CATALOG, vtu.VIEW_SCHEMA, vtu.VIEW_NAME, vtu.TABLE_CATALOG, vtu.TABLE_SCHEMA, vtu.TABLE_NAME
+                    FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE AS vtu
+                    INNER JOIN deps ON deps.ChildSchema = vtu.VIEW_SCHEMA AND deps.ChildTable = vtu.VIEW_NAME 
+                )
+                SELECT RequestSchema, RequestView, ParentDatabase, ParentSchema, ParentTable, ChildDatabase, ChildSchema, ChildTable
+                FROM deps;
+            """.format(seed = _valuesTableSQL(views, ['RequestSchema', 'RequestView']))
+
+
+
+def _dbViewStructureMany(conn, views, chunksize = 1000):
+    """Resolve the structure of many views on one connection
+    
+    Parameters
+    ----------
+    conn : sqlalchemy.Engine or ODBCConnection
+        A sqlalchemy engine or the result of `connectODBC()`.
+    views : list
+        Unique (schema, view) tuples to resolve.
+    chunksize : int
+        The maximum number of views resolved per query. Default is 1000.
+    
+    Return
+    ------
+    pandas.Dataframe
+        The result of `_viewStructureSQL()` for all the views.
+    """
+    
+    out = [_readSQL(_viewStructureSQL(views[i:i + chunksize]), conn) for i in range(0, len(views), chunksize)]
+    
+    return pandas.concat(out, ignore_index = True)
+
+
+
 def dbViewStructure(conn, schema, view):
     """List all Parent-Child relationships with tables for a view.
     
-    Under the hood its just parameterized SQL query returned as a dataframe.
+    Under the hood its just a recursive SQL query returned as a dataframe.
     
     Parameters
     ----------
@@ -419,28 +3539,18 @@ def dbViewStructure(conn, schema, view):
     
     """
     
+    views = _dbViewStructureMany(conn, [(schema, view)])
     
-    viewsSQL =  """ WITH deps (ParentDatabase, ParentSchema, ParentTable, ChildDatabase, ChildSchema, ChildTable) AS (
-                        SELECT vtu.VIEW_CATALOG, vtu.VIEW_SCHEMA, vtu.VIEW_NAME, TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME
-                        FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE AS vtu
-                        WHERE VIEW_SCHEMA = '{schema}' AND VIEW_NAME = '{view}'
-                        UNION all
-                        SELECT vtu.VIEW_CATALOG, vtu.VIEW_SCHEMA, vtu.VIEW_NAME, vtu.TABLE_CATALOG, vtu.TABLE_SCHEMA, vtu.TABLE_NAME
-                        FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE AS vtu
-                        INNER JOIN deps ON deps.ChildSchema = vtu.VIEW_SCHEMA AND deps.ChildTable = vtu.VIEW_NAME 
-                    )
-                    SELECT ParentDatabase, ParentSchema, ParentTable, ChildDatabase, ChildSchema, ChildTable
-                    FROM deps;
-                """.format(schema = schema, view = view)
-    
-    views = pandas.read_sql(viewsSQL, conn)
-    
-    return views
+    return views.drop(columns = ['RequestSchema', 'RequestView'])
 
 
-def dbViewStructureFromDF(df, connectionCol, schemaCol, viewCol):
+def dbViewStructureFromDF(df, connectionCol, schemaCol, viewCol, max_workers = None, chunksize = 1000):
     """Get View Struture for an entire dataframe's worth of Views
     
+    Requests are deduplicated and grouped by connection. Each connection 
+    resolves all of its views with one recursive query per `chunksize` views,
+    and the connections are queried concurrently.
+    
     Parameters
     ----------
     df : pandas.Dataframe
@@ -453,6 +3563,11 @@ def dbViewStructureFromDF(df, connectionCol, schemaCol, viewCol):
         The column with the server name.
     viewCol : str
         The column with the view name.
+    max_workers : int or None
+        The maximum number of connections queried at once. Default (None) 
+        queries all of them at once, up to 16.
+    chunksize : int
+        The maximum number of views resolved per query. Default is 1000.
     
     Return
     ------
@@ -463,9 +3578,501 @@ def dbViewStructureFromDF(df, connectionCol, schemaCol, viewCol):
         ChildDatabase, ChildSchema, ChildTable
     """
     
-    connections = connectODBCFromDF(df.drop_duplicates(subset = [connectionCol]), connectionCol = connectionCol)
+    requests = df[[connectionCol, schemaCol, viewCol]].set_axis(['RequestConnection', 'RequestSchema', 'RequestView'], axis = 1)
+    uniqueRequests = requests.drop_duplicates()
+    grouped = {connString : list(group[['RequestSchema', 'RequestView']].itertuples(index = False, name = None)) for connString, group in uniqueRequests.groupby('RequestConnection', sort = False)}
+    
+    def resolve(connString):
+        conn = connectODBC(connString)
+        try:
+            return _dbViewStructureMany(conn, grouped[connString], chunksize = chunksize).assign(RequestConnection = connString)
+        finally:
+            conn.close()
     
-    views = pandas.concat(df.apply(lambda x: dbViewStructure(conn = connections[x[connectionCol]]['sqlalchemy'], schema = x[schemaCol], view = x[viewCol]).assign(RequestConnection = x[connectionCol], RequestServer = x[connectionCol].split('.')[0], RequestDatabase = x[connectionCol].split('.')[1], RequestSchema = x[schemaCol], RequestView = x[viewCol]), axis = 1).values, ignore_index=True)
-    views = views[['RequestConnection', 'RequestServer', 'RequestDatabase', 'RequestSchema', 'RequestView', 'ParentDatabase', 'ParentSchema', 'ParentTable', 'ChildDatabase', 'ChildSchema', 'ChildTable']]
+    if max_workers is None:
+        max_workers = min(16, max(1, len(grouped)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as executor:
+        results = list(executor.map(resolve, grouped))
+    
+    columns = ['RequestConnection', 'RequestSchema', 'RequestView', 'ParentDatabase', 'ParentSchema', 'ParentTable', 'ChildDatabase', 'ChildSchema', 'ChildTable']
+    structure = pandas.concat(results, ignore_index = True)[columns] if len(results) > 0 else pandas.DataFrame(columns = columns)
+    
+    #Join back to the requests so the output follows the input rows (including duplicates)
+    views = requests.merge(structure, how = "inner", on = ['RequestConnection', 'RequestSchema', 'RequestView'])
+    views.insert(1, 'RequestServer', views['RequestConnection'].str.split('.').str[0])
+    views.insert(2, 'RequestDatabase', views['RequestConnection'].str.split('.').str[1])
     
     return views
+
+
+class DatabaseCatalog:
+    """Local, incrementally refreshed snapshot of database metadata
+    
+    Harvests the schemas, tables, columns, and view dependencies of one or more
+    databases into a local SQLite file, so lookups against them are instant 
+    and don't touch INFORMATION_SCHEMA on the server. Each `refresh()` first 
+    reads `sys.objects` and then only re-reads the tables and views whose 
+    `modify_date` (or object_id) changed since the last refresh, and removes 
+    the ones that were dropped. Confirmed only to work with MS-SQL databases.
+    
+    Parameters
+    ----------
+    path : str or None
+        The SQLite file to store the catalog in. It is created if needed. 
+        Default (None) is '~/.marcpy/catalog.sqlite'. Use ':memory:' for a 
+        catalog that isn't persisted.
+    
+    Example
+    -------
+    catalog = marcpy.sql.DatabaseCatalog()
+    for databaseString in ["chiefs.marc_pub.marcpub", "knights.marc_prd.marcdl"]:
+        catalog.refresh(databaseString)
+    catalog.findColumns("GEOID")
+    catalog.viewDependencies("chiefs.marc_pub.marcpub", schema = "dbo", view = "vw_Parcels", recursive = True)
+    """
+    
+    _objectsSQL = """ SELECT s.name AS [Schema], o.name AS Name, o.object_id AS ObjectID, RTRIM(o.type) AS ObjectType, o.modify_date AS ModifyDate
+                        FROM sys.objects AS o
+                        INNER JOIN sys.schemas AS s ON o.schema_id = s.schema_id
+                        WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0
+                  """
+    
+    def __init__(self, path = None):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), ".marcpy", "catalog.sqlite")
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._store = sqlite3.connect(path, check_same_thread = False)
+        self._createStore()
+    
+    def _createStore(self):
+        with self._lock, self._store:
+            self._store.executescript("""
+                CREATE TABLE IF NOT EXISTS catalogConnections (Connection TEXT PRIMARY KEY, Server TEXT, Database TEXT, UID TEXT, LastRefresh TEXT);
+                CREATE TABLE IF NOT EXISTS catalogSchemas (Connection TEXT, Schema TEXT);
+                CREATE TABLE IF NOT EXISTS catalogObjects (Connection TEXT, Schema TEXT, Name TEXT, ObjectID INTEGER, ObjectType TEXT, ModifyDate TEXT);
+                CREATE TABLE IF NOT EXISTS catalogTables (Connection TEXT, Database TEXT, Schema TEXT, "Table" TEXT, isView INTEGER, isSpatial INTEGER, nColumns INTEGER);
+                CREATE TABLE IF NOT EXISTS catalogColumns (Connection TEXT, Schema TEXT, "Table" TEXT, "Column" TEXT, Ordinal INTEGER, DataType TEXT, isNullable INTEGER, MaxLength INTEGER, Precision INTEGER, Scale INTEGER);
+                CREATE TABLE IF NOT EXISTS catalogViewDependencies (Connection TEXT, ViewDatabase TEXT, ViewSchema TEXT, View TEXT, TableDatabase TEXT, TableSchema TEXT, "Table" TEXT);
+                CREATE INDEX IF NOT EXISTS idx_catalogObjects ON catalogObjects (Connection, Schema, Name);
+                CREATE INDEX IF NOT EXISTS idx_catalogTables ON catalogTables (Connection, Schema, "Table");
+                CREATE INDEX IF NOT EXISTS idx_catalogColumns ON catalogColumns (Connection, Schema, "Table");
+                CREATE INDEX IF NOT EXISTS idx_catalogViewDependencies ON catalogViewDependencies (Connection, ViewSchema, View);
+            """)
+    
+    def close(self):
+        """Close the local store"""
+        
+        self._store.close()
+    
+    @staticmethod
+    def _connectionKey(conn):
+        """The key a connection is stored under: the databaseString when known"""
+        
+        if isinstance(conn, str):
+            return conn.lower()
+        if isinstance(conn, ODBCConnection):
+            return conn.databaseString.lower()
+        details = _connectionDetails(conn)
+        return ".".join([str(details['Server']), str(details['Database']), str(details['UID'])]).lower()
+    
+    def refresh(self, conn, full = False, seedChunksize = 500):
+        """Bring the catalog up to date for one database
+        
+        Parameters
+        ----------
+        conn : str, ODBCConnection, or sqlalchemy.Engine
+            A databaseString (passed to `connectODBC()`), the result of 
+            `connectODBC()`, or a sqlalchemy engine.
+        full : bool
+            Should every object be re-read instead of only the changed ones? A
+            full refresh also happens automatically the first time a 
+            connection is refreshed or when most objects changed. Default is 
+            False.
+        seedChunksize : int
+            The maximum number of changed objects sent to the server per 
+            metadata query during an incremental refresh. Default is 500.
+        
+        Return
+        ------
+        dict
+            A summary with the keys 'Connection', 'full', 'changed', and 
+            'dropped'.
+        """
+        
+        key = self._connectionKey(conn)
+        ownConn = isinstance(conn, str)
+        if ownConn:
+            conn = connectODBC(conn)
+        
+        try:
+            details = _connectionDetails(conn)
+            
+            current = _readSQL(self._objectsSQL, conn)
+            current['ModifyDate'] = pandas.to_datetime(current['ModifyDate']).dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+            stored = pandas.read_sql("SELECT Schema, Name, ObjectID, ModifyDate FROM catalogObjects WHERE Connection = ?", self._store, params = [key])
+            
+            #Find new, changed, and dropped objects
+            compare = current.merge(stored, how = "left", on = ['Schema', 'Name'], suffixes = ('', 'Stored'))
+            changed = compare.loc[compare['ModifyDateStored'].isna() | (compare['ModifyDate'] != compare['ModifyDateStored']) | (compare['ObjectID'] != compare['ObjectIDStored']), ['Schema', 'Name']]
+            dropped = anti_join(stored[['Schema', 'Name']], current[['Schema', 'Name']], on = ['Schema', 'Name'])
+            full = full or stored.shape[0] == 0 or changed.shape[0] > current.shape[0] / 2
+            
+            #Harvest metadata
+            schemas = dbListSchemas(conn, rmSchemaRegex = None)
+            if full:
+                tables, columns, dependencies = self._harvest(conn, details)
+            elif changed.shape[0] > 0:
+                seeds = list(changed.itertuples(index = False, name = None))
+                harvested = [self._harvest(conn, details, seeds[i:i + seedChunksize]) for i in range(0, len(seeds), seedChunksize)]
+                tables = pandas.concat([x[0] for x in harvested], ignore_index = True)
+                columns = pandas.concat([x[1] for x in harvested], ignore_index = True)
+                dependencies = pandas.concat([x[2] for x in harvested], ignore_index = True)
+            else:
+                tables = columns = dependencies = None
+            
+            #Write to the local store in one transaction
+            with self._lock, self._store:
+                self._store.execute("DELETE FROM catalogSchemas WHERE Connection = ?", [key])
+                self._store.executemany("INSERT INTO catalogSchemas VALUES (?, ?)", [(key, x) for x in schemas])
+                
+                if full:
+                    for storeTable in ("catalogTables", "catalogColumns", "catalogViewDependencies"):
+                        self._store.execute("DELETE FROM " + storeTable + " WHERE Connection = ?", [key])
+                else:
+                    removeKeys = [(key,) + x for x in list(changed.itertuples(index = False, name = None)) + list(dropped.itertuples(index = False, name = None))]
+                    self._store.executemany('DELETE FROM catalogTables WHERE Connection = ? AND Schema = ? AND "Table" = ?', removeKeys)
+                    self._store.executemany('DELETE FROM catalogColumns WHERE Connection = ? AND Schema = ? AND "Table" = ?', removeKeys)
+                    self._store.executemany('DELETE FROM catalogViewDependencies WHERE Connection = ? AND ViewSchema = ? AND View = ?', removeKeys)
+                
+                if tables is not None:
+                    tables.assign(Connection = key).to_sql("catalogTables", self._store, if_exists = "append", index = False)
+                    columns.assign(Connection = key).to_sql("catalogColumns", self._store, if_exists = "append", index = False)
+                    dependencies.assign(Connection = key).to_sql("catalogViewDependencies", self._store, if_exists = "append", index = False)
+                
+                self._store.execute("DELETE FROM catalogObjects WHERE Connection = ?", [key])
+                current.assign(Connection = key).to_sql("catalogObjects", self._store, if_exists = "append", index = False)
+                
+                self._store.execute("INSERT OR REPLACE INTO catalogConnections VALUES (?, ?, ?, ?, ?)", 
+                                    [key, details['Server'], details['Database'], details['UID'], datetime.datetime.now().isoformat()])
+        finally:
+            if ownConn:
+                conn.close()
+        
+        return {'Connection' : key, 'full' : full, 'changed' : changed.shape[0], 'dropped' : dropped.shape[0]}
+    
+    @staticmethod
+    def _harvest(conn, details, seeds = None):
+        """Read tables, columns, and view dependencies from the server
+        
+        Parameters
+        ----------
+        seeds : list or None
+            (schema, name) tuples to limit the harvest to. Default (None) reads
+            the whole database.
+        
+        Return
+        ------
+        tuple
+            Three dataframes shaped like the catalogTables, catalogColumns, and
+            catalogViewDependencies store tables (minus the Connection column).
+        """
+        
+        tablesSQL = "SELECT t.TABLE_CATALOG, t.TABLE_SCHEMA, t.TABLE_NAME, t.TABLE_TYPE FROM INFORMATION_SCHEMA.TABLES AS t"
+        columnsSQL = """ SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, c.ORDINAL_POSITION, c.DATA_TYPE, c.IS_NULLABLE, 
+                            c.CHARACTER_MAXIMUM_LENGTH, c.NUMERIC_PRECISION, c.NUMERIC_SCALE
+                        FROM INFORMATION_SCHEMA.COLUMNS AS c"""
+        dependenciesSQL = """ SELECT v.VIEW_CATALOG, v.VIEW_SCHEMA, v.VIEW_NAME, v.TABLE_CATALOG, v.TABLE_SCHEMA, v.TABLE_NAME
+                                FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE AS v"""
+        if seeds is not None:
+            seedSQL = _valuesTableSQL(seeds, ['Schema', 'Name'])
+            tablesSQL = tablesSQL + " INNER JOIN " + seedSQL + " ON t.TABLE_SCHEMA = seed.[Schema] AND t.TABLE_NAME = seed.[Name]"
+            columnsSQL = columnsSQL + " INNER JOIN " + seedSQL + " ON c.TABLE_SCHEMA = seed.[Schema] AND c.TABLE_NAME = seed.[Name]"
+            dependenciesSQL = dependenciesSQL + " INNER JOIN " + seedSQL + " ON v.VIEW_SCHEMA = seed.[Schema] AND v.VIEW_NAME = seed.[Name]"
+        
+        tables = _readSQL(tablesSQL, conn)
+        columns = _readSQL(columnsSQL, conn)
+        dependencies = _readSQL(dependenciesSQL, conn)
+        
+        columns = pandas.DataFrame({
+            'Schema' : columns['TABLE_SCHEMA'],
+            'Table' : columns['TABLE_NAME'],
+            'Column' : columns['COLUMN_NAME'],
+            'Ordinal' : columns['ORDINAL_POSITION'],
+            'DataType' : columns['DATA_TYPE'],
+            'isNullable' : columns['IS_NULLABLE'] == 'YES',
+            'MaxLength' : columns['CHARACTER_MAXIMUM_LENGTH'],
+            'Precision' : columns['NUMERIC_PRECISION'],
+            'Scale' : columns['NUMERIC_SCALE']
+        })
+        
+        tableKeys = pandas.MultiIndex.from_frame(tables[['TABLE_SCHEMA', 'TABLE_NAME']])
+        spatial = columns.loc[columns['DataType'].isin(['geometry', 'geography'])]
+        nColumns = columns.groupby(['Schema', 'Table']).size()
+        tables = pandas.DataFrame({
+            'Database' : tables['TABLE_CATALOG'],
+            'Schema' : tables['TABLE_SCHEMA'],
+            'Table' : tables['TABLE_NAME'],
+            'isView' : tables['TABLE_TYPE'] == 'VIEW',
+            'isSpatial' : tableKeys.isin(pandas.MultiIndex.from_frame(spatial[['Schema', 'Table']])),
+            'nColumns' : nColumns.reindex(tableKeys, fill_value = 0).values
+        })
+        
+        dependencies = dependencies.rename(columns = {
+            'VIEW_CATALOG' : 'ViewDatabase', 'VIEW_SCHEMA' : 'ViewSchema', 'VIEW_NAME' : 'View',
+            'TABLE_CATALOG' : 'TableDatabase', 'TABLE_SCHEMA' : 'TableSchema', 'TABLE_NAME' : 'Table'
+        })
+        
+        return tables, columns, dependencies
+    
+    def _query(self, sqlQuery, filters):
+        """Run a query against the local store with optional equality filters"""
+        
+        where = []
+        params = []
+        for column, value in filters:
+            if value is not None:
+                where.append(column + " = ?")
+                params.append(value)
+        if len(where) > 0:
+            sqlQuery = sqlQuery + " WHERE " + " AND ".join(where)
+        
+        with self._lock:
+            return pandas.read_sql(sqlQuery, self._store, params = params)
+    
+    def connections(self):
+        """List the connections in the catalog and when they were last refreshed"""
+        
+        return self._query("SELECT * FROM catalogConnections", [])
+    
+    def schemas(self, connection = None):
+        """List the schemas in the catalog, optionally for one connection"""
+        
+        connection = None if connection is None else self._connectionKey(connection)
+        return self._query("SELECT Connection, Schema FROM catalogSchemas", [("Connection", connection)])
+    
+    def tables(self, connection = None, schema = None, includeViews = True):
+        """List the tables (and views) in the catalog
+        
+        Return
+        ------
+        pandas.Dataframe
+            The same columns as `dbTableStructure(addGeoIndicator = True)` plus
+            'Connection' and 'nColumns'.
+        """
+        
+        connection = None if connection is None else self._connectionKey(connection)
+        out = self._query('SELECT * FROM catalogTables', [("Connection", connection), ("Schema", schema)])
+        out['isView'] = out['isView'].astype(bool)
+        out['isSpatial'] = out['isSpatial'].astype(bool)
+        if not includeViews:
+            out = out[~out['isView']]
+        return out
+    
+    def columns(self, connection = None, schema = None, table = None):
+        """List the columns in the catalog, optionally for one table"""
+        
+        connection = None if connection is None else self._connectionKey(connection)
+        out = self._query('SELECT * FROM catalogColumns', [("Connection", connection), ("Schema", schema), ('"Table"', table)])
+        out['isNullable'] = out['isNullable'].astype(bool)
+        return out.sort_values(['Connection', 'Schema', 'Table', 'Ordinal'], ignore_index = True)
+    
+    def findColumns(self, regex, connection = None):
+        """Find columns whose name matches a regular expression (case insensitive)"""
+        
+        out = self.columns(connection)
+        return out[out['Column'].str.contains(regex, case = False, regex = True)]
+    
+    def viewDependencies(self, connection = None, schema = None, view = None, recursive = False):
+        """List the tables and views that views depend on
+        
+        Parameters
+        ----------
+        connection : str, ODBCConnection, or None
+            Limit to one connection.
+        schema, view : str or None
+            Limit to one schema and/or view.
+        recursive : bool
+            Should the dependencies of dependent views be followed too? This is
+            the local equivalent of `dbViewStructure()` and requires 
+            `connection`, `schema`, and `view`. Default is False.
+        
+        Return
+        ------
+        pandas.Dataframe
+            With `recursive = False`, the direct dependencies stored in the 
+            catalog. With `recursive = True`, the columns ParentDatabase, 
+            ParentSchema, ParentTable, ChildDatabase, ChildSchema, and 
+            ChildTable as returned by `dbViewStructure()`.
+        """
+        
+        connection = None if connection is None else self._connectionKey(connection)
+        if not recursive:
+            return self._query('SELECT * FROM catalogViewDependencies', [("Connection", connection), ("ViewSchema", schema), ("View", view)])
+        
+        if connection is None or schema is None or view is None:
+            raise ValueError("'connection', 'schema', and 'view' are all required when 'recursive' is True.")
+        
+        recursiveSQL = """ WITH RECURSIVE deps (ParentDatabase, ParentSchema, ParentTable, ChildDatabase, ChildSchema, ChildTable) AS (
+                                SELECT ViewDatabase, ViewSchema, View, TableDatabase, TableSchema, "Table"
+                                FROM catalogViewDependencies
+                                WHERE Connection = ? AND ViewSchema = ? AND View = ?
+                                UNION
+                                SELECT v.ViewDatabase, v.ViewSchema, v.View, v.TableDatabase, v.TableSchema, v."Table"
+                                FROM catalogViewDependencies AS v
+                                INNER JOIN deps ON deps.ChildSchema = v.ViewSchema AND deps.ChildTable = v.View
+                                WHERE v.Connection = ?
+                            )
+                            SELECT * FROM deps
+                       """
+        with self._lock:
+            return pandas.read_sql(recursiveSQL, self._store, params = [connection, schema, view, connection])
+
+
+
+class ViewLineage:
+    """In-memory view lineage graph for fast upstream/downstream lookups
+    
+    Built from one full pull of `INFORMATION_SCHEMA.VIEW_TABLE_USAGE`. The 
+    edges are stored as compressed adjacency arrays (one for each direction)
+    and the transitive closure of every object is computed when the graph is
+    built, so `upstream()` and `downstream()` are dictionary lookups instead of
+    a recursive query on the server like `dbViewStructure()`.
+    
+    Parameters
+    ----------
+    edges : pandas.Dataframe
+        One row per view/table dependency with the columns ViewDatabase, 
+        ViewSchema, View, TableDatabase, TableSchema, and Table, like 
+        `DatabaseCatalog.viewDependencies()` returns. Use `fromConnection()` to
+        build one straight from a database.
+    database : str or None
+        The database assumed when a lookup doesn't give one. Default (None) 
+        uses the most common ViewDatabase in `edges`.
+    
+    Example
+    -------
+    lineage = marcpy.sql.ViewLineage.fromConnection("chiefs.marc_pub.marcpub")
+    lineage.upstream("dbo", "vw_Parcels")
+    lineage.downstream("dbo", "Parcels")
+    """
+    
+    _edgeColumns = ['ViewDatabase', 'ViewSchema', 'View', 'TableDatabase', 'TableSchema', 'Table']
+    
+    def __init__(self, edges, database = None):
+        edges = edges[self._edgeColumns].drop_duplicates()
+        if database is None:
+            database = edges['ViewDatabase'].mode().iloc[0] if edges.shape[0] > 0 else None
+        self.database = database
+        
+        #Number every object (case insensitive like SQL Server)
+        viewNodes = list(zip(edges['ViewDatabase'], edges['ViewSchema'], edges['View']))
+        tableNodes = list(zip(edges['TableDatabase'], edges['TableSchema'], edges['Table']))
+        codes, uniques = pandas.factorize(pandas.Series([self._nodeKey(*x) for x in viewNodes + tableNodes], dtype = object))
+        self._ids = {key : i for i, key in enumerate(uniques)}
+        self.nodes = [None] * len(uniques)
+        for code, node in zip(codes, viewNodes + tableNodes):
+            if self.nodes[code] is None:
+                self.nodes[code] = node
+        
+        viewIds = codes[:len(viewNodes)]
+        tableIds = codes[len(viewNodes):]
+        self._upIndptr, self._upIndices = self._adjacency(viewIds, tableIds, len(uniques))
+        self._downIndptr, self._downIndices = self._adjacency(tableIds, viewIds, len(uniques))
+        
+        self._upstream = [self._reachable(i, self._upIndptr, self._upIndices) for i in range(len(uniques))]
+        self._downstream = [self._reachable(i, self._downIndptr, self._downIndices) for i in range(len(uniques))]
+        self._upstream = [frozenset(self.nodes[j] for j in x) for x in self._upstream]
+        self._downstream = [frozenset(self.nodes[j] for j in x) for x in self._downstream]
+    
+    @classmethod
+    def fromConnection(cls, conn, cache = None):
+        """Build the graph from a database with one VIEW_TABLE_USAGE query
+        
+        Parameters
+        ----------
+        conn : str, ODBCConnection, or sqlalchemy.Engine
+            A databaseString (passed to `connectODBC()`), the result of 
+            `connectODBC()`, or a sqlalchemy engine.
+        cache : QueryCache or None
+            Cache to check before querying the server and to store the result 
+            in.
+        """
+        
+        edgesSQL = """ SELECT VIEW_CATALOG AS ViewDatabase, VIEW_SCHEMA AS ViewSchema, VIEW_NAME AS [View], 
+                            TABLE_CATALOG AS TableDatabase, TABLE_SCHEMA AS TableSchema, TABLE_NAME AS [Table]
+                        FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE
+                    """
+        if isinstance(conn, str):
+            with contextlib.closing(connectODBC(conn)) as ownConn:
+                edges = _readSQL(edgesSQL, ownConn, cache = cache)
+                database = ownConn['details']['Database']
+        else:
+            edges = _readSQL(edgesSQL, conn, cache = cache)
+            database = _connectionDetails(conn)['Database']
+        
+        return cls(edges, database = database)
+    
+    @staticmethod
+    def _nodeKey(database, schema, name):
+        return (str(database).lower(), str(schema).lower(), str(name).lower())
+    
+    @staticmethod
+    def _adjacency(source, target, nNodes):
+        """Compressed sparse row adjacency arrays (indptr, indices)"""
+        
+        order = numpy.argsort(source, kind = "stable")
+        indices = numpy.asarray(target)[order]
+        indptr = numpy.searchsorted(numpy.asarray(source)[order], numpy.arange(nNodes + 1))
+        return indptr, indices
+    
+    @staticmethod
+    def _reachable(start, indptr, indices):
+        """Every node reachable from `start` (excluding itself)"""
+        
+        seen = set()
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for nxt in indices[indptr[node]:indptr[node + 1]].tolist():
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        seen.discard(start)
+        return seen
+    
+    def _lookup(self, closure, schema, name, database):
+        nodeId = self._ids.get(self._nodeKey(self.database if database is None else database, schema, name))
+        if nodeId is None:
+            return frozenset()
+        return closure[nodeId]
+    
+    def upstream(self, schema, name, database = None):
+        """All tables and views a view depends on, directly or through other views
+        
+        Return
+        ------
+        frozenset
+            (Database, Schema, Name) tuples. Empty when the object is unknown 
+            or isn't a view.
+        """
+        
+        return self._lookup(self._upstream, schema, name, database)
+    
+    def downstream(self, schema, name, database = None):
+        """All views that depend on a table or view, directly or through other views
+        
+        Return
+        ------
+        frozenset
+            (Database, Schema, Name) tuples. Empty when no view uses the object.
+        """
+        
+        return self._lookup(self._downstream, schema, name, database)
+    
+    def toFrame(self, objects):
+        """Convert the result of `upstream()`/`downstream()` to a dataframe"""
+        
+        return pandas.DataFrame(sorted(objects), columns = ['Database', 'Schema', 'Name'])
@@ -17,13 +17,17 @@ LONG_DESC_TYPE = "text/markdown"
 
 INSTALL_REQUIRES = [
       'numpy', #conda
-      'pandas>=1.0', #conda, sql, jsonpath_pd
+      'pandas>=2.0', #conda, sql, jsonpath_pd
       'keyring>=21.8.0', #keyring_wrappers, gitcreds
       'pyodbc', #keyring_wrappers, sql
       'sqlalchemy', #sql
       'jsonpath-ng' # jsonpath_pd
 ]
 
+EXTRAS_REQUIRE = {
+      'pyarrow' : ['pyarrow'] #sql (dtype_backend = "pyarrow", QueryCache, Parquet export/sync, spilling)
+}
+
 setup(name=PACKAGE_NAME,
       #version=VERSION,
       version=versioneer.get_version(),
@@ -36,7 +40,8 @@ setup(name=PACKAGE_NAME,
       author_email=AUTHOR_EMAIL,
       url=URL,
       install_requires=INSTALL_REQUIRES,
-      packages=find_packages(),
+      extras_require=EXTRAS_REQUIRE,
+      packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
       keywords='marcpy',
       #classifiers=[
       #  'Programming Language :: Python :: 3.6',
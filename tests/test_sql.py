@@ -0,0 +1,747 @@
+import asyncio
+import datetime
+import decimal
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy
+import pandas
+import pytest
+
+try:
+    from marcpy import sql
+except ImportError:
+    pytest.skip("marcpy.sql requires pyodbc and a working ODBC driver manager.", allow_module_level = True)
+
+#The SQLite stand-in for a pyodbc connection is shared with the benchmarks
+from benchmarks import sqliteShim
+
+
+@pytest.fixture
+def standin():
+    conn = sqliteShim.ShimConnection(types = {'id': int, 'grp': str, 'amount': float, 'flag': bool, 'day': datetime.date})
+    conn.sqlite.execute("CREATE TABLE t (id INTEGER, grp TEXT, amount REAL, flag BOOLEAN, day DATE)")
+    conn.sqlite.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?)", [
+        (i, "abc"[i % 3], i / 4 if i % 5 else None, i % 2 == 0, datetime.date(2022, 1, 1 + i % 28)) for i in range(1, 26)
+    ])
+    return conn
+
+
+def test_iterODBCtable_chunks(standin):
+    chunks = list(sql.iterODBCtable(standin, "SELECT id, grp, amount FROM t", chunksize = 10))
+    assert [len(x) for x in chunks] == [10, 10, 5]
+    assert all((x.dtypes == chunks[0].dtypes).all() for x in chunks)
+
+
+def test_exportQueryToParquet(standin, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    
+    outFile = str(tmp_path / "t.parquet")
+    nRows = sql.exportQueryToParquet(standin, "SELECT * FROM t ORDER BY id", outFile, row_group_size = 10)
+    assert nRows == 25
+    parquetFile = pq.ParquetFile(outFile)
+    assert parquetFile.metadata.num_row_groups == 3
+    assert parquetFile.read().to_pandas()['id'].tolist() == list(range(1, 26))
+    
+    outDir = str(tmp_path / "partitioned")
+    sql.exportQueryToParquet(standin, "SELECT * FROM t", outDir, row_group_size = 10, partition_cols = "grp")
+    assert sorted(x.name for x in (tmp_path / "partitioned").iterdir()) == ["grp=a", "grp=b", "grp=c"]
+    assert pq.read_table(outDir).num_rows == 25
+
+
+def test_mergeSQL():
+    mergeSQL = sql._mergeSQL(["ID", "Name", "Value"], ["ID"], "Parcels", "marcpub")
+    assert mergeSQL.startswith("MERGE [marcpub].[Parcels] WITH (HOLDLOCK) AS target\nUSING [#marcpyStaging] AS source\nON target.[ID] = source.[ID]\n")
+    assert "WHEN MATCHED THEN UPDATE SET target.[Name] = source.[Name], target.[Value] = source.[Value]\n" in mergeSQL
+    assert mergeSQL.endswith("WHEN NOT MATCHED BY TARGET THEN INSERT ([ID], [Name], [Value]) VALUES (source.[ID], source.[Name], source.[Value]);")
+    
+    keysOnly = sql._mergeSQL(["ID"], ["ID"], "Parcels", deleteUnmatched = True)
+    assert "WHEN MATCHED" not in keysOnly
+    assert keysOnly.endswith("\nWHEN NOT MATCHED BY SOURCE THEN DELETE;")
+
+
+def test_stagingTableSQL():
+    stagingSQL = sql._stagingTableSQL(["ID", "Name"], "Parcels", "marcpub")
+    assert stagingSQL == "SELECT TOP 0 [ID], [Name] INTO [#marcpyStaging] FROM [marcpub].[Parcels] UNION ALL SELECT TOP 0 [ID], [Name] FROM [marcpub].[Parcels]"
+
+
+def test_valuesTableSQL():
+    valuesSQL = sql._valuesTableSQL([("dbo", "O'Neil"), ("marcpub", None)], ["Schema", "Name"])
+    assert valuesSQL == "(VALUES (N'dbo', N'O''Neil'), (N'marcpub', NULL)) AS seed ([Schema], [Name])"
+
+
+def test_viewStructureSQL():
+    viewsSQL = sql._viewStructureSQL([("dbo", "vw_A"), ("marcpub", "vw_B")])
+    assert "(VALUES (N'dbo', N'vw_A'), (N'marcpub', N'vw_B')) AS seed ([RequestSchema], [RequestView])" in viewsSQL
+
+
+def test_upsertODBCtable_duplicate_keys(standin):
+    df = sql.getODBCtable(standin, "SELECT grp, id FROM t")
+    with pytest.raises(ValueError, match = "duplicate"):
+        sql.upsertODBCtable(standin, df, "t", key_columns = "grp")
+
+
+def test_type_converters(standin):
+    df = sql.getODBCtable(standin, "SELECT id, day FROM t")
+    assert str(df['day'].dtype) == "datetime64[ns]"
+    
+    column = sql._ODBCColumn("Cost", decimal.Decimal, None, 19, 19, 4, True)
+    assert sql.decimalToScaledInt(column)([decimal.Decimal("12.3400"), None]).tolist() == [123400, pandas.NA]
+    assert sql.decimalToScaledInt(column)([decimal.Decimal("-0.0001"), decimal.Decimal("922337203685477.5807")]).tolist() == [-1, 9223372036854775807]
+    assert sql.decimalToScaledInt(column._replace(precision = 18))([decimal.Decimal("12.34"), None, decimal.Decimal("-99999999999999.9999")]).tolist() == [123400, pandas.NA, -999999999999999999]
+    assert sql.decimalToScaledInt(column._replace(precision = 18))([None, None]).tolist() == [pandas.NA, pandas.NA]
+    assert str(sql.datetimeConverter(column)([datetime.datetime(9999, 12, 31), None]).dtype) == "datetime64[us]"
+
+
+def test_compact_dtypes(standin):
+    column = sql._ODBCColumn("Flag", bool, None, 1, 1, 0, False)
+    assert sql._compactConverter(column, "bool")([True, False]).dtype == "bool"
+    assert sql._compactConverter(column, "bool")([True, None, False]).tolist() == [True, pandas.NA, False]
+    assert str(sql._compactConverter(column, "bool", chunked = True)([True, False]).dtype) == "boolean"
+    
+    column = sql._ODBCColumn("Cost", decimal.Decimal, None, 9, 9, 2, False)
+    assert str(sql._compactConverter(column, "float64")([decimal.Decimal("1.25"), None]).dtype) == "Float64"
+    
+    standin._types['id'] = (int, 5)
+    standin._types['amount'] = (float, 24)
+    df = sql.getODBCtable(standin, "SELECT id, amount FROM t", compact = True)
+    assert [str(x) for x in df.dtypes] == ["Int16", "Float32"]
+    chunks = list(sql.iterODBCtable(standin, "SELECT id, amount FROM t", chunksize = 10, compact = True))
+    assert all((x.dtypes == df.dtypes).all() for x in chunks)
+
+
+def test_categoryThreshold(standin):
+    standin._types['raw'] = bytes
+    df = sql.getODBCtable(standin, "SELECT id, grp, CAST(id AS BLOB) AS raw FROM t", categoryThreshold = 0.5)
+    assert isinstance(df['grp'].dtype, pandas.CategoricalDtype)
+    assert not isinstance(df['raw'].dtype, pandas.CategoricalDtype)
+    assert str(df['id'].dtype) == "Int64"
+    df = sql.getODBCtable(standin, "SELECT grp FROM t", dtype_backend = "pyarrow", categoryThreshold = 0.5)
+    assert isinstance(df['grp'].dtype, pandas.CategoricalDtype)
+
+
+def test_QueryCache(standin, tmp_path):
+    pytest.importorskip("pyarrow")
+    conn = {'pyodbc': standin, 'details': {'Driver': "SQLite", 'Server': "localhost", 'Database': "t", 'UID': "test"}}
+    standin.sqlite.execute("UPDATE t SET grp = 'a  b' WHERE id IN (1, 3)")
+    standin.sqlite.execute("UPDATE t SET grp = 'a b' WHERE id IN (2, 4)")
+    cache = sql.QueryCache(str(tmp_path / "cache"))
+    
+    #Hits return the stored result, even after the table changes
+    first = sql.getODBCtable(conn, "SELECT id FROM t WHERE grp = 'a  b'", cache = cache)
+    assert first['id'].tolist() == [1, 3]
+    standin.sqlite.execute("DELETE FROM t WHERE id = 1")
+    assert sql.getODBCtable(conn, "  SELECT id FROM t WHERE grp = 'a  b';", cache = cache)['id'].tolist() == [1, 3]
+    
+    #Whitespace inside literals is part of the key
+    assert sql.getODBCtable(conn, "SELECT id FROM t WHERE grp = 'a b'", cache = cache)['id'].tolist() == [2, 4]
+    
+    #Expired entries are ignored and removed
+    key = cache.key(conn['details'], "SELECT 1", "x")
+    cache.put(key, first)
+    assert cache.get(key) is not None
+    os.utime(cache._path(key), (time.time(), time.time() - cache.ttl - 1))
+    assert cache.get(key) is None and not os.path.exists(cache._path(key))
+    
+    #The least recently used entries are evicted past max_bytes
+    keys = [cache.key(conn['details'], "SELECT " + str(i)) for i in range(3)]
+    cache.clear()
+    for i, key in enumerate(keys):
+        cache.put(key, first)
+        os.utime(cache._path(key), (1000 + i, time.time()))
+    cache.get(keys[0])
+    cache.max_bytes = 2 * os.path.getsize(cache._path(keys[0]))
+    cache.evict()
+    assert [os.path.exists(cache._path(x)) for x in keys] == [True, False, True]
+
+
+def test_pyarrow_dtype_backend():
+    pyarrow = pytest.importorskip("pyarrow")
+    expected = {
+        bool: (pyarrow.bool_(), [True, None]),
+        int: (pyarrow.int64(), [1, None]),
+        float: (pyarrow.float64(), [1.5, None]),
+        str: (pyarrow.string(), ["a", None]),
+        datetime.date: (pyarrow.date32(), [datetime.date(2022, 1, 1), None]),
+        datetime.datetime: (pyarrow.timestamp("us"), [datetime.datetime(9999, 12, 31), None]),
+        datetime.time: (pyarrow.time64("us"), [datetime.time(12, 30), None]),
+        decimal.Decimal: (pyarrow.decimal128(19, 4), [decimal.Decimal("12.3400"), None]),
+        bytes: (pyarrow.binary(), [b"\x00", None]),
+        bytearray: (pyarrow.binary(), [bytearray(b"\x01"), None]),
+        memoryview: (pyarrow.binary(), [memoryview(b"\x02"), None]),
+        uuid.UUID: (pyarrow.string(), [uuid.UUID(int = 1), None])
+    }
+    assert set(expected) <= set(sql._typeConverters)
+    
+    columns = [sql._ODBCColumn("c" + str(i), typeCode, None, 19, 19, 4, True) for i, typeCode in enumerate(expected)]
+    converters = sql._columnConverters(columns, dtype_backend = "pyarrow")
+    rows = list(zip(*[values for arrowType, values in expected.values()]))
+    df = sql._rowsToDataFrame(rows, [x.name for x in columns], converters)
+    assert list(df.dtypes) == [pandas.ArrowDtype(arrowType) for arrowType, values in expected.values()]
+    assert df.iloc[1].isna().all()
+
+
+def test_ViewLineage():
+    edges = pandas.DataFrame([("db", "dbo", "v1", "db", "dbo", "t1"), 
+                              ("db", "dbo", "v1", "db", "dbo", "v2"), 
+                              ("db", "dbo", "v2", "db", "dbo", "t2"), 
+                              ("db", "dbo", "v3", "db", "dbo", "V1")], 
+                             columns = ['ViewDatabase', 'ViewSchema', 'View', 'TableDatabase', 'TableSchema', 'Table'])
+    lineage = sql.ViewLineage(edges)
+    assert {x[2].lower() for x in lineage.upstream("dbo", "v3")} == {"v1", "v2", "t1", "t2"}
+    assert {x[2] for x in lineage.downstream("dbo", "t2")} == {"v1", "v2", "v3"}
+    assert lineage.upstream("dbo", "missing") == frozenset()
+
+
+def test_QueryProfiler(standin, tmp_path):
+    records = []
+    profiler = sql.QueryProfiler(callback = records.append, logPath = str(tmp_path / "reads.jsonl"), job = "test")
+    df = sql.getODBCtable(standin, "SELECT id, grp FROM t", profiler = profiler)
+    
+    assert [x['phase'] for x in records] == ['connect', 'execute', 'fetch', 'convert', 'assemble']
+    assert all(x['job'] == "test" and x['seconds'] >= 0 for x in records)
+    assert records[2]['rows'] == df.shape[0]
+    assert len((tmp_path / "reads.jsonl").read_text().splitlines()) == 5
+
+
+def test_getODBCtable_dbapi_type_inference(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, amount REAL, name TEXT, blob BLOB, empty TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?, NULL)", [(1, 1.5, "a", b"\x00"), (2, 2, None, None), (None, None, "c", b"\x01")])
+    
+    df = sql.getODBCtable(conn, "SELECT * FROM t")
+    assert [str(x) for x in df.dtypes] == ["Int64", "Float64", "string", "object", "string"]
+    assert df['amount'].isna().tolist() == [False, False, True]
+    
+    chunks = list(sql.iterODBCtable(conn, "SELECT id, name FROM t", chunksize = 2))
+    assert [str(x) for x in chunks[1].dtypes] == ["Int64", "string"]
+    
+    sqlite3.register_converter("DECIMAL", lambda x: decimal.Decimal(x.decode()))
+    decimalConn = sqlite3.connect(":memory:", detect_types = sqlite3.PARSE_DECLTYPES)
+    decimalConn.execute("CREATE TABLE d (cost DECIMAL)")
+    decimalConn.executemany("INSERT INTO d VALUES (?)", [("1.25",), (None,), ("3.5",)])
+    df = sql.getODBCtable(decimalConn, "SELECT cost FROM d", dtype_backend = "pyarrow")
+    assert str(df['cost'].dtype) == "double[pyarrow]"
+    assert df['cost'].isna().tolist() == [False, True, False]
+    assert df['cost'].dropna().tolist() == [1.25, 3.5]
+    
+    conn.execute("INSERT INTO t VALUES ('x', NULL, NULL, NULL, NULL)")
+    with pytest.raises(RuntimeError, match = "more than one datatype"):
+        sql.getODBCtable(conn, "SELECT id FROM t")
+
+
+def test_syncODBCtable(standin, tmp_path):
+    pytest.importorskip("pyarrow")
+    standin.sqlite.execute("ATTACH DATABASE ':memory:' AS dbo")
+    standin.sqlite.execute("CREATE TABLE dbo.t AS SELECT * FROM t")
+    mirror = str(tmp_path / "mirror")
+    
+    first = sql.syncODBCtable(standin, "t", "id", mirror, columns = ["grp"])
+    assert first['rows'] == 25 and first['watermark'] == 25
+    assert sql.syncODBCtable(standin, "t", "id", mirror, columns = ["grp"])['rows'] == 0
+    with pytest.raises(ValueError, match = "mirrors the columns"):
+        sql.syncODBCtable(standin, "t", "id", mirror)
+    
+    standin.sqlite.execute("INSERT INTO dbo.t (id, grp) VALUES (26, 'z'), (27, 'z')")
+    second = sql.syncODBCtable(standin, "t", "id", mirror, columns = ["grp"])
+    assert second['rows'] == 2 and second['previous'] == 25
+    
+    mirrored = sql.readSyncedTable(mirror)
+    assert list(mirrored.columns) == ["grp", "id"]
+    assert sorted(mirrored['id'].tolist()) == list(range(1, 28))
+
+
+def test_syncODBCtable_rowversion(standin, tmp_path):
+    pytest.importorskip("pyarrow")
+    standin._types['rv'] = bytes
+    minActive = [(11).to_bytes(8, "big")]
+    standin.sqlite.create_function("MIN_ACTIVE_ROWVERSION", 0, lambda: minActive[0])
+    standin.sqlite.execute("ATTACH DATABASE ':memory:' AS dbo")
+    standin.sqlite.execute("CREATE TABLE dbo.t (id INTEGER, rv BLOB)")
+    standin.sqlite.executemany("INSERT INTO dbo.t VALUES (?, ?)", [(i, i.to_bytes(8, "big")) for i in range(1, 16)])
+    mirror = str(tmp_path / "mirror")
+    
+    #Rows 11 and up belong to transactions that are still open
+    first = sql.syncODBCtable(standin, "t", "rv", mirror)
+    assert first['rows'] == 10 and first['watermark'] == (10).to_bytes(8, "big")
+    
+    minActive[0] = (16).to_bytes(8, "big")
+    second = sql.syncODBCtable(standin, "t", "rv", mirror)
+    assert second['rows'] == 5 and second['previous'] == (10).to_bytes(8, "big")
+    assert sorted(sql.readSyncedTable(mirror)['id'].tolist()) == list(range(1, 16))
+
+
+def test_paginateODBCtable_resume(standin):
+    standin.sqlite.execute("ATTACH DATABASE ':memory:' AS dbo")
+    standin.sqlite.execute("CREATE TABLE dbo.t AS SELECT * FROM t")
+    
+    pages = list(sql.paginateODBCtable(standin, "t", "id", page_size = 10, columns = ["grp"]))
+    assert [len(x) for x in pages] == [10, 10, 5]
+    assert [x.attrs['lastKey'] for x in pages] == [(10,), (20,), (25,)]
+    assert list(pages[0].columns) == ["id", "grp"]
+    
+    resumed = list(sql.paginateODBCtable(standin, "t", ["grp", "id"], page_size = 10, start_after = ("a", 24)))
+    assert [len(x) for x in resumed] == [10, 7]
+    assert resumed[0][['grp', 'id']].iloc[0].tolist() == ["b", 1]
+    
+    with pytest.raises(ValueError, match = "one value for each"):
+        next(sql.paginateODBCtable(standin, "t", ["grp", "id"], start_after = ("a",)))
+    
+    #Keys read back with less precision than stored (like datetime2(7)) would repeat rows
+    sqlite3.register_converter("DATETIME7", lambda x: datetime.datetime.fromisoformat(x.decode()[:26]))
+    standin._types['ts'] = datetime.datetime
+    standin.sqlite.execute("CREATE TABLE dbo.k (ts DATETIME7, id INTEGER)")
+    standin.sqlite.executemany("INSERT INTO dbo.k VALUES (?, ?)", [("2024-01-01 00:00:0" + str(i) + ".1234567", i) for i in range(5)])
+    for pageSize in (1, 2):
+        with pytest.raises(RuntimeError, match = "round trip"):
+            list(sql.paginateODBCtable(standin, "k", "ts", page_size = pageSize))
+    assert [len(x) for x in sql.paginateODBCtable(standin, "k", "id", page_size = 2)] == [2, 2, 1]
+
+
+def test_seekSQL():
+    seekSQL, seekParams = sql._seekSQL(["Year", "ParcelID"])
+    assert seekSQL == "([Year] > ?) OR ([Year] = ? AND [ParcelID] > ?)"
+    assert seekParams((2022, 15)) == [2022, 2022, 15]
+
+
+def test_getODBCtable_memory_limit(standin, tmp_path):
+    assert sql._parseByteSize("2GB") == 2 * 1024 ** 3
+    assert sql._parseByteSize("512 kb") == 512 * 1024
+    
+    expected = sql.getODBCtable(standin, "SELECT * FROM t")
+    budgeted = sql.getODBCtable(standin, "SELECT * FROM t", memory_limit = "1MB")
+    pandas.testing.assert_frame_equal(budgeted, expected)
+    
+    with pytest.raises(MemoryError):
+        sql.getODBCtable(standin, "SELECT * FROM t", memory_limit = 1000, on_limit = "raise")
+    
+    pytest.importorskip("pyarrow")
+    spilled = sql.getODBCtable(standin, "SELECT * FROM t", memory_limit = 1000, spill_dir = str(tmp_path))
+    assert spilled['id'].tolist() == expected['id'].tolist()
+    assert isinstance(spilled['grp'].dtype, pandas.ArrowDtype)
+    assert list(tmp_path.iterdir()) == []
+    
+    #Spilled results aren't cached, so a normal read doesn't pick one up
+    cached = {'pyodbc': standin, 'details': {'Driver': "SQLite", 'Server': "localhost", 'Database': "t", 'UID': "test"}}
+    cache = sql.QueryCache(str(tmp_path / "cache"))
+    spilled = sql.getODBCtable(cached, "SELECT * FROM t", cache = cache, memory_limit = 1000, spill_dir = str(tmp_path))
+    assert isinstance(spilled['grp'].dtype, pandas.ArrowDtype)
+    pandas.testing.assert_frame_equal(sql.getODBCtable(cached, "SELECT * FROM t", cache = cache), expected)
+    
+    column = sql._ODBCColumn("Name", str, None, 0, 0, 0, True)
+    assert sql._estimateRowBytes([column]) == 8000
+    assert sql._estimateRowBytes([column], pythonObjects = True) == 56 + 8 + 49 + 8000
+
+
+class _ShimODBCConnection(dict):
+    """Stands in for `connectODBC()`, opening a new SQLite stand-in each time."""
+    
+    def __init__(self, path, types = sqliteShim.columnTypes):
+        super().__init__(pyodbc = sqliteShim.ShimConnection(path, types = types))
+    
+    def close(self):
+        self['pyodbc'].close()
+
+
+def test_partitionBoundaries():
+    assert sql._partitionBoundaries(0, 100, 4) == [25, 50, 75]
+    assert sql._partitionBoundaries(0, 2, 4) == [1]
+    assert sql._partitionBoundaries(5, 6, 3) == []
+    assert sql._partitionBoundaries(datetime.date(2022, 1, 1), datetime.date(2022, 1, 5), 2) == [datetime.date(2022, 1, 3)]
+    assert sql._partitionBoundaries(datetime.date(2022, 1, 1), datetime.date(2022, 1, 2), 4) == []
+    assert sql._partitionBoundaries(datetime.datetime(2022, 1, 1), datetime.datetime(2022, 1, 1, 12), 3) == [datetime.datetime(2022, 1, 1, 4), datetime.datetime(2022, 1, 1, 8)]
+    assert sql._partitionBoundaries(0.0, 1.0, 2) == [0.5]
+
+
+def test_getODBCtableParallel(tmp_path, monkeypatch):
+    path = str(tmp_path / "t.sqlite")
+    sqliteShim.makeDatabase(path, 1000)
+    sqliteShim.ShimConnection(path).sqlite.execute("UPDATE t SET id = NULL WHERE id = 500").connection.commit()
+    monkeypatch.setattr(sql, "connectODBC", lambda databaseString: _ShimODBCConnection(path))
+    
+    #Explicit bounds narrower than the data: the outer partitions pick up the rest and the NULL key
+    df = sql.getODBCtableParallel("bench", "SELECT * FROM t", "id", num_partitions = 4, lower_bound = 100, upper_bound = 900)
+    assert df.shape[0] == 1000
+    assert sorted(df['id'].dropna().tolist()) == [x for x in range(1000) if x != 500]
+    assert df['id'].isna().sum() == 1
+    
+    #Bounds looked up with MIN()/MAX()
+    types = dict(sqliteShim.columnTypes, lowerBound = datetime.date, upperBound = datetime.date)
+    monkeypatch.setattr(sql, "connectODBC", lambda databaseString: _ShimODBCConnection(path, types))
+    df = sql.getODBCtableParallel("bench", "t", "day", num_partitions = 3)
+    assert df.shape[0] == 1000
+
+
+class _FakePyodbcConnection:
+    """Records what the registry does with a connection."""
+    
+    def __init__(self, connString):
+        self.connString = connString
+        self.alive = True
+        self.closed = False
+    
+    def cursor(self):
+        if not self.alive:
+            raise RuntimeError("dead connection")
+        return sqlite3.connect(":memory:").cursor()
+    
+    def rollback(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fakeODBC(monkeypatch):
+    opened = []
+    
+    def connect(connString, **kwargs):
+        opened.append(_FakePyodbcConnection(connString))
+        opened[-1].kwargs = kwargs
+        return opened[-1]
+    
+    monkeypatch.setattr(sql.pyodbc, "connect", connect)
+    monkeypatch.setattr(sql, "_getConnectionString", lambda databaseString: ("DSN=" + databaseString, {'Driver': "fake", 'Server': "s", 'Database': databaseString, 'UID': "u"}))
+    return opened
+
+
+def test_ODBCRegistry_reuse_and_pool_size(fakeODBC):
+    registry = sql.ODBCRegistry(pool_size = 1)
+    first = registry.acquire("db")
+    registry.release("db", first)
+    assert registry.acquire("db") is first
+    assert len(fakeODBC) == 1
+    
+    #Only pool_size connections are kept idle, the rest are closed on release
+    second = registry.acquire("db")
+    registry.release("db", first)
+    registry.release("db", second)
+    assert not first.closed and second.closed
+    
+    with registry.connection("db") as conn:
+        assert conn is first
+    registry.close_all()
+    assert first.closed
+
+
+def test_ODBCRegistry_pre_ping_and_evict_idle(fakeODBC):
+    registry = sql.ODBCRegistry(idle_timeout = 600)
+    dead = registry.acquire("db")
+    registry.release("db", dead)
+    dead.alive = False
+    replacement = registry.acquire("db")
+    assert replacement is not dead and dead.closed
+    
+    registry.release("db", replacement)
+    registry.idle_timeout = -1
+    registry.evict_idle()
+    assert replacement.closed
+    assert registry.acquire("db") is fakeODBC[-1] and len(fakeODBC) == 3
+
+
+def test_ODBCConnection_lazy_handles(fakeODBC):
+    conn = sql.connectODBC("db")
+    assert conn['details']['Database'] == "db"
+    assert not conn.isOpen('pyodbc') and not conn.isOpen('sqlalchemy') and len(fakeODBC) == 0
+    
+    handle = conn['pyodbc']
+    assert conn.isOpen('pyodbc') and not conn.isOpen('sqlalchemy') and fakeODBC == [handle]
+    assert conn['pyodbc'] is handle
+    conn.close()
+    assert handle.closed and not conn.isOpen('pyodbc')
+
+
+def test_ODBCConnection_close_releases_to_registry(fakeODBC):
+    registry = sql.ODBCRegistry()
+    conn = sql.connectODBC("db", registry = registry)
+    handle = conn['pyodbc']
+    conn.close()
+    assert not handle.closed
+    assert sql.connectODBC("db", registry = registry)['pyodbc'] is handle
+    assert len(fakeODBC) == 1
+    
+    #New pooled connections get the login timeout too
+    assert handle.kwargs == {}
+    assert sql.connectODBC("db", registry = registry, timeout = 3)['pyodbc'].kwargs == {'timeout': 3}
+
+
+def test_sql_type_checker():
+    assert sql._sql_type_checker(pandas.Series([1, 2], dtype = "Int64")) == "BIGINT"
+    assert sql._sql_type_checker(pandas.Series([1, 2], dtype = "uint8")) == "TINYINT"
+    assert sql._sql_type_checker(pandas.Series([1.5], dtype = "float32")) == "REAL"
+    assert sql._sql_type_checker(pandas.Series([True, None], dtype = "boolean")) == "BIT"
+    assert sql._sql_type_checker(pandas.Series(pandas.to_datetime(["2022-01-01"]))) == "DATETIME2"
+    assert sql._sql_type_checker(pandas.Series(pandas.to_timedelta(["1s"]))) == "BIGINT"
+    assert sql._sql_type_checker(pandas.Series([datetime.date(2022, 1, 1)], dtype = object)) == "DATE"
+    assert sql._sql_type_checker(pandas.Series([decimal.Decimal("1.25")], dtype = object)) == "DECIMAL(38, 2)"
+    assert sql._sql_type_checker(pandas.Series(["a" * 17, None], dtype = "string")) == "NVARCHAR(32)"
+    assert sql._sql_type_checker(pandas.Series(["a"], dtype = "string")) == "NVARCHAR(16)"
+    assert sql._sql_type_checker(pandas.Series(["a" * 4001])) == "NVARCHAR(MAX)"
+    assert sql._sql_type_checker(pandas.Series([None, None], dtype = "string")) == "NVARCHAR(255)"
+
+
+def test_createTableSQL():
+    df = pandas.DataFrame({'ID': pandas.Series([1], dtype = "int32"), 'Name': ["abc"]})
+    assert sql._createTableSQL(df, "Parcels", "marcpub", sqlTypes = {'Name': "NVARCHAR(10)"}) == "CREATE TABLE [marcpub].[Parcels] (\n    [ID] INT NULL,\n    [Name] NVARCHAR(10) NULL\n)"
+
+
+def test_dataFrameToRows():
+    df = pandas.DataFrame({
+        'i': pandas.Series([1, None], dtype = "Int64"),
+        'f': [1.5, float("nan")],
+        'd': pandas.to_datetime(["2022-01-01", None]),
+        'td': pandas.to_timedelta(["1s", None]),
+        's': pandas.Series(["a", None], dtype = "string")
+    })
+    rows = sql._dataFrameToRows(df)
+    assert rows == [(1, 1.5, pandas.Timestamp("2022-01-01"), 1000000000, "a"), (None, None, None, None, None)]
+    assert type(rows[0][0]) is int and type(rows[0][3]) is int
+    
+    #DATETIMEOFFSET values are bound as UTC since pyodbc ignores tzinfo
+    tz = pandas.DataFrame({'tz': pandas.to_datetime(["2022-01-01 06:30", None]).tz_localize("America/Chicago")})
+    assert sql._sql_type_checker(tz['tz']) == "DATETIMEOFFSET"
+    rows = sql._dataFrameToRows(tz)
+    assert rows == [(pandas.Timestamp("2022-01-01 12:30"),), (None,)]
+    assert rows[0][0].tzinfo is None
+
+
+def test_agather_queries(monkeypatch):
+    lock = threading.Lock()
+    running = {}
+    peak = {}
+    
+    def fakeQuery(databaseString, query, registry = None, **kwargs):
+        server = databaseString.split('.')[0]
+        with lock:
+            running[server] = running.get(server, 0) + 1
+            peak[server] = max(peak.get(server, 0), running[server])
+        time.sleep(0.02)
+        with lock:
+            running[server] -= 1
+        return query
+    
+    monkeypatch.setattr(sql, "_getODBCtableFromString", fakeQuery)
+    queries = [("chiefs.db.user", "a" + str(i)) for i in range(6)] + [{'databaseString': "knights.db.user", 'query': "b" + str(i)} for i in range(3)]
+    results = asyncio.run(sql.agather_queries(queries, perServerLimit = 2))
+    assert results == ["a" + str(i) for i in range(6)] + ["b" + str(i) for i in range(3)]
+    assert peak == {'chiefs': 2, 'knights': 2}
+    
+    async def mixedLimits():
+        await sql.agetODBCtable("chiefs.db.user", "a", perServerLimit = 2)
+        await sql.agetODBCtable("chiefs.db.user", "b", perServerLimit = 3)
+    
+    with pytest.raises(ValueError, match = "perServerLimit of 2"):
+        asyncio.run(mixedLimits())
+
+
+def test_dbTableStructure(tmp_path):
+    path = str(tmp_path / "structure.sqlite")
+    sqliteShim.makeDatabase(path, 0, nTables = 8)
+    infoSchema = sqlite3.connect(path + ".information_schema")
+    infoSchema.executemany("INSERT INTO TABLES VALUES (?, ?, ?, ?)", [("bench", "dbo", "Flat", "BASE TABLE"), ("bench", "dbo", "Empty", "BASE TABLE")])
+    infoSchema.executemany("INSERT INTO COLUMNS VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        ("dbo", "Flat", "Name", 2, "nvarchar", "YES", 50, None, None), 
+        ("dbo", "Flat", "ID", 1, "int", "NO", None, 10, 0)
+    ])
+    infoSchema.commit()
+    infoSchema.close()
+    
+    conn = sqliteShim.connectShim(path)
+    df = sql.dbTableStructure(conn, addGeoIndicator = True, addColumnInfo = True).set_index('Table')
+    assert "Table_2" not in df.index
+    assert list(df.columns) == ['Database', 'Schema', 'isView', 'isSpatial', 'nColumns', 'Columns']
+    assert df.loc["Table_0", 'isView'] and not df.loc["Table_1", 'isView']
+    assert df.loc["Table_1", 'isSpatial'] and not df.loc["Flat", 'isSpatial'] and not df.loc["Empty", 'isSpatial']
+    assert df.loc["Table_1", 'nColumns'] == 10 and df.loc["Flat", 'nColumns'] == 2 and df.loc["Empty", 'nColumns'] == 0
+    assert df.loc["Flat", 'Columns'] == [
+        {'Column': "ID", 'DataType': "int", 'isNullable': False, 'MaxLength': None, 'Precision': 10, 'Scale': 0}, 
+        {'Column': "Name", 'DataType': "nvarchar", 'isNullable': True, 'MaxLength': 50, 'Precision': None, 'Scale': None}
+    ]
+    assert df.loc["Table_1", 'Columns'][5] == {'Column': "col5", 'DataType': "decimal", 'isNullable': True, 'MaxLength': None, 'Precision': 18, 'Scale': 4}
+    
+    df = sql.dbTableStructure(conn, includeViews = False)
+    assert list(df.columns) == ['Database', 'Schema', 'Table', 'isView'] and not df['isView'].any()
+    conn['pyodbc'].close()
+
+
+def _sqliteValuesTableSQL(rows, columnNames, alias = "seed"):
+    """SQLite stand-in for `sql._valuesTableSQL()` (no VALUES derived table column list)"""
+    
+    selects = ["SELECT " + ", ".join("'" + str(value).replace("'", "''") + "' AS [" + name + "]" for value, name in zip(row, columnNames)) for row in rows]
+    return "(" + " UNION ALL ".join(selects) + ") AS " + alias
+
+
+def test_DatabaseCatalog_incremental_refresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql, "_valuesTableSQL", _sqliteValuesTableSQL)
+    server = sqlite3.connect(":memory:")
+    server.execute("ATTACH DATABASE ':memory:' AS sys")
+    server.execute("ATTACH DATABASE ':memory:' AS INFORMATION_SCHEMA")
+    server.executescript("""
+        CREATE TABLE sys.schemas (schema_id INTEGER, name TEXT);
+        CREATE TABLE sys.objects (name TEXT, object_id INTEGER, schema_id INTEGER, type TEXT, modify_date TEXT, is_ms_shipped INTEGER);
+        CREATE TABLE INFORMATION_SCHEMA.SCHEMATA (SCHEMA_NAME TEXT);
+        CREATE TABLE INFORMATION_SCHEMA.TABLES (TABLE_CATALOG TEXT, TABLE_SCHEMA TEXT, TABLE_NAME TEXT, TABLE_TYPE TEXT);
+        CREATE TABLE INFORMATION_SCHEMA.COLUMNS (TABLE_SCHEMA TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT, ORDINAL_POSITION INTEGER, DATA_TYPE TEXT, 
+                                                 IS_NULLABLE TEXT, CHARACTER_MAXIMUM_LENGTH INTEGER, NUMERIC_PRECISION INTEGER, NUMERIC_SCALE INTEGER);
+        CREATE TABLE INFORMATION_SCHEMA.VIEW_TABLE_USAGE (VIEW_CATALOG TEXT, VIEW_SCHEMA TEXT, VIEW_NAME TEXT, TABLE_CATALOG TEXT, TABLE_SCHEMA TEXT, TABLE_NAME TEXT);
+        INSERT INTO sys.schemas VALUES (1, 'dbo');
+        INSERT INTO INFORMATION_SCHEMA.SCHEMATA VALUES ('dbo');
+    """)
+    objects = [("A", 1, "U"), ("B", 2, "U"), ("C", 3, "U"), ("V1", 4, "V"), ("V2", 5, "V")]
+    server.executemany("INSERT INTO sys.objects VALUES (?, ?, 1, ?, '2024-01-01 00:00:00', 0)", objects)
+    server.executemany("INSERT INTO INFORMATION_SCHEMA.TABLES VALUES ('db', 'dbo', ?, ?)", [(x[0], "VIEW" if x[2] == "V" else "BASE TABLE") for x in objects])
+    server.executemany("INSERT INTO INFORMATION_SCHEMA.COLUMNS VALUES ('dbo', ?, ?, ?, 'int', 'NO', NULL, 10, 0)", 
+                       [(x[0], "ID", 1) for x in objects] + [("B", "Shape", 2)])
+    server.execute("UPDATE INFORMATION_SCHEMA.COLUMNS SET DATA_TYPE = 'geometry' WHERE COLUMN_NAME = 'Shape'")
+    server.executemany("INSERT INTO INFORMATION_SCHEMA.VIEW_TABLE_USAGE VALUES ('db', 'dbo', ?, 'db', 'dbo', ?)", [("V1", "A"), ("V2", "V1"), ("V2", "B")])
+    conn = {'pyodbc': None, 'sqlalchemy': server, 'details': {'Driver': "SQLite", 'Server': "localhost", 'Database': "db", 'UID': "test"}}
+    
+    catalog = sql.DatabaseCatalog(str(tmp_path / "catalog.sqlite"))
+    assert catalog.refresh(conn) == {'Connection': "localhost.db.test", 'full': True, 'changed': 5, 'dropped': 0}
+    assert sorted(catalog.tables(conn)['Table']) == ["A", "B", "C", "V1", "V2"]
+    assert catalog.tables(conn).set_index('Table')['isSpatial'].to_dict() == {'A': False, 'B': True, 'C': False, 'V1': False, 'V2': False}
+    deps = catalog.viewDependencies(conn, "dbo", "V2", recursive = True)
+    assert sorted(zip(deps['ParentTable'], deps['ChildTable'])) == [("V1", "A"), ("V2", "B"), ("V2", "V1")]
+    assert catalog.refresh(conn) == {'Connection': "localhost.db.test", 'full': False, 'changed': 0, 'dropped': 0}
+    
+    #Change A, point V1 at B instead of A, and drop C
+    server.execute("UPDATE sys.objects SET modify_date = '2024-02-01 00:00:00' WHERE name IN ('A', 'V1')")
+    server.execute("INSERT INTO INFORMATION_SCHEMA.COLUMNS VALUES ('dbo', 'A', 'Name', 2, 'nvarchar', 'YES', 50, NULL, NULL)")
+    server.execute("UPDATE INFORMATION_SCHEMA.VIEW_TABLE_USAGE SET TABLE_NAME = 'B' WHERE VIEW_NAME = 'V1'")
+    for table in ("sys.objects", "INFORMATION_SCHEMA.TABLES", "INFORMATION_SCHEMA.COLUMNS"):
+        server.execute("DELETE FROM " + table + " WHERE " + ("name" if table == "sys.objects" else "TABLE_NAME") + " = 'C'")
+    
+    assert catalog.refresh(conn) == {'Connection': "localhost.db.test", 'full': False, 'changed': 2, 'dropped': 1}
+    assert sorted(catalog.tables(conn)['Table']) == ["A", "B", "V1", "V2"]
+    assert catalog.tables(conn).set_index('Table')['nColumns'].to_dict() == {'A': 2, 'B': 2, 'V1': 1, 'V2': 1}
+    assert catalog.columns(conn, "dbo", "A")['Column'].tolist() == ["ID", "Name"]
+    assert catalog.columns(conn, "dbo", "B")['Column'].tolist() == ["ID", "Shape"]
+    assert catalog.findColumns("^shape$")['Table'].tolist() == ["B"]
+    deps = catalog.viewDependencies(conn, "dbo", "V2", recursive = True)
+    assert sorted(zip(deps['ParentTable'], deps['ChildTable'])) == [("V1", "B"), ("V2", "B"), ("V2", "V1")]
+    assert catalog.viewDependencies(conn, view = "V1")['Table'].tolist() == ["B"]
+    catalog.close()
+
+
+def test_connectODBCFromDF_failures(monkeypatch):
+    release = threading.Event()
+    closed = []
+    
+    class _FakeLazyConnection(dict):
+        def __init__(self, name):
+            super().__init__()
+            self.name = name
+        
+        def __getitem__(self, key):
+            if self.name.startswith("down"):
+                raise OSError("server unreachable")
+            return self.name
+        
+        def close(self):
+            closed.append(self.name)
+    
+    def fakeConnectODBC(databaseString, registry = None, timeout = None):
+        if databaseString.startswith("nokey"):
+            raise KeyError("no keyring entry")
+        if databaseString.startswith("slow"):
+            release.wait(5)
+        return _FakeLazyConnection(databaseString)
+    
+    monkeypatch.setattr(sql, "connectODBC", fakeConnectODBC)
+    monkeypatch.setattr(sql, "_connectDeadlineSlack", 0)
+    df = pandas.DataFrame({'Connection': ["up.db.user", "nokey.db.user", "down.db.user", "slow.db.user", "up.db.user"]})
+    
+    conns, failures = sql.connectODBCFromDF(df, connectionCol = "Connection", timeout = 0.2, return_failures = True)
+    assert list(conns) == ["up.db.user"]
+    assert failures.sort_values('Connection')[['Connection', 'Stage', 'ErrorType']].values.tolist() == [
+        ["down.db.user", "connect", "OSError"], 
+        ["nokey.db.user", "keyring", "KeyError"], 
+        ["slow.db.user", "timeout", "TimeoutError"]
+    ]
+    
+    #The late connection is closed once it finishes
+    release.set()
+    for _ in range(100):
+        if "slow.db.user" in closed:
+            break
+        time.sleep(0.01)
+    assert closed == ["slow.db.user"]
+    
+    with pytest.warns(RuntimeWarning, match = "2 connection\\(s\\) failed"):
+        conns = sql.connectODBCFromDF(df.iloc[:3], connectionCol = "Connection", timeout = 0.2)
+    assert list(conns) == ["up.db.user"]
+
+
+def test_createDatabaseStringFromDF():
+    df = pandas.DataFrame({
+        'Server': ["Chiefs", "Knights", None, "Phantoms", "CHIEFS", "Royals"], 
+        'Database': ["MARC_PUB", "MARC_PRD", "MARC_PUB", float("nan"), "marc_pub", 2024], 
+        'User': ["marcpub", "marcdl", "marcpub", "marcpub", "MarcPub", "nan"]
+    }, index = [10, 11, 12, 13, 14, 15])
+    
+    out = sql.createDatabaseStringFromDF(df, 'Server', 'Database', 'User')
+    assert out.index.tolist() == df.index.tolist()
+    assert out.iloc[[0, 1, 4]].tolist() == ["chiefs.marc_pub.marcpub", "knights.marc_prd.marcdl", "chiefs.marc_pub.marcpub"]
+    assert out.iloc[[2, 3, 5]].isna().all()
+    
+    df.loc[15, 'User'] = "gis"
+    out = sql.createDatabaseStringFromDF(df, 'Server', 'Database', 'User', unique = True)
+    assert out.index.tolist() == [10, 11, 12, 15]
+    assert out.fillna("missing").tolist() == ["chiefs.marc_pub.marcpub", "knights.marc_prd.marcdl", "missing", "royals.2024.gis"]
+
+
+def test_regexMask():
+    series = pandas.Series(["dbo", "sde", "INFORMATION_SCHEMA", "my_INFORMATION_SCHEMA", "db_owner", None, numpy.nan, "A12"], index = list("abcdefgh"))
+    mask = sql._regexMask(series, ["sde", "^INFORMATION_SCHEMA$", "^db_\\.*", "^[a-zA-Z]\\d+$"])
+    assert mask.dtype == bool
+    assert mask.index.tolist() == list("abcdefgh")
+    assert mask.tolist() == [False, True, True, False, True, False, False, True]
+    assert series[~mask].tolist()[:2] == ["dbo", "my_INFORMATION_SCHEMA"]
+
+
+def test_dbViewStructureFromDF(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql, "_valuesTableSQL", _sqliteValuesTableSQL)
+    usage = {
+        "chiefs.marc_pub.marcpub": [("V2", "V1"), ("V1", "T1")], 
+        "knights.marc_prd.marcdl": [("W1", "T9")]
+    }
+    for connString, edges in usage.items():
+        infoSchema = sqlite3.connect(str(tmp_path / (connString + ".information_schema")))
+        infoSchema.execute("CREATE TABLE VIEW_TABLE_USAGE (VIEW_CATALOG TEXT, VIEW_SCHEMA TEXT, VIEW_NAME TEXT, TABLE_CATALOG TEXT, TABLE_SCHEMA TEXT, TABLE_NAME TEXT)")
+        database = connString.split(".")[1]
+        infoSchema.executemany("INSERT INTO VIEW_TABLE_USAGE VALUES (?, 'dbo', ?, ?, 'dbo', ?)", [(database, view, database, table) for view, table in edges])
+        infoSchema.commit()
+        infoSchema.close()
+    
+    connected = []
+    
+    class _ShimEngine(dict):
+        def close(self):
+            self['sqlalchemy'].close()
+    
+    def fakeConnectODBC(databaseString):
+        connected.append(databaseString)
+        conn = sqlite3.connect(":memory:", check_same_thread = False)
+        conn.execute("ATTACH DATABASE ? AS INFORMATION_SCHEMA", [str(tmp_path / (databaseString + ".information_schema"))])
+        return _ShimEngine(sqlalchemy = conn)
+    
+    monkeypatch.setattr(sql, "connectODBC", fakeConnectODBC)
+    requests = pandas.DataFrame({
+        'conn': ["chiefs.marc_pub.marcpub", "knights.marc_prd.marcdl", "chiefs.marc_pub.marcpub", "chiefs.marc_pub.marcpub"], 
+        'schema': ["dbo"] * 4, 
+        'view': ["V2", "W1", "V2", "V1"]
+    })
+    out = sql.dbViewStructureFromDF(requests, "conn", "schema", "view", chunksize = 1)
+    
+    assert sorted(connected) == ["chiefs.marc_pub.marcpub", "knights.marc_prd.marcdl"]
+    assert list(out.columns) == ['RequestConnection', 'RequestServer', 'RequestDatabase', 'RequestSchema', 'RequestView', 
+                                 'ParentDatabase', 'ParentSchema', 'ParentTable', 'ChildDatabase', 'ChildSchema', 'ChildTable']
+    assert out['RequestView'].tolist() == ["V2", "V2", "W1", "V2", "V2", "V1"]
+    assert out[['RequestServer', 'RequestDatabase']].drop_duplicates().values.tolist() == [["chiefs", "marc_pub"], ["knights", "marc_prd"]]
+    assert sorted(zip(out['ParentTable'][:2], out['ChildTable'][:2])) == [("V1", "T1"), ("V2", "V1")]
+    assert out.iloc[2][['ParentDatabase', 'ParentTable', 'ChildTable']].tolist() == ["marc_prd", "W1", "T9"]
+    assert out.iloc[5][['ParentTable', 'ChildTable']].tolist() == ["V1", "T1"]